@@ -0,0 +1,100 @@
+"""A websocket stand-in for mouse-cheese-server, backed by LocalGameServer rules.
+
+Like mouse-cheese-server, the stand-in runs a single game shared by every
+connection. Each connection is greeted with the current state, START_GAME resets
+the game, and every message received is answered by broadcasting the state to every
+connection, one frame per MOVE. Finished games are broadcast as ``move`` frames with
+``gameOver`` set.
+
+Unlike mouse-cheese-server, red is played by the stand-in itself, with random moves,
+in games started by START_GAME: each of its moves is broadcast like a MOVE message.
+
+Usage::
+
+    python -m benchmarks.standin_server --port 3111
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from typing import Any, Dict, Optional, Set
+
+import websockets
+
+from training_env.game_rules import RED
+from training_env.local_game_server import LocalGameServer
+
+
+class StandinServer:
+    """The single game of a stand-in and the connections it is broadcast to."""
+
+    def __init__(self):
+        self._server = LocalGameServer()
+        self._connections: Set[Any] = set()
+        self._state: Dict[str, Any] = self._server.start_game()
+        # like mouse-cheese-server's initial game, nobody started it
+        self._state["gameIntent"] = "none"
+
+    def _broadcast(self):
+        websockets.broadcast(self._connections, json.dumps(self._state))
+
+    def _handle(self, message: Dict[str, Any]):
+        if message.get("type") == "START_GAME":
+            self._server.end_game(self._state["gameTag"])
+            self._state = self._server.start_game()
+        elif message.get("type") == "MOVE":
+            self._server.apply_move(
+                self._state["gameTag"], message.get("player"), message.get("direction")
+            )
+        self._broadcast()
+
+        state = self._state
+        if (
+            state["currentPlayer"] == RED
+            and not state["gameOver"]
+            and state["gameIntent"] != "none"
+        ):
+            self._server.apply_move(
+                state["gameTag"], RED, random.choice(state["possibleMoves"])
+            )
+            self._broadcast()
+
+    async def serve_connection(self, websocket: Any):
+        self._connections.add(websocket)
+        try:
+            await websocket.send(json.dumps(self._state))
+            async for raw in websocket:
+                self._handle(json.loads(raw))
+        finally:
+            self._connections.discard(websocket)
+
+
+async def serve(host: str, port: int, ready: Optional[asyncio.Event] = None):
+    """Serves until cancelled.
+
+    :param host: Interface to listen on.
+    :type host: str
+    :param port: Port to listen on.
+    :type port: int
+    :param ready: Set once the server accepts connections. Optional.
+    :type ready: asyncio.Event, optional
+    """
+    standin = StandinServer()
+    async with websockets.serve(standin.serve_connection, host, port):
+        if ready is not None:
+            ready.set()
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3111)
+    args = parser.parse_args()
+    print("Serving on ws://%s:%d/" % (args.host, args.port), flush=True)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
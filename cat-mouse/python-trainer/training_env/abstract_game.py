@@ -59,52 +59,21 @@ class AbstractGame(ABC):
     __slots__ = (
         "_anybody_inactive",
         "_available_moves",
-        "_available_switches",
         "_game_tag",
-        "_can_dynamax",
-        "_can_mega_evolve",
-        "_can_tera",
-        "_can_z_move",
         "_current_observation",
-        "_data",
-        "_dynamax_turn",
-        "_fields",
         "_finished",
-        "_force_switch",
         "_format",
-        "in_team_preview",
         "_max_team_size",
-        "_maybe_trapped",
-        "_move_on_next_request",
         "_observations",
-        "_opponent_can_dynamax",
-        "_opponent_can_mega_evolve",
-        "_opponent_can_terrastallize",
-        "_opponent_can_z_move",
-        "_opponent_dynamax_turn",
-        "_opponent_rating",
-        "_opponent_side_conditions",
-        "_opponent_team",
         "_opponent_username",
         "_player_role",
         "_player_username",
-        "_players",
-        "_rating",
         "_reconnected",
-        "_replay_data",
         "_rqid",
-        "rules",
         "_reviving",
-        "_save_replays",
-        "_side_conditions",
-        "_team_size",
-        "_team",
-        "_teampreview_opponent_team",
-        "_teampreview",
-        "_trapped",
+        "_start_latency",
         "_turn",
         "_wait",
-        "_weather",
         "_won",
         "logger",
     )
@@ -122,16 +91,15 @@ class AbstractGame(ABC):
 
         # Utils attributes
         self._game_tag: str = game_tag
-        print("GAME TAGGGGG game_tag IS: ", self._game_tag)
         self._format: Optional[str] = None
         self._max_team_size: Optional[int] = None
         self._opponent_username: Optional[str] = None
         self._player_role: Optional[str] = None
         self._player_username: str = username
-        self._players: List[Dict[str, str]] = []
+        # self._players: List[Dict[str, str]] = []
         #self._replay_data: List[List[str]] = []
         #self._save_replays: Union[str, bool] = save_replays
-        self._team_size: Dict[str, int] = {}
+        # self._team_size: Dict[str, int] = {}
         # self._teampreview: bool = False
         # self._teampreview_opponent_team: Set[Pokemon] = set()
         self._anybody_inactive: bool = False
@@ -154,6 +122,8 @@ class AbstractGame(ABC):
         # self._opponent_rating: Optional[int] = None
         # self._rating: Optional[int] = None
         self._won: Optional[bool] = None
+        # seconds between the challenge and the game's first message, if challenged
+        self._start_latency: Optional[float] = None
 
         # In game battle state attributes
         # self._weather: Dict[Weather, int] = {}
@@ -166,9 +136,10 @@ class AbstractGame(ABC):
         # self._team: Dict[str, Pokemon] = {}
         # self._opponent_team: Dict[str, Pokemon] = {}
 
-        # Initialize Observations
-        # self._observations: Dict[int, Observation] = {}
-        # self._current_observation: Observation = Observation()
+        # Initialize Observations: the replay buffer transitions are recorded to, if
+        # any, and the state the pending action was chosen in
+        self._observations: Optional[Any] = None
+        self._current_observation: Optional[Any] = None
 
     # @abstractmethod
     # def clear_all_boosts(self):
@@ -190,9 +161,8 @@ class AbstractGame(ABC):
     def parse_message(self, split_message: Dict[str, Any]):
         # is to assign message vars to self vars
         # also loggs "Observations"
-        print("==========PARSING MESSAGE=====================")
-        print(split_message)
         self._available_moves = split_message["possibleMoves"]
+        self._turn += 1
 
 
 
@@ -209,7 +179,7 @@ class AbstractGame(ABC):
         self._finish_battle()
 
     def won_by(self, player_name: str):
-        if player_name == self._player_username:
+        if player_name in (self._player_username, self._player_role):
             self._won = True
         else:
             self._won = False
@@ -259,13 +229,13 @@ class AbstractGame(ABC):
     #     """
     #     return self._fields
 
-    # @property
-    # def finished(self) -> bool:
-    #     """
-    #     :return: A boolean indicating whether the battle is finished.
-    #     :rtype: Optional[bool]
-    #     """
-    #     return self._finished
+    @property
+    def finished(self) -> bool:
+        """
+        :return: A boolean indicating whether the game is finished.
+        :rtype: bool
+        """
+        return self._finished
     
 
     # @property
@@ -273,14 +243,14 @@ class AbstractGame(ABC):
     # def force_switch(self) -> Any:
     #     pass
 
-    # @property
-    # def lost(self) -> Optional[bool]:
-    #     """
-    #     :return: If the battle is finished, a boolean indicating whether the battle is
-    #         lost. Otherwise None.
-    #     :rtype: Optional[bool]
-    #     """
-    #     return None if self._won is None else not self._won
+    @property
+    def lost(self) -> Optional[bool]:
+        """
+        :return: If the game is finished, a boolean indicating whether the game is
+            lost. Otherwise None.
+        :rtype: Optional[bool]
+        """
+        return None if self._won is None else not self._won
     
 
     # @property
@@ -328,6 +298,19 @@ class AbstractGame(ABC):
     #     """
     #     return self._rqid
 
+    @property
+    def start_latency(self) -> Optional[float]:
+        """
+        :return: Seconds between the challenge starting the game and its first
+            message, if the player challenged for it. Otherwise None.
+        :rtype: float, optional
+        """
+        return self._start_latency
+
+    @start_latency.setter
+    def start_latency(self, start_latency: Optional[float]):
+        self._start_latency = start_latency
+
     # @property
     # @abstractmethod
     # def trapped(self) -> Any:
@@ -338,31 +321,31 @@ class AbstractGame(ABC):
     # def trapped(self, value: Any):
     #     pass
 
-    # @property
-    # def turn(self) -> int:
-    #     """
-    #     :return: The current battle turn.
-    #     :rtype: int
-    #     """
-    #     return self._turn
+    @property
+    def turn(self) -> int:
+        """
+        :return: The number of game states received so far.
+        :rtype: int
+        """
+        return self._turn
 
-    # @turn.setter
-    # def turn(self, turn: int):
-    #     """Sets the current turn counter to given value.
+    @turn.setter
+    def turn(self, turn: int):
+        """Sets the current turn counter to given value.
 
-    #     :param turn: Current turn value.
-    #     :type turn: int
-    #     """
-    #     self._turn = turn
+        :param turn: Current turn value.
+        :type turn: int
+        """
+        self._turn = turn
     
-    # @property
-    # def won(self) -> Optional[bool]:
-    #     """
-    #     :return: If the battle is finished, a boolean indicating whether the battle is
-    #         won. Otherwise None.
-    #     :rtype: Optional[bool]
-    #     """
-    #     return self._won
+    @property
+    def won(self) -> Optional[bool]:
+        """
+        :return: If the game is finished, a boolean indicating whether the game is
+            won. Otherwise None.
+        :rtype: Optional[bool]
+        """
+        return self._won
 
     # @property
     # def reviving(self) -> bool:
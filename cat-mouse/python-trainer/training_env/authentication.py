@@ -0,0 +1,219 @@
+"""This module defines the authentication of accounts against the login server.
+
+Login requests go through a shared HTTP session, so that connections to the login
+server are kept alive between accounts. Requests run on a bounded thread pool: they
+never block the event loops players run on, and at most ``max_concurrent`` of them
+are in flight at once, whichever loop they come from. Assertions are issued for
+the challenge string of a connection: they are cached per account and challenge
+string until they expire, and a new challenge string, e.g. after a reconnection,
+replaces the account's cached assertion.
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+# Assertions are reused for this long, in seconds, by default
+DEFAULT_ASSERTION_TTL = 600.0
+
+
+class Authenticator:
+    """Obtains login assertions, shared between clients."""
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int = 8,
+        assertion_ttl: Optional[float] = DEFAULT_ASSERTION_TTL,
+        timeout: float = 10.0,
+    ):
+        """
+        :param max_concurrent: Maximum number of login requests in flight.
+        :type max_concurrent: int
+        :param assertion_ttl: How long assertions are reused for, in seconds. If
+            None, assertions are not cached.
+        :type assertion_ttl: float, optional
+        :param timeout: Timeout of login requests, in seconds.
+        :type timeout: float
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self._max_concurrent = max_concurrent
+        self._assertion_ttl = assertion_ttl
+        self._timeout = timeout
+
+        self._lock = Lock()
+        self._session_lock = Lock()
+        # (authentication_url, username) -> (challstr, assertion, expiry)
+        self._cache: Dict[Tuple[str, str], Tuple[str, str, float]] = {}
+        self._session: Any = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._n_requests = 0
+        self._n_cache_hits = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self._max_concurrent, thread_name_prefix="authentication"
+                )
+            return self._executor
+
+    def _get_session(self) -> Any:
+        # called from the pool, so that importing requests never blocks a loop
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self._max_concurrent,
+                    pool_maxsize=self._max_concurrent,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def _post(self, authentication_url: str, data: Dict[str, str]) -> str:
+        response = self._get_session().post(
+            authentication_url, data=data, timeout=self._timeout
+        )
+        response.raise_for_status()
+        return response.text
+
+    def cached_assertion(
+        self, authentication_url: str, username: str, challstr: str
+    ) -> Optional[str]:
+        """
+        :param authentication_url: The login server.
+        :type authentication_url: str
+        :param username: The account.
+        :type username: str
+        :param challstr: The challenge string sent by the server.
+        :type challstr: str
+        :return: The account's cached assertion for challstr, if it has not
+            expired.
+        :rtype: str, optional
+        """
+        key = (authentication_url, username)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            if cached[0] != challstr or cached[2] <= time.monotonic():
+                # issued for another connection, or expired: useless either way
+                del self._cache[key]
+                return None
+            self._n_cache_hits += 1
+            return cached[1]
+
+    async def get_assertion(
+        self, authentication_url: str, username: str, password: str, challstr: str
+    ) -> str:
+        """Returns an assertion for the account, from the cache if possible.
+
+        :param authentication_url: The login server.
+        :type authentication_url: str
+        :param username: The account's username.
+        :type username: str
+        :param password: The account's password.
+        :type password: str
+        :param challstr: The challenge string sent by the server.
+        :type challstr: str
+        :return: The assertion.
+        :rtype: str
+        """
+        assertion = self.cached_assertion(authentication_url, username, challstr)
+        if assertion is not None:
+            return assertion
+
+        executor = self._get_executor()
+        data = {"act": "login", "name": username, "pass": password, "challstr": challstr}
+        with self._lock:
+            self._n_requests += 1
+        text = await asyncio.get_running_loop().run_in_executor(
+            executor, self._post, authentication_url, data
+        )
+        # responses are prefixed with "]"
+        assertion = json.loads(text[1:])["assertion"]
+
+        if self._assertion_ttl is not None:
+            with self._lock:
+                self._cache[(authentication_url, username)] = (
+                    challstr,
+                    assertion,
+                    time.monotonic() + self._assertion_ttl,
+                )
+        return assertion
+
+    def invalidate(self, username: Optional[str] = None):
+        """Forgets cached assertions.
+
+        :param username: The account whose assertions to forget. If None, all are.
+        :type username: str, optional
+        """
+        with self._lock:
+            if username is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[1] == username]:
+                    del self._cache[key]
+
+    def close(self):
+        """Waits for requests in flight and closes the session."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    @property
+    def max_concurrent(self) -> int:
+        """
+        :return: Maximum number of login requests in flight.
+        :rtype: int
+        """
+        return self._max_concurrent
+
+    @property
+    def n_cache_hits(self) -> int:
+        """
+        :return: Number of assertions served from the cache.
+        :rtype: int
+        """
+        return self._n_cache_hits
+
+    @property
+    def n_requests(self) -> int:
+        """
+        :return: Number of login requests sent.
+        :rtype: int
+        """
+        return self._n_requests
+
+
+_default_authenticator: Optional[Authenticator] = None
+_default_authenticator_lock = Lock()
+
+
+def get_default_authenticator() -> Authenticator:
+    """Returns the authenticator clients share unless given their own.
+
+    :return: The default authenticator, created on first call.
+    :rtype: Authenticator
+    """
+    global _default_authenticator
+    if _default_authenticator is None:
+        with _default_authenticator_lock:
+            if _default_authenticator is None:
+                _default_authenticator = Authenticator()
+    return _default_authenticator
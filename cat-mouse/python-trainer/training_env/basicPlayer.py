@@ -1,16 +1,31 @@
 import asyncio
 import random
+import time
 from abc import ABC, abstractmethod
-from asyncio import Condition, Event, Queue, Semaphore
-from logging import Logger
-from time import perf_counter
-from typing import Any, Awaitable, Dict, List, Optional, Union
-
-import orjson
+from collections import OrderedDict, deque
+from asyncio import Condition, Event, Future, Queue, QueueFull, Semaphore
+from logging import DEBUG, Logger
+from time import perf_counter, perf_counter_ns
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from .concurrency import create_in_game_loop, handle_threaded_coroutines
+from .concurrency import LoopGroup, create_in_loop, handle_threaded_coroutines
 from .game import Game
 from .game_client import GameClient
+from .game_rules import mirror_direction, mirror_state
 from .game_order import GameOrder, DefaultGameOrder
 from .account_configuration import (
     CONFIGURATION_FROM_PLAYER_COUNTER,
@@ -19,8 +34,19 @@ from .account_configuration import (
 from .server_configuration import (
     LocalhostServerConfiguration,
     ServerConfiguration,
+    SimulatedServerConfiguration,
 )
 from .abstract_game import AbstractGame
+from .game_state import DIRECTION_INDEX
+from .local_game_server import LocalGameClient, LocalGameServer
+from .shared_transport import SharedTransport
+
+if TYPE_CHECKING:
+    from .authentication import Authenticator
+    from .episode_store import EpisodeWriter
+    from .game_archive import GameArchive
+    from .metrics import LatencyMetrics
+    from .replay_buffer import ReplayBuffer
 
 
 class BasicPlayer(ABC):
@@ -39,27 +65,81 @@ class BasicPlayer(ABC):
         start_timer_on_game_start: bool = False,
         start_listening: bool = True,
         ping_interval: Optional[float] = 20.0,
-        ping_timeout: Optional[float] = 20.0,):
+        ping_timeout: Optional[float] = 20.0,
+        local_game_server: Optional[LocalGameServer] = None,
+        async_logging: bool = False,
+        transport: Optional[SharedTransport] = None,
+        reconnect: bool = False,
+        resync_timeout: float = 30.0,
+        game_lookup_timeout: Optional[float] = None,
+        max_finished_games: Optional[int] = None,
+        finished_game_ttl: Optional[float] = None,
+        game_archive: Optional["GameArchive"] = None,
+        replay_buffer: Optional["ReplayBuffer"] = None,
+        episode_writer: Optional["EpisodeWriter"] = None,
+        dispatcher_workers: int = 8,
+        metrics: Optional["LatencyMetrics"] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        loop_group: Optional[LoopGroup] = None,
+        authenticator: Optional["Authenticator"] = None,
+        max_challenge_queue_size: int = 1024,):
         
         if account_configuration is None:
             account_configuration = self._create_account_configuration()
 
+        # players sharing a transport run on its loop. Otherwise, players run on
+        # loop, which can be the caller's own running loop, or get one from
+        # loop_group, defaulting to GAME_LOOP
+        if loop is None and transport is not None:
+            loop = transport.loop
+        elif loop is None and loop_group is not None:
+            loop = loop_group.assign(account_configuration.username)
+
         if server_configuration is None:
-            server_configuration = LocalhostServerConfiguration
-        
-        self.game_client = GameClient(
-            account_configuration=account_configuration,
-            #avatar=avatar,
-            log_level=log_level,
-            server_configuration=server_configuration,
-            start_listening=start_listening,
-            ping_interval=ping_interval,
-            ping_timeout=ping_timeout,
-        )
+            server_configuration = (
+                LocalhostServerConfiguration
+                if local_game_server is None
+                else SimulatedServerConfiguration
+            )
+
+        if (
+            local_game_server is not None
+            or server_configuration == SimulatedServerConfiguration
+        ):
+            # in-process simulation: no websocket, states are handed over as dicts
+            self.game_client = LocalGameClient(
+                account_configuration=account_configuration,
+                local_game_server=local_game_server,
+                log_level=log_level,
+                server_configuration=server_configuration,
+                start_listening=start_listening,
+                async_logging=async_logging,
+                metrics=metrics,
+                loop=loop,
+            )
+        else:
+            self.game_client = GameClient(
+                account_configuration=account_configuration,
+                #avatar=avatar,
+                log_level=log_level,
+                server_configuration=server_configuration,
+                start_listening=start_listening,
+                ping_interval=ping_interval,
+                ping_timeout=ping_timeout,
+                async_logging=async_logging,
+                transport=transport,
+                reconnect=reconnect,
+                dispatcher_workers=dispatcher_workers,
+                metrics=metrics,
+                loop=loop,
+                authenticator=authenticator,
+            )
         
         self.game_client._handle_game_message = self._handle_game_message  # type: ignore
         self.game_client._update_challenges = self._update_challenges  # type: ignore
         self.game_client._handle_challenge_request = self._handle_challenge_request  # type: ignore
+        self.game_client._handle_reconnection = self._handle_reconnection  # type: ignore
+        self.game_client._handle_stop_listening = self._handle_stop_listening  # type: ignore
 
         self._format: str = "placeholder" #battle_format
         self._max_concurrent_game: int = max_concurrent_games
@@ -68,14 +148,53 @@ class BasicPlayer(ABC):
         #self._accept_open_team_sheet: bool = accept_open_team_sheet
 
         self._games: Dict[str, AbstractGame] = {}
-        self._game_semaphore: Semaphore = create_in_game_loop(Semaphore, 0)
 
-        self._game_start_condition: Condition = create_in_game_loop(Condition)
-        self._game_count_queue: Queue[Any] = create_in_game_loop(
-            Queue, max_concurrent_games
+        # finished games still in _games, oldest first, with their end time
+        self._finished_games: "OrderedDict[str, float]" = OrderedDict()
+        self._max_finished_games: Optional[int] = max_finished_games
+        self._finished_game_ttl: Optional[float] = finished_game_ttl
+        # wakes up when the oldest finished game expires, so that idle players
+        # evict them too
+        self._eviction_timer: Optional[asyncio.TimerHandle] = None
+        self._game_archive: Optional["GameArchive"] = game_archive
+        self._replay_buffer: Optional["ReplayBuffer"] = replay_buffer
+        self._episode_writer: Optional["EpisodeWriter"] = episode_writer
+        self._metrics: Optional["LatencyMetrics"] = metrics
+        self._records_actions: bool = (
+            replay_buffer is not None or episode_writer is not None
         )
-        self._game_end_condition: Condition = create_in_game_loop(Condition)
-        self._challenge_queue: Queue[Any] = create_in_game_loop(Queue)
+
+        # aggregates over every finished game, evicted or not
+        self._n_won_games: int = 0
+        self._n_lost_games: int = 0
+        self._n_tied_games: int = 0
+        self._n_turns: int = 0
+        self._loop: asyncio.AbstractEventLoop = self.game_client.loop
+        self._game_semaphore: Semaphore = create_in_loop(self._loop, Semaphore, 0)
+
+        # coroutines waiting for a game tag to be registered, by game tag
+        self._game_waiters: Dict[str, List["Future[AbstractGame]"]] = {}
+        self._game_lookup_timeout: Optional[float] = game_lookup_timeout
+        self._game_count_queue: Queue[Any] = create_in_loop(
+            self._loop, Queue, max_concurrent_games
+        )
+        self._game_end_condition: Condition = create_in_loop(self._loop, Condition)
+        # challengers waiting to be accepted. Challenges received while it is full
+        # are dropped: waiting for room would stall the socket, and the games
+        # that would make room with it
+        self._challenge_queue: Queue[Any] = create_in_loop(
+            self._loop, Queue, max_challenge_queue_size
+        )
+        self._queued_challengers: Set[str] = set()
+
+        # challenges sent and whose game has not started yet, oldest first, with
+        # their send time and the list collecting start latencies
+        self._pending_challenges: Deque[Tuple[float, List[float]]] = deque()
+
+        # running games the server has not mentioned since the last reconnection
+        self._resync_timeout: float = resync_timeout
+        self._games_to_resync: Set[str] = set()
+        self._resync_task: Optional["asyncio.Task[None]"] = None
 
         # if isinstance(team, Teambuilder):
         #     self._team = team
@@ -98,7 +217,7 @@ class BasicPlayer(ABC):
             )
         return AccountConfiguration(username, None)
 
-    def _battle_finished_callback(self, battle: AbstractGame):
+    def _game_finished_callback(self, game: AbstractGame):
         pass
 
     # def update_team(self, team: Union[Teambuilder, str]):
@@ -120,50 +239,87 @@ class BasicPlayer(ABC):
         :return: The corresponding battle object.
         :rtype: AbstractGame
         """
-        print("create game")
-        print("create game game info", split_message)
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Creating game from %s", split_message)
         # Battle initialisation
         game_tag = split_message.get("gameTag")
         #game_tag = "-".join(split_message)[1:]
         
         #previous they check if the format is correct
         #if not correct, raise Exception
-        game = Game(
-            game_tag=game_tag,
-            username=self.username,
-            logger=self.logger,
-            #gen=self.gen,
-            #save_replays=self._save_replays,
-        )
+        game = self._new_game(game_tag)
         # clear game queue
         await self._game_count_queue.put(None)
 
         # if there is already a game in the queue, return it
-        if game_tag in self._games:
+        if game_tag in self._games and not self._games[game_tag].finished:
             await self._game_count_queue.get()
             return self._games[game_tag]
         
-        # else add game to games queue
-        async with self._game_start_condition:
-            self._game_semaphore.release()
-            self._game_start_condition.notify_all()
-            self._games[game_tag] = game
-            print("game %s put into self._games" % (game_tag))
+        # else add game to games queue and wake up whoever waits for this tag
+        self._games[game_tag] = game
+        if self._pending_challenges:
+            # the server starts games in the order they were challenged for
+            sent_at, start_latencies = self._pending_challenges.popleft()
+            game.start_latency = perf_counter() - sent_at
+            start_latencies.append(game.start_latency)
+        self._game_semaphore.release()
+        for waiter in self._game_waiters.pop(game_tag, ()):
+            if not waiter.done():
+                waiter.set_result(game)
         
         # if self._start_timer_on_battle_start:
         #     await self.game_client.send_message("/timer on", game.game_tag)
         
         return game
 
-    async def _get_game(self, game_tag: str) -> AbstractGame:
+    def _new_game(self, game_tag: str) -> Game:
+        game = Game(
+            game_tag=game_tag,
+            username=self.username,
+            logger=self.logger,
+            #gen=self.gen,
+            #save_replays=self._save_replays,
+        )
+        if self._replay_buffer is not None:
+            game.record_to(self._replay_buffer)
+        if self._episode_writer is not None:
+            game.record_trajectory()
+        return game
+
+    async def _get_game(
+        self, game_tag: str, timeout: Optional[float] = None
+    ) -> AbstractGame:
+        """Returns the game registered under game_tag, waiting for it if needed.
+
+        :param game_tag: The game identifier.
+        :type game_tag: str
+        :param timeout: How long to wait for the game to be registered. Defaults to
+            the player's game_lookup_timeout, None meaning forever.
+        :type timeout: float, optional
+        :return: The game.
+        :rtype: AbstractGame
+        :raises asyncio.TimeoutError: If the game is not registered in time.
+        """
         #game_tag = game_tag[1:]
-        print("getting game...", game_tag)
-        print(self._games)
-        while True:
-            if game_tag in self._games:
-                return self._games[game_tag]
-            async with self._game_start_condition:
-                await self._game_start_condition.wait()
+        game = self._games.get(game_tag)
+        if game is not None:
+            return game
+
+        waiter: "Future[AbstractGame]" = asyncio.get_running_loop().create_future()
+        waiters = self._game_waiters.setdefault(game_tag, [])
+        waiters.append(waiter)
+        if timeout is None:
+            timeout = self._game_lookup_timeout
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            # on timeout or cancellation, do not leave the waiter behind
+            if not waiter.done() or waiter.cancelled():
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters and self._game_waiters.get(game_tag) is waiters:
+                    del self._game_waiters[game_tag]
 
     # messages come in the form of a dictionary
     # from whichever triggers handle_game_message
@@ -174,100 +330,267 @@ class BasicPlayer(ABC):
         :param split_message: The received battle message.
         :type split_message: str
         """
-        print("handling game message")
         # previous methods split messages from multiple lines
         # then check if the message is init
         # if it is, create a game object
-        print(self._games)
         game_info = gameDict["game_info"]
+        if self._games_to_resync:
+            self._games_to_resync.discard(game_info.get("gameTag"))
+        # stage boundaries of timed frames, see metrics
+        timestamps = gameDict.get("timestamps")
+        # mouse-cheese-server sends final states as moves, with gameOver set
+        game_over = bool(game_info.get("gameOver"))
+        known_game = self._games.get(game_info.get("gameTag"))
+        if known_game is None and game_over:
+            # the end of a game the player did not play, e.g. the server's greeting
+            return
         if (
-            #(gameDict["intent"] == "init") and
-            (gameDict["game_info"].get("gameTag") not in self._games)
+            known_game is None
+            # tags of finished games can be reused, e.g. after a server restart
+            or (
+                known_game.finished
+                and (
+                    gameDict["intent"] == "init"
+                    or (gameDict["intent"] == "move" and not game_over)
+                )
+            )
         ):
-            print("creating game..")
-            print("game info: ", game_info)
             game = await self._create_game(game_info)
         else:
-            print("getting game... becos of previous")
-            print("game: ", gameDict["game_info"].get("gameTag"))
             game = await self._get_game(gameDict["game_info"].get("gameTag"))
-            print(game)
+        if timestamps is not None:
+            timestamps.append(perf_counter_ns())
         
-        if(gameDict["intent"] == "win" or gameDict["intent"] == "tie"):
-            await self._game_count_queue.get()
-            self._game_count_queue.task_done()
-            self._game_finished_callback(game)
-            async with self._game_end_condition:
-                self._game_end_condition.notify_all()
+        if (
+            gameDict["intent"] == "win"
+            or gameDict["intent"] == "tie"
+            or (gameDict["intent"] == "move" and game_over)
+        ):
+            if game.finished:
+                # final states can be broadcast more than once
+                return
+            game.parse_message(game_info)
+            if timestamps is not None:
+                timestamps.append(perf_counter_ns())
+            if game_info.get("winner") is not None:
+                game.won_by(game_info.get("winner"))
+            else:
+                game.tied()
+            await self._finish_game(game)
         elif gameDict["intent"] == "error":
             self.logger.log(25, "Error message received: %s", gameDict["error_message"])
             if game.trapped:
                 await self._handle_game_request(game)
             #todo: add trapped situation in future
+        elif gameDict["intent"] == "init":
+            # registering the game is enough: its first move follows
+            pass
         elif gameDict["intent"] == "move":
-            print("game intent is MOVE!!!")
-            # print(gameDict)
-            # print(game)
-            # print(game_info)
             game.parse_message(game_info)
-            print("currentPlayer: ", game_info.get("currentPlayer"))
+            if timestamps is not None:
+                timestamps.append(perf_counter_ns())
             if game_info.get("currentPlayer") == "blue": 
-                print("current player turn is blue, handling game request...")
-                await self._handle_game_request(game)
+                await self._handle_game_request(game, timestamps)
         else:
             # do nothing here, just parse message and update state
-            print("UNKNOWN GAME INTENT", gameDict)
             self.logger.warning("Unknown game intent: %s", gameDict)
             game.parse_message(game_info)
     
 
+    async def _finish_game(self, game: AbstractGame):
+        """Releases the slot of a finished game and notifies waiters.
+
+        :param game: The finished game.
+        :type game: AbstractGame
+        """
+        await self._game_count_queue.get()
+        self._game_count_queue.task_done()
+
+        if game.won is None:
+            self._n_tied_games += 1
+        elif game.won:
+            self._n_won_games += 1
+        else:
+            self._n_lost_games += 1
+        self._n_turns += game.turn
+        if self._game_archive is not None:
+            self._game_archive.append(game)
+        if self._episode_writer is not None and isinstance(game, Game):
+            self._episode_writer.append(game)
+
+        self._game_finished_callback(game)
+        self._finished_games[game.game_tag] = time.monotonic()
+        self._finished_games.move_to_end(game.game_tag)
+        self._evict_finished_games()
+
+        async with self._game_end_condition:
+            self._game_end_condition.notify_all()
+
+    def _evict_finished_games(self):
+        """Drops finished games beyond max_finished_games or older than
+        finished_game_ttl. Aggregate counters are unaffected.
+
+        Games left are evicted once they expire, on a timer, even if no other game
+        finishes meanwhile."""
+        finished_games = self._finished_games
+        if self._max_finished_games is not None:
+            while len(finished_games) > self._max_finished_games:
+                self._evict_game(finished_games.popitem(last=False)[0])
+        if self._finished_game_ttl is not None and finished_games:
+            oldest = time.monotonic() - self._finished_game_ttl
+            while finished_games and next(iter(finished_games.values())) < oldest:
+                self._evict_game(finished_games.popitem(last=False)[0])
+            if finished_games and self._eviction_timer is None:
+                expires_in = next(iter(finished_games.values())) - oldest
+                self._eviction_timer = self._loop.call_later(
+                    expires_in, self._evict_expired_games
+                )
+
+    def _evict_expired_games(self):
+        self._eviction_timer = None
+        self._evict_finished_games()
+
+    def _evict_game(self, game_tag: str):
+        game = self._games.get(game_tag)
+        # the tag may have been reused by a game that is still running
+        if game is not None and game.finished:
+            del self._games[game_tag]
+
+    async def _handle_reconnection(self):
+        """Gives running games resync_timeout seconds to show up again.
+
+        Games the server does not broadcast by then were lost with the connection:
+        they are closed as ties so that their slots are released.
+        """
+        running = {tag for tag, game in self._games.items() if not game.finished}
+        if not running:
+            return
+        self._games_to_resync = running
+        self.logger.info("Waiting for %d running games to resync", len(running))
+        if self._resync_task is not None:
+            # a previous reconnection's games are all in running again
+            self._resync_task.cancel()
+        self._resync_task = asyncio.ensure_future(self._abandon_unsynced_games())
+
+    async def _handle_stop_listening(self):
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+
+    async def _abandon_unsynced_games(self):
+        await asyncio.sleep(self._resync_timeout)
+        for game_tag in list(self._games_to_resync):
+            self._games_to_resync.discard(game_tag)
+            game = self._games.get(game_tag)
+            if game is None or game.finished:
+                continue
+            self.logger.warning("Game %s was not resynced, abandoning it", game_tag)
+            game.tied()
+            await self._finish_game(game)
+
     async def _handle_game_request(
         self,
         game: AbstractGame,
+        timestamps: Optional[List[int]] = None,
         #from_teampreview_request: bool = False,
         #maybe_default_order: bool = False,
     ):
-        print("handingling game request")
-        message = self.choose_move(game)
-        if isinstance(message, Awaitable):
-            message = await message
-        message = message.message
-
-        await self.game_client.send_message(message, game.game_tag)
-    
-    async def _handle_challenge_request(self, split_message: List[str]):
-        """Handles an individual challenge."""
+        order = self.choose_move(game)
+        if isinstance(order, Awaitable):
+            order = await order
+        if timestamps is not None:
+            timestamps.append(perf_counter_ns())
+
+        if self._records_actions and isinstance(game, Game):
+            game.record_action(DIRECTION_INDEX.get(order.order, -1))  # type: ignore
+
+        await self.game_client.send_order(order, game.game_tag)
+        if timestamps is not None:
+            timestamps.append(perf_counter_ns())
+
+    async def _play_as_red(self, game_tag: str, state: Dict[str, Any]) -> Optional[str]:
+        """Handles a state of a game the player plays as red on another player's
+        server, e.g. in a :class:`~training_env.ladder.Ladder`.
+
+        The player sees the game on the mirrored board, see
+        :func:`~training_env.game_rules.mirror_state`, as blue. The game is
+        registered, recorded and finished like the player's own games, so that its
+        counters, archive, replay buffer and episode writer include it.
+
+        :param game_tag: The game identifier, unique among the player's games.
+        :type game_tag: str
+        :param state: The game state, as broadcast by the server hosting the game.
+        :type state: Dict[str, Any]
+        :return: The chosen direction, on the real board, or None if the game is
+            over.
+        :rtype: str, optional
+        """
+        state = mirror_state(state)
+        state["gameTag"] = game_tag
+        game = self._games.get(game_tag)
+        if state.get("gameOver"):
+            if game is None or game.finished:
+                return None
+            game.parse_message(state)
+            if state.get("winner") is not None:
+                game.won_by(state["winner"])
+            else:
+                game.tied()
+            await self._finish_game(game)
+            return None
+
+        if game is None or game.finished:
+            game = self._new_game(game_tag)
+            await self._game_count_queue.put(None)
+            self._games[game_tag] = game
+        game.parse_message(state)
+        order = self.choose_move(game)
+        if isinstance(order, Awaitable):
+            order = await order
+        if self._records_actions:
+            game.record_action(DIRECTION_INDEX.get(order.order, -1))  # type: ignore
+        return mirror_direction(order.order)  # type: ignore
+
+    async def _handle_challenge_request(self, gameDict: Dict[str, Any]):
+        """Handles an individual challenge.
+
+        :param gameDict: The challenge message, naming the challenger.
+        :type gameDict: Dict[str, Any]
+        """
         # basically queues a challenger
+        challenger = gameDict["game_info"].get("challenger")
+        if challenger:
+            self._queue_challenge(challenger)
 
-        #challenging_player = split_message[2].strip()
-
-        # put a challenger into queue
-        # if challenging_player != self.username:
-        #     if len(split_message) >= 6:
-        #         if split_message[5] == self._format:
-        #             await self._challenge_queue.put(challenging_player)
-
-    async def _update_challenges(self, split_message: List[str]):
+    async def _update_challenges(self, gameDict: Dict[str, Any]):
         """Update internal challenge state.
 
         Add corresponding challenges to internal queue of challenges, where they will be
-        processed if relevant.
+        processed if relevant. Challengers already queued are not queued again.
 
-        :param split_message: Recevied message, split.
-        :type split_message: List[str]
+        :param gameDict: The message listing pending challengers.
+        :type gameDict: Dict[str, Any]
         """
-
-        # assuming the challenges in queue are to update while in queue
-
-        # self.logger.debug("Updating challenges with %s", split_message)
-        # challenges = orjson.loads(split_message[2]).get("challengesFrom", {})
-        # for user, format_ in challenges.items():
-        #     if format_ == self._format:
-        #         await self._challenge_queue.put(user)
+        queued_challengers = self._queued_challengers
+        for challenger in gameDict["game_info"].get("challengesFrom", ()):
+            if challenger not in queued_challengers:
+                self._queue_challenge(challenger)
+
+    def _queue_challenge(self, challenger: str):
+        if challenger == self.username:
+            return
+        try:
+            self._challenge_queue.put_nowait(challenger)
+        except QueueFull:
+            self.logger.warning(
+                "Challenge queue full, dropping challenge from %s", challenger
+            )
+            return
+        self._queued_challengers.add(challenger)
 
     async def accept_challenges(
         self,
-        opponent: Optional[Union[str, List[str]]],
+        opponent: Optional[Union[str, Iterable[str]]],
         n_challenges: int,
         packed_team: Optional[str] = None,
     ):
@@ -276,57 +599,65 @@ class BasicPlayer(ABC):
         If opponent is None, every challenge will be accepted. If opponent if a string,
         all challenges from player with that name will be accepted. If opponent is a
         list all challenges originating from players whose name is in the list will be
-        accepted.
+        accepted. Other challenges are discarded.
 
         Up to n_challenges challenges will be accepted, after what the function will
-        wait for these battles to finish, and then return.
+        wait for these battles to finish, and then return. Challenges are accepted
+        without waiting for the previous games to start, as long as accepted
+        challenges and running games stay within max_concurrent_games.
 
         :param opponent: Players from which challenges will be accepted.
         :type opponent: None, str or list of str
         :param n_challenges: Number of challenges that will be accepted
         :type n_challenges: int
-        :packed_team: Team to use. Defaults to generating a team with the agent's teambuilder.
+        :packed_team: Team to use. Unused, kept for compatibility.
         :type packed_team: string, optional.
         """
-        # if packed_team is None:
-        #     packed_team = self.next_team
-
-        # await handle_threaded_coroutines(
-        #     self._accept_challenges(opponent, n_challenges, packed_team)
-        # )
-        pass
+        await handle_threaded_coroutines(
+            self._accept_challenges(opponent, n_challenges, packed_team), self._loop
+        )
 
     async def _accept_challenges(
         self,
-        opponent: Optional[Union[str, List[str]]],
+        opponent: Optional[Union[str, Iterable[str]]],
         n_challenges: int,
         packed_team: Optional[str],
     ):
-        # if opponent:
-        #     if isinstance(opponent, list):
-        #         opponent = [to_id_str(o) for o in opponent]
-        #     else:
-        #         opponent = to_id_str(opponent)
-        # await self.ps_client.logged_in.wait()
-        # self.logger.debug("Event logged in received in accept_challenge")
-
-        # for _ in range(n_challenges):
-        #     while True:
-        #         username = to_id_str(await self._challenge_queue.get())
-        #         self.logger.debug(
-        #             "Consumed %s from challenge queue in accept_challenge", username
-        #         )
-        #         if (
-        #             (opponent is None)
-        #             or (opponent == username)
-        #             or (isinstance(opponent, list) and (username in opponent))
-        #         ):
-        #             await self.ps_client.accept_challenge(username, packed_team)
-        #             await self._battle_semaphore.acquire()
-        #             break
-        # await self._battle_count_queue.join()
-        pass
+        accepted: Optional[FrozenSet[str]]
+        if opponent is None:
+            accepted = None
+        elif isinstance(opponent, str):
+            accepted = frozenset((opponent,))
+        else:
+            accepted = frozenset(opponent)
+        await self.game_client.logged_in.wait()
+
+        start_time = perf_counter()
+        start_latencies: List[float] = []
+        challenge_queue = self._challenge_queue
+        queued_challengers = self._queued_challengers
 
+        for _ in range(n_challenges):
+            while True:
+                username = await challenge_queue.get()
+                queued_challengers.discard(username)
+                if accepted is None or username in accepted:
+                    break
+                self.logger.debug("Discarding challenge from %s", username)
+            await self._wait_for_free_slot()
+            self._pending_challenges.append((perf_counter(), start_latencies))
+            await self.game_client.accept_challenge(username, packed_team)
+
+        # every game started releases the semaphore once
+        for _ in range(n_challenges):
+            await self._game_semaphore.acquire()
+        await self._game_count_queue.join()
+        self.logger.info(
+            "Accepted challenges (%d games) finished in %fs",
+            n_challenges,
+            perf_counter() - start_time,
+        )
+        self._log_start_latencies(start_latencies)
 
     @abstractmethod
     def choose_move(
@@ -354,7 +685,7 @@ class BasicPlayer(ABC):
         if available_moves:
             return available_moves[int(random.random() * len(available_moves))]
         else:
-            print("choosing default move")
+            self.logger.debug("No available move in game %s", game.game_tag)
             return self.choose_default_move()
         
     def choose_random_move(self, game: AbstractGame) -> GameOrder:
@@ -366,14 +697,17 @@ class BasicPlayer(ABC):
         :rtype: str
         """
         if isinstance(game, Game):
-            print("choosing random singles move")
             return self.choose_random_singles_move(game)
         else:
             raise ValueError("Invalid game type. Received %d" % type(game))
 
 
     async def send_challenges(
-        self, opponent: str, n_challenges: int, to_wait: Optional[Event] = None
+        self,
+        opponent: str,
+        n_challenges: int,
+        to_wait: Optional[Event] = None,
+        pipelined: bool = False,
     ):
         """Make the player send challenges to opponent.
 
@@ -384,60 +718,220 @@ class BasicPlayer(ABC):
         to_wait is an optional event that can be set, in which case it will be waited
         before launching challenges.
 
+        By default, each challenge is sent once the previous one's game has started
+        and running games leave room for one more game. In pipelined mode,
+        challenges are sent without waiting, as long as challenges in flight and
+        running games stay within max_concurrent_games.
+
         :param opponent: Player username to challenge.
         :type opponent: str
         :param n_challenges: Number of battles that will be started
         :type n_challenges: int
         :param to_wait: Optional event to wait before launching challenges.
         :type to_wait: Event, optional.
+        :param pipelined: Whether to keep several challenges in flight. Defaults to
+            False.
+        :type pipelined: bool
         """
         await handle_threaded_coroutines(
-            self._send_challenges(opponent, n_challenges, to_wait)
+            self._send_challenges(opponent, n_challenges, to_wait, pipelined),
+            self._loop,
         )
 
     async def _send_challenges(
-        self, opponent: str, n_challenges: int, to_wait: Optional[Event] = None
+        self,
+        opponent: str,
+        n_challenges: int,
+        to_wait: Optional[Event] = None,
+        pipelined: bool = False,
     ):
-        print("sending challenge...")
         # make client loggin and wait
-        await self.game_client.logged_in.wait() # wait for successful login (we mnanually login at every message)
+        await self.game_client.logged_in.wait() # wait for successful login (set on the server's greeting)
         # self.logger.info("Event logged in received in send challenge")
 
         if to_wait is not None:
             await to_wait.wait()
 
         start_time = perf_counter()
+        start_latencies: List[float] = []
 
-        for _ in range(n_challenges):
-            #await self.game_client.challenge(opponent, self._format, self.next_team)
-            await self.game_client.challenge(opponent, self._format, "placeholder")
-            await self._game_semaphore.acquire()
+        if pipelined:
+            await self._send_pipelined_challenges(opponent, n_challenges, start_latencies)
+        else:
+            for _ in range(n_challenges):
+                # mouse-cheese-server resets its single game on START_GAME: never
+                # challenge while that would end one of the player's running games
+                await self._wait_for_free_slot()
+                #await self.game_client.challenge(opponent, self._format, self.next_team)
+                self._pending_challenges.append((perf_counter(), start_latencies))
+                await self.game_client.challenge(opponent, self._format, "placeholder")
+                await self._game_semaphore.acquire()
         await self._game_count_queue.join()
-        print("Challenges (%d games) finished in %fs",
-            n_challenges,
-            perf_counter() - start_time,)
         self.logger.info(
             "Challenges (%d games) finished in %fs",
             n_challenges,
             perf_counter() - start_time,
         )
-    
+        self._log_start_latencies(start_latencies)
+
+    async def _send_pipelined_challenges(
+        self, opponent: str, n_challenges: int, start_latencies: List[float]
+    ):
+        for _ in range(n_challenges):
+            await self._wait_for_free_slot()
+            self._pending_challenges.append((perf_counter(), start_latencies))
+            await self.game_client.challenge(opponent, self._format, "placeholder")
+
+        # every game started releases the semaphore once
+        for _ in range(n_challenges):
+            await self._game_semaphore.acquire()
+
+    def _has_free_slot(self) -> bool:
+        return (
+            len(self._pending_challenges) + self._game_count_queue.qsize()
+            < self._max_concurrent_game
+        )
+
+    async def _wait_for_free_slot(self):
+        """Waits until challenges in flight and running games leave room for one more
+        game. Slots are freed as games finish."""
+        if not self._has_free_slot():
+            async with self._game_end_condition:
+                await self._game_end_condition.wait_for(self._has_free_slot)
+
+    def _log_start_latencies(self, start_latencies: List[float]):
+        if start_latencies:
+            self.logger.info(
+                "Game start latency: mean %.2fms, max %.2fms",
+                sum(start_latencies) / len(start_latencies) * 1e3,
+                max(start_latencies) * 1e3,
+            )
+
+    async def play_local_game(
+        self,
+        opponent: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        max_turns: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Plays one game, as blue, on the player's LocalGameServer.
+
+        :param opponent: Red policy for this game, see
+            :meth:`LocalGameServer.play_game`. Defaults to the server's opponent.
+        :type opponent: Callable[[Dict[str, Any]], Any], optional
+        :param max_turns: If set, overrides the server's max_turns for this game.
+        :type max_turns: int, optional
+        :return: The final state.
+        :rtype: Dict[str, Any]
+        """
+        if not isinstance(self.game_client, LocalGameClient):
+            raise ValueError(
+                "%s is not connected to a LocalGameServer" % self.username
+            )
+        return await handle_threaded_coroutines(
+            self._play_local_game(opponent, max_turns), self._loop
+        )
+
+    async def _play_local_game(
+        self,
+        opponent: Optional[Callable[[Dict[str, Any]], Any]],
+        max_turns: Optional[int],
+    ) -> Dict[str, Any]:
+        await self.game_client.logged_in.wait()
+        client: LocalGameClient = self.game_client  # type: ignore
+        state = await client.game_server.play_game(client, opponent, max_turns)
+        # every game started releases the semaphore once
+        await self._game_semaphore.acquire()
+        return state
+
+    async def ladder(self, n_games: int):
+        """Plays n_games against opponents picked by the server.
+
+        Challenges are pipelined, see :meth:`send_challenges`. To rate players
+        against each other, see :class:`~training_env.ladder.Ladder`.
+
+        :param n_games: Number of games to play.
+        :type n_games: int
+        """
+        await self.send_challenges("", n_games, pipelined=True)
+
     def reset_games(self):
-        """Resets the player's inner battle tracker."""
-        for battle in list(self._games.values()):
-            if not battle.finished:
+        """Resets the player's inner game tracker and aggregate counters."""
+        for game in list(self._games.values()):
+            if not game.finished:
                 raise EnvironmentError(
-                    "Can not reset player's battles while they are still running"
+                    "Can not reset player's games while they are still running"
                 )
         self._games = {}
+        self._finished_games.clear()
+        if self._eviction_timer is not None:
+            self._eviction_timer.cancel()
+            self._eviction_timer = None
+        self._n_won_games = 0
+        self._n_lost_games = 0
+        self._n_tied_games = 0
+        self._n_turns = 0
 
     @property
     def games(self) -> Dict[str, AbstractGame]:
         return self._games
+
+    @property
+    def replay_buffer(self) -> Optional["ReplayBuffer"]:
+        return self._replay_buffer
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The loop the player runs on.
+
+        :return: The loop.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return self._loop
+
+    @property
+    def metrics(self) -> Optional["LatencyMetrics"]:
+        """Latency histograms of the player's turns, if it records them.
+
+        :return: The metrics.
+        :rtype: LatencyMetrics, optional
+        """
+        return self._metrics
+
+    @property
+    def episode_writer(self) -> Optional["EpisodeWriter"]:
+        return self._episode_writer
+
+    @property
+    def game_archive(self) -> Optional["GameArchive"]:
+        return self._game_archive
+
+    @property
+    def n_finished_games(self) -> int:
+        return self._n_won_games + self._n_lost_games + self._n_tied_games
+
+    @property
+    def max_concurrent_games(self) -> int:
+        return self._max_concurrent_game
+
+    @property
+    def n_won_games(self) -> int:
+        return self._n_won_games
+
+    @property
+    def n_lost_games(self) -> int:
+        return self._n_lost_games
+
+    @property
+    def n_tied_games(self) -> int:
+        return self._n_tied_games
+
+    @property
+    def n_turns(self) -> int:
+        return self._n_turns
     
     @property
     def win_rate(self) -> float:
-        return self.n_won_battles / self.n_finished_battles
+        n_finished_games = self.n_finished_games
+        return self._n_won_games / n_finished_games if n_finished_games else 0.0
 
     @property
     def logger(self) -> Logger:
@@ -446,3 +940,36 @@ class BasicPlayer(ABC):
     @property
     def username(self) -> str:
         return self.game_client.username
+
+
+async def wait_for_players(players: Iterable[BasicPlayer], timeout: Optional[float] = None):
+    """Startup barrier: waits until every player is logged in.
+
+    Launchers can start a fleet of players, possibly spread over several loops, and
+    await this before sending challenges.
+
+    :param players: The players.
+    :type players: Iterable[BasicPlayer]
+    :param timeout: How long to wait for, in seconds. If None, waits forever.
+    :type timeout: float, optional
+    :raises asyncio.TimeoutError: If some players are not logged in in time.
+    """
+    players = list(players)
+    waits = [
+        asyncio.ensure_future(player.game_client.wait_for_login(wait_for=None))
+        for player in players
+    ]
+    if not waits:
+        return
+    done, pending = await asyncio.wait(waits, timeout=timeout)
+    for wait in pending:
+        wait.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        late = [player.username for player, wait in zip(players, waits) if wait in pending]
+        raise asyncio.TimeoutError(
+            "%d of %d players not logged in after %ss: %s"
+            % (len(late), len(players), timeout, ", ".join(late[:10]))
+        )
+    for wait in done:
+        wait.result()
@@ -0,0 +1,145 @@
+"""This module defines a player evaluating its pending decisions in batches
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .abstract_game import AbstractGame
+from .basicPlayer import BasicPlayer
+from .game import Game
+from .game_order import GameOrder
+from .game_rules import DIRECTIONS
+from .game_state import OBSERVATION_SIZE
+from .replay_buffer import LEGAL_MASK_TABLE
+
+_ORDERS = [GameOrder(direction) for direction in DIRECTIONS]  # type: ignore
+
+
+class BatchedPolicyPlayer(BasicPlayer):
+    """Player answering the decisions of all its concurrent games with one call.
+
+    ``choose_move`` does not decide right away: it queues the game and returns a
+    future. Queued games are evaluated together by :meth:`choose_moves` once
+    ``max_batch_size`` games are waiting, or ``batch_window`` seconds after the first
+    one was queued, whichever comes first.
+
+    Either override :meth:`choose_moves` or pass a ``policy`` callable with the same
+    signature, e.g. a wrapper around a neural network forward pass.
+    """
+
+    def __init__(
+        self,
+        account_configuration: Any = None,
+        *,
+        policy: Optional[Callable[[np.ndarray, np.ndarray], Any]] = None,
+        batch_window: float = 0.002,
+        max_batch_size: int = 64,
+        **kwargs: Any,
+    ):
+        """
+        :param account_configuration: Account configuration. Optional.
+        :type account_configuration: AccountConfiguration, optional
+        :param policy: Callable mapping ``(n, 7)`` observations and ``(n, 4)`` legal
+            masks to ``(n,)`` action indices. Used by the default choose_moves.
+        :type policy: Callable[[np.ndarray, np.ndarray], np.ndarray], optional
+        :param batch_window: How long the first queued decision waits for others, in
+            seconds.
+        :type batch_window: float
+        :param max_batch_size: Number of queued decisions triggering an evaluation
+            right away.
+        :type max_batch_size: int
+        :param kwargs: Passed to BasicPlayer. dispatcher_workers defaults to
+            max_batch_size, or to BasicPlayer's default of 8 if that is larger, so
+            that enough frames are handled concurrently to fill a batch.
+        """
+        kwargs.setdefault("dispatcher_workers", max(8, max_batch_size))
+        super().__init__(account_configuration, **kwargs)
+        self._policy = policy
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+
+        self._pending: List[Tuple[Game, "asyncio.Future[GameOrder]"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._observations = np.zeros((max_batch_size, OBSERVATION_SIZE), dtype=np.int8)
+        self._legal_masks = np.zeros((max_batch_size, len(DIRECTIONS)), dtype=bool)
+
+        self._n_batches = 0
+        self._n_decisions = 0
+
+    def choose_moves(self, observations: np.ndarray, legal_masks: np.ndarray) -> Any:
+        """Chooses an action in many games at once.
+
+        Inputs are views of buffers reused by the next batch: copy them to keep them.
+
+        :param observations: ``(n, 7)`` observations, in the VectorGameEnv layout.
+        :type observations: np.ndarray
+        :param legal_masks: ``(n, 4)`` legal moves masks.
+        :type legal_masks: np.ndarray
+        :return: ``(n,)`` indices into DIRECTIONS. Illegal or negative actions are
+            replaced by random legal moves.
+        :rtype: np.ndarray
+        """
+        if self._policy is None:
+            raise NotImplementedError(
+                "Pass a policy or override choose_moves to use BatchedPolicyPlayer"
+            )
+        return self._policy(observations, legal_masks)
+
+    def choose_move(self, game: AbstractGame) -> Any:
+        if not isinstance(game, Game):
+            return self.choose_random_move(game)
+
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[GameOrder]" = loop.create_future()
+        self._pending.append((game, future))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        n = len(pending)
+        observations = self._observations[:n]
+        legal_masks = self._legal_masks[:n]
+        for i, (game, _) in enumerate(pending):
+            state = game.state
+            state.write_observation(observations[i])
+            legal_masks[i] = LEGAL_MASK_TABLE[state.legal_mask]
+
+        try:
+            actions = np.asarray(self.choose_moves(observations, legal_masks))
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._n_batches += 1
+        self._n_decisions += n
+        for i, (game, future) in enumerate(pending):
+            if future.done():
+                continue
+            action = int(actions[i])
+            if 0 <= action < len(DIRECTIONS) and legal_masks[i, action]:
+                future.set_result(_ORDERS[action])
+            else:
+                future.set_result(self.choose_random_move(game))
+
+    @property
+    def mean_batch_size(self) -> float:
+        """
+        :return: Average number of decisions per policy call.
+        :rtype: float
+        """
+        return self._n_decisions / self._n_batches if self._n_batches else 0.0
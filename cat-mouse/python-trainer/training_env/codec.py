@@ -0,0 +1,117 @@
+"""This module defines the codecs used to decode server frames and encode orders.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class JsonCodec:
+    """Codec relying on the standard library json module."""
+
+    name = "json"
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        """
+        :param message: The received frame.
+        :type message: str or bytes
+        :return: The decoded frame.
+        :rtype: Any
+        """
+        return json.loads(message)
+
+    def encode(self, obj: Any) -> str:
+        """
+        :param obj: The object to send.
+        :type obj: Any
+        :return: The encoded text frame.
+        :rtype: str
+        """
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec relying on orjson. Requires orjson to be installed."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires orjson to be installed")
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        return orjson.loads(message)
+
+    def encode(self, obj: Any) -> str:
+        # Frames are sent as text: websockets sends bytes as binary frames
+        return orjson.dumps(obj).decode()
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """Returns a codec by name, or the fastest one available if name is None.
+
+    :param name: "json", "orjson" or None.
+    :type name: str, optional
+    :return: The codec.
+    :rtype: JsonCodec
+    """
+    if name is None:
+        return OrjsonCodec() if orjson is not None else JsonCodec()
+    if name == OrjsonCodec.name:
+        return OrjsonCodec()
+    if name == JsonCodec.name:
+        return JsonCodec()
+    raise ValueError("Unknown codec %s" % name)
+
+
+DEFAULT_CODEC = get_codec()
+
+
+@lru_cache(maxsize=64)
+def encode_order(player: str, direction: Any) -> str:
+    """Returns the encoded MOVE order of player in direction.
+
+    There are only a handful of (player, direction) pairs, so orders are encoded
+    once and then served from the cache.
+
+    :param player: The moving player, red or blue.
+    :type player: str
+    :param direction: The direction to move in.
+    :type direction: str
+    :return: The encoded order.
+    :rtype: str
+    """
+    return DEFAULT_CODEC.encode({"type": "MOVE", "player": player, "direction": direction})
+
+
+@lru_cache(maxsize=64)
+def encode_start_game(opponent: str = "") -> str:
+    """Returns the encoded START_GAME message.
+
+    :param opponent: The opponent to play against. If empty, the server picks one.
+    :type opponent: str
+    :return: The encoded message.
+    :rtype: str
+    """
+    if not opponent:
+        return DEFAULT_CODEC.encode({"type": "START_GAME"})
+    return DEFAULT_CODEC.encode({"type": "START_GAME", "opponent": opponent})
+
+
+START_GAME_MESSAGE = encode_start_game()
+
+
+def encode_accept_challenge(challenger: str) -> str:
+    """Returns the encoded ACCEPT_CHALLENGE message.
+
+    :param challenger: The player whose challenge is accepted.
+    :type challenger: str
+    :return: The encoded message.
+    :rtype: str
+    """
+    return DEFAULT_CODEC.encode({"type": "ACCEPT_CHALLENGE", "challenger": challenger})
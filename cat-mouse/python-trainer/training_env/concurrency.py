@@ -1,72 +1,248 @@
+"""This module defines the event loops players and clients run on.
+
+Loops run forever on daemon threads, grouped in :class:`LoopGroup` objects. By
+default, everything runs on GAME_LOOP, the single loop of GAME_LOOP_GROUP. Players
+can instead be spread over the loops of a larger group, or run on a loop the caller
+already runs, e.g. the one of ``asyncio.run``.
+
+Importing this module has no side effect: the default group, and its thread, are
+only started the first time they are needed.
+"""
+
 import asyncio
 import atexit
 import sys
+import zlib
+from itertools import count
 from logging import CRITICAL, disable
-from threading import Thread
-from typing import Any, List
+from threading import Lock, Thread
+from typing import Any, Hashable, List, Optional
+
+# How a LoopGroup assigns loops to players
+ROUND_ROBIN = "round_robin"
+HASH = "hash"
 
 
-def __run_loop(loop: asyncio.AbstractEventLoop):
+def _run_loop(loop: asyncio.AbstractEventLoop):
     asyncio.set_event_loop(loop)
     loop.run_forever()
 
 
-def __stop_loop(loop: asyncio.AbstractEventLoop, thread: Thread):
-    disable(CRITICAL)
-    tasks: List[asyncio.Task[Any]] = []
-    for task in asyncio.all_tasks(loop):
+async def _cancel_tasks():
+    current = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current]
+    for task in tasks:
         task.cancel()
-        tasks.append(task)
-
-    cancelled = False
-    shutdown = asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop)
-    shutdown.result()
-
-    while not cancelled:
-        cancelled = True
-        for task in tasks:
-            if not task.done():
-                cancelled = False
-
-    loop.call_soon_threadsafe(loop.stop)
-    thread.join()
-    loop.call_soon_threadsafe(loop.close)
-
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+class LoopGroup:
+    """Event loops, each running forever on its own daemon thread.
+
+    Players are assigned a loop either round-robin or by hashing a key, typically
+    their username, so that a given player always lands on the same loop.
+    """
+
+    def __init__(
+        self,
+        n_loops: int = 1,
+        *,
+        assignment: str = ROUND_ROBIN,
+        use_uvloop: bool = True,
+        name: str = "game-loop",
+    ):
+        """
+        :param n_loops: Number of loops, and threads.
+        :type n_loops: int
+        :param assignment: ROUND_ROBIN or HASH.
+        :type assignment: str
+        :param use_uvloop: Whether to use uvloop loops, if uvloop is installed.
+        :type use_uvloop: bool
+        :param name: Prefix of the threads' names.
+        :type name: str
+        """
+        if n_loops < 1:
+            raise ValueError("A loop group needs at least one loop")
+        if assignment not in (ROUND_ROBIN, HASH):
+            raise ValueError("Unknown loop assignment: %s" % assignment)
+        self._assignment = assignment
+        self._counter = count()
+        self._loops: List[asyncio.AbstractEventLoop] = []
+        self._threads: List[Thread] = []
+
+        new_event_loop = asyncio.new_event_loop
+        if use_uvloop:
+            try:
+                import uvloop
+
+                new_event_loop = uvloop.new_event_loop
+            except ImportError:  # pragma: no cover
+                pass
+
+        for i in range(n_loops):
+            loop = new_event_loop()
+            thread = Thread(
+                target=_run_loop, args=(loop,), name="%s-%d" % (name, i), daemon=True
+            )
+            thread.start()
+            self._loops.append(loop)
+            self._threads.append(thread)
+
+    def next_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        :return: The next loop, round-robin.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return self._loops[next(self._counter) % len(self._loops)]
+
+    def loop_for(self, key: Hashable) -> asyncio.AbstractEventLoop:
+        """
+        :param key: Any key, e.g. a username.
+        :type key: Hashable
+        :return: The loop key hashes to. Stable across processes.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return self._loops[zlib.crc32(str(key).encode()) % len(self._loops)]
+
+    def assign(self, key: Optional[Hashable] = None) -> asyncio.AbstractEventLoop:
+        """Returns a loop following the group's assignment.
+
+        :param key: The key to hash, for HASH assignment.
+        :type key: Hashable, optional
+        :return: The assigned loop.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        if self._assignment == HASH:
+            return self.loop_for(key)
+        return self.next_loop()
+
+    def close(self, timeout: Optional[float] = None):
+        """Cancels every task, stops the loops and joins their threads.
+
+        :param timeout: How long to wait for each loop's tasks to be cancelled.
+        :type timeout: float, optional
+        """
+        for loop, thread in zip(self._loops, self._threads):
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(_cancel_tasks(), loop).result(timeout)
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join(timeout)
+            if not loop.is_running():
+                loop.close()
+
+    def __contains__(self, loop: Any) -> bool:
+        return loop in self._loops
+
+    def __len__(self) -> int:
+        return len(self._loops)
+
+    @property
+    def loops(self) -> List[asyncio.AbstractEventLoop]:
+        return self._loops
+
+
+async def _create_in_loop_async(cls_: Any, *args: Any, **kwargs: Any) -> Any:
+    return cls_(*args, **kwargs)
 
-def __clear_loop():
-    __stop_loop(GAME_LOOP, _t)
 
+def create_in_loop(
+    loop: asyncio.AbstractEventLoop, cls_: Any, *args: Any, **kwargs: Any
+) -> Any:
+    """Creates an asyncio synchronisation primitive to be used on loop.
 
-async def _create_in_game_loop_async(cls_: Any, *args: Any, **kwargs: Any) -> Any:
-    return cls_(*args, **kwargs)
+    Since Python 3.10, primitives bind to the loop they are first used on and are
+    created right away. Before, they are created on loop itself.
 
-
-def create_in_game_loop(cls_: Any, *args: Any, **kwargs: Any) -> Any:
+    :param loop: The loop the primitive will be used on.
+    :type loop: asyncio.AbstractEventLoop
+    :param cls_: The primitive's class, e.g. asyncio.Event.
+    :type cls_: type
+    :return: The primitive.
+    :rtype: Any
+    """
+    if sys.version_info >= (3, 10):
+        return cls_(*args, **kwargs)
     try:
-        # Python >= 3.7
-        loop = asyncio.get_running_loop()
-    except AttributeError:
-        # Python < 3.7 so get_event_loop won't raise exceptions
-        loop = asyncio.get_event_loop()
+        running_loop = asyncio.get_running_loop()
     except RuntimeError:
-        # asyncio.get_running_loop raised exception so no loop is running
-        loop = None
-    if loop == GAME_LOOP:
+        # no loop is running
+        running_loop = None
+    if running_loop is loop:
         return cls_(*args, **kwargs)
-    else:
-        return asyncio.run_coroutine_threadsafe(
-            _create_in_game_loop_async(cls_, *args, **kwargs), GAME_LOOP
-        ).result()
+    return asyncio.run_coroutine_threadsafe(
+        _create_in_loop_async(cls_, *args, **kwargs), loop
+    ).result()
 
 
-async def handle_threaded_coroutines(coro: Any):
-    task = asyncio.run_coroutine_threadsafe(coro, GAME_LOOP)
+def create_in_game_loop(cls_: Any, *args: Any, **kwargs: Any) -> Any:
+    return create_in_loop(get_game_loop(), cls_, *args, **kwargs)
+
+
+async def handle_threaded_coroutines(
+    coro: Any, loop: Optional[asyncio.AbstractEventLoop] = None
+):
+    """Runs coro on loop and waits for its result from the running loop.
+
+    :param coro: The coroutine.
+    :type coro: Coroutine
+    :param loop: The loop to run it on. Defaults to GAME_LOOP.
+    :type loop: asyncio.AbstractEventLoop, optional
+    :return: The coroutine's result.
+    """
+    if loop is None:
+        loop = get_game_loop()
+    if loop is asyncio.get_running_loop():
+        # already there: no need to go through another thread
+        return await coro
+    task = asyncio.run_coroutine_threadsafe(coro, loop)
     await asyncio.wrap_future(task)
     return task.result()
 
 
-GAME_LOOP = asyncio.new_event_loop()
+_game_loop_group: Optional[LoopGroup] = None
+_game_loop_group_lock = Lock()
+
+
+def __clear_loop_group():
+    disable(CRITICAL)
+    if _game_loop_group is not None:
+        _game_loop_group.close()
+
+
+def get_game_loop_group() -> LoopGroup:
+    """Returns the default loop group, starting it on first call.
+
+    :return: GAME_LOOP_GROUP.
+    :rtype: LoopGroup
+    """
+    global _game_loop_group
+    if _game_loop_group is None:
+        with _game_loop_group_lock:
+            if _game_loop_group is None:
+                _game_loop_group = LoopGroup(1)
+                atexit.register(__clear_loop_group)
+    return _game_loop_group
+
+
+def get_game_loop() -> asyncio.AbstractEventLoop:
+    """Returns the default loop, starting it on first call.
+
+    :return: GAME_LOOP.
+    :rtype: asyncio.AbstractEventLoop
+    """
+    return get_game_loop_group().loops[0]
+
+
+def __getattr__(name: str) -> Any:
+    # GAME_LOOP and GAME_LOOP_GROUP are started when first accessed
+    if name == "GAME_LOOP":
+        return get_game_loop()
+    if name == "GAME_LOOP_GROUP":
+        return get_game_loop_group()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 py_ver = sys.version_info
-_t = Thread(target=__run_loop, args=(GAME_LOOP,), daemon=True)
-_t.start()
-atexit.register(__clear_loop)
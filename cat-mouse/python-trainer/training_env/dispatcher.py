@@ -0,0 +1,141 @@
+"""This module defines an ordered, bounded dispatcher for incoming messages.
+"""
+
+import asyncio
+from collections import deque
+from logging import Logger, getLogger
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+
+class MessageDispatcher:
+    """Hands messages to a handler from a fixed pool of worker coroutines.
+
+    Messages are queued by key (typically a game tag). Messages sharing a key are
+    handled strictly in arrival order, one at a time, while different keys are
+    handled in parallel. Queues are bounded: ``put`` waits when the key's queue or
+    the dispatcher as a whole is full, which slows down whoever produces messages,
+    e.g. the websocket reader.
+
+    Since workers are a fixed pool, handlers should not wait on messages from
+    other keys for longer than necessary.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        *,
+        n_workers: int = 8,
+        max_queue_size: int = 64,
+        max_pending: int = 1024,
+        logger: Optional[Logger] = None,
+    ):
+        """
+        :param handler: Coroutine function called with each message.
+        :type handler: Callable[[Any], Awaitable[Any]]
+        :param n_workers: Number of worker coroutines.
+        :type n_workers: int
+        :param max_queue_size: Maximum number of queued messages per key.
+        :type max_queue_size: int
+        :param max_pending: Maximum number of queued messages overall.
+        :type max_pending: int
+        :param logger: Logger used to report handler errors. Defaults to a module
+            logger.
+        :type logger: Logger, optional
+        """
+        self._handler = handler
+        self._n_workers = n_workers
+        self._max_queue_size = max_queue_size
+        self._max_pending = max_pending
+        self._logger: Logger = logger if logger is not None else getLogger(__name__)
+
+        # a key is in _queues while it has messages queued or being handled
+        self._queues: Dict[Hashable, Deque[Any]] = {}
+        self._ready: Optional["asyncio.Queue[Hashable]"] = None
+        self._workers: List["asyncio.Task[Any]"] = []
+        self._n_pending = 0
+
+        self._key_waiters: Dict[Hashable, List["asyncio.Future[Any]"]] = {}
+        self._pending_waiters: Deque["asyncio.Future[Any]"] = deque()
+
+    def _start(self):
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self._n_workers)
+        ]
+
+    async def put(self, key: Hashable, message: Any):
+        """Queues a message, waiting for room if needed.
+
+        :param key: Messages with the same key are handled in order.
+        :type key: Hashable
+        :param message: The message to pass to the handler.
+        :type message: Any
+        """
+        if not self._workers:
+            self._start()
+        loop = asyncio.get_running_loop()
+
+        while self._n_pending >= self._max_pending:
+            waiter = loop.create_future()
+            self._pending_waiters.append(waiter)
+            await waiter
+
+        queue = self._queues.get(key)
+        while queue is not None and len(queue) >= self._max_queue_size:
+            waiter = loop.create_future()
+            self._key_waiters.setdefault(key, []).append(waiter)
+            await waiter
+            queue = self._queues.get(key)
+
+        self._n_pending += 1
+        if queue is None:
+            self._queues[key] = deque((message,))
+            self._ready.put_nowait(key)  # type: ignore
+        else:
+            queue.append(message)
+
+    async def _work(self):
+        ready = self._ready
+        while True:
+            key = await ready.get()  # type: ignore
+            queue = self._queues[key]
+            message = queue.popleft()
+            try:
+                await self._handler(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.exception(e)
+            finally:
+                self._n_pending -= 1
+                self._wake(self._key_waiters.pop(key, ()))
+                if self._pending_waiters:
+                    self._wake((self._pending_waiters.popleft(),))
+
+                if queue:
+                    # back of the line, so that busy keys do not starve others
+                    ready.put_nowait(key)  # type: ignore
+                else:
+                    del self._queues[key]
+
+    @staticmethod
+    def _wake(waiters: Any):
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def close(self):
+        """Cancels the workers. Queued messages are dropped."""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queues.clear()
+        self._n_pending = 0
+
+    @property
+    def n_pending(self) -> int:
+        """
+        :return: Number of messages queued or being handled.
+        :rtype: int
+        """
+        return self._n_pending
@@ -0,0 +1,311 @@
+"""This module defines a columnar on-disk store of finished game episodes.
+
+A store is a directory of shards. Each shard is a directory holding one ``.npy`` file
+per column, with one row per action, and an ``episodes.npy`` index giving the first
+row, length and outcome of every episode it contains. Episodes never span shards.
+
+Columns are:
+
+- ``observations``: ``(n, 7)`` int8, in the VectorGameEnv layout;
+- ``legal_masks``: ``(n, 4)`` bool;
+- ``actions``: ``(n,)`` int8;
+- ``rewards``: ``(n,)`` float32, nonzero only on the last action of won or lost
+  episodes;
+- ``dones``: ``(n,)`` bool, set on the last action of each episode.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .game import TRAJECTORY_RECORD_SIZE, Game
+from .game_archive import OUTCOME_LOST, OUTCOME_WON, game_outcome
+from .game_rules import BOARD_SIZE, DIRECTIONS
+from .game_state import (
+    BLUE_COL,
+    BLUE_ROW,
+    CHEESE_COL,
+    CHEESE_ROW,
+    CURRENT_PLAYER,
+    OBSERVATION_SIZE,
+    RED_COL,
+    RED_ROW,
+)
+from .replay_buffer import LEGAL_MASK_TABLE
+
+EPISODE_DTYPE = np.dtype(
+    [
+        ("start", np.int64),
+        ("length", np.int32),
+        ("outcome", np.int8),
+    ]
+)
+
+COLUMNS = ("observations", "legal_masks", "actions", "rewards", "dones")
+
+_SHARD_FORMAT = "shard-%06d"
+
+
+def _empty_columns(n_turns: int) -> Dict[str, np.ndarray]:
+    return {
+        "observations": np.zeros((n_turns, OBSERVATION_SIZE), dtype=np.int8),
+        "legal_masks": np.zeros((n_turns, len(DIRECTIONS)), dtype=bool),
+        "actions": np.zeros(n_turns, dtype=np.int8),
+        "rewards": np.zeros(n_turns, dtype=np.float32),
+        "dones": np.zeros(n_turns, dtype=bool),
+    }
+
+
+def _shard_directories(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("shard-")
+        and os.path.exists(os.path.join(directory, name, "episodes.npy"))
+    )
+
+
+class EpisodeWriter:
+    """Appends finished episodes to a store, one shard every ``shard_size`` actions.
+
+    Episodes are buffered in preallocated arrays and written when a shard is full or
+    when the writer is flushed. Writes are serialised by a lock, so that players on
+    different threads can share a writer.
+    """
+
+    def __init__(self, directory: str, shard_size: int = 1 << 20):
+        """
+        :param directory: The store directory. Created if needed; new shards are
+            added after existing ones.
+        :type directory: str
+        :param shard_size: Number of actions per shard.
+        :type shard_size: int
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._shard_size = shard_size
+        self._lock = threading.Lock()
+
+        self._n_shards = len(_shard_directories(directory))
+        self._columns = _empty_columns(shard_size)
+        self._episodes: List[Any] = []
+        self._n_turns = 0
+
+    def append(self, game: Game):
+        """Appends a finished game whose trajectory was recorded.
+
+        :param game: The game.
+        :type game: Game
+        """
+        trajectory = game.trajectory
+        if not trajectory:
+            return
+        records = np.frombuffer(bytes(trajectory), dtype=np.int8).reshape(
+            -1, TRAJECTORY_RECORD_SIZE
+        )
+        cells = records[:, :3].astype(np.uint8)
+        observations = np.empty((len(records), OBSERVATION_SIZE), dtype=np.int8)
+        observations[:, RED_ROW], observations[:, RED_COL] = np.divmod(
+            cells[:, 0], BOARD_SIZE
+        )
+        observations[:, BLUE_ROW], observations[:, BLUE_COL] = np.divmod(
+            cells[:, 1], BOARD_SIZE
+        )
+        observations[:, CHEESE_ROW], observations[:, CHEESE_COL] = np.divmod(
+            cells[:, 2], BOARD_SIZE
+        )
+        observations[:, CURRENT_PLAYER] = records[:, 3]
+
+        self.append_episode(
+            observations,
+            LEGAL_MASK_TABLE[records[:, 4].astype(np.uint8)],
+            records[:, 5],
+            game_outcome(game),
+        )
+
+    def append_episode(
+        self,
+        observations: np.ndarray,
+        legal_masks: np.ndarray,
+        actions: np.ndarray,
+        outcome: int,
+    ):
+        """Appends an episode given as arrays.
+
+        :param observations: ``(n, 7)`` observations.
+        :type observations: np.ndarray
+        :param legal_masks: ``(n, 4)`` legal moves masks.
+        :type legal_masks: np.ndarray
+        :param actions: ``(n,)`` action indices.
+        :type actions: np.ndarray
+        :param outcome: OUTCOME_WON, OUTCOME_LOST or OUTCOME_TIED.
+        :type outcome: int
+        """
+        length = len(actions)
+        if length == 0:
+            return
+        with self._lock:
+            if self._n_turns + length > self._shard_size:
+                self._write_shard()
+
+            columns = self._columns
+            if length > self._shard_size:
+                # oversized episodes get a shard of their own
+                columns = _empty_columns(length)
+
+            start, end = self._n_turns, self._n_turns + length
+            columns["observations"][start:end] = observations
+            columns["legal_masks"][start:end] = legal_masks
+            columns["actions"][start:end] = actions
+            columns["rewards"][start:end] = 0.0
+            columns["rewards"][end - 1] = (
+                1.0 if outcome == OUTCOME_WON else -1.0 if outcome == OUTCOME_LOST else 0.0
+            )
+            columns["dones"][start:end] = False
+            columns["dones"][end - 1] = True
+            self._episodes.append((start, length, outcome))
+            self._n_turns = end
+
+            if columns is not self._columns:
+                self._write_shard(columns)
+
+    def _write_shard(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        if not self._episodes:
+            return
+        if columns is None:
+            columns = self._columns
+        shard = os.path.join(self._directory, _SHARD_FORMAT % self._n_shards)
+        os.makedirs(shard, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(shard, name + ".npy"), columns[name][: self._n_turns])
+        # the index is written last: shards without one are incomplete and ignored
+        np.save(
+            os.path.join(shard, "episodes.npy"),
+            np.array(self._episodes, dtype=EPISODE_DTYPE),
+        )
+        self._n_shards += 1
+        self._episodes = []
+        self._n_turns = 0
+
+    def flush(self):
+        """Writes buffered episodes to a new shard."""
+        with self._lock:
+            self._write_shard()
+
+    def close(self):
+        self.flush()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+
+class EpisodeReader:
+    """Reads a store written by :class:`EpisodeWriter`.
+
+    Columns are memory-mapped: episodes are returned as views into the files and
+    sampling only reads the sampled rows.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: The store directory.
+        :type directory: str
+        """
+        self._directory = directory
+        self._shards: List[Dict[str, np.ndarray]] = []
+        episodes = []
+        shard_ids = []
+        turn_offsets = [0]
+
+        for i, shard in enumerate(_shard_directories(directory)):
+            columns = {
+                name: np.load(os.path.join(shard, name + ".npy"), mmap_mode="r")
+                for name in COLUMNS
+            }
+            self._shards.append(columns)
+            index = np.load(os.path.join(shard, "episodes.npy"))
+            episodes.append(index)
+            shard_ids.append(np.full(len(index), i, dtype=np.int32))
+            turn_offsets.append(turn_offsets[-1] + len(columns["actions"]))
+
+        self._episodes = (
+            np.concatenate(episodes) if episodes else np.zeros(0, dtype=EPISODE_DTYPE)
+        )
+        self._episode_shards = (
+            np.concatenate(shard_ids) if shard_ids else np.zeros(0, dtype=np.int32)
+        )
+        # first global row of each shard, plus the total number of rows
+        self._turn_offsets = np.array(turn_offsets, dtype=np.int64)
+
+    def episode(self, index: int) -> Dict[str, np.ndarray]:
+        """
+        :param index: The episode index.
+        :type index: int
+        :return: Read-only views of the episode's columns.
+        :rtype: Dict[str, np.ndarray]
+        """
+        start = int(self._episodes["start"][index])
+        end = start + int(self._episodes["length"][index])
+        columns = self._shards[self._episode_shards[index]]
+        return {name: columns[name][start:end] for name in COLUMNS}
+
+    def sample(
+        self, batch_size: int, rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, np.ndarray]:
+        """Samples actions uniformly, with replacement, as transitions.
+
+        The keys are those of :meth:`ReplayBuffer.sample`. The next observation of
+        the last action of an episode is the action's own observation; use
+        ``dones`` to mask it out.
+
+        :param batch_size: Number of actions to sample.
+        :type batch_size: int
+        :param rng: Random generator. Defaults to a new unseeded one.
+        :type rng: np.random.Generator, optional
+        :return: The sampled transitions and their global ``indices``.
+        :rtype: Dict[str, np.ndarray]
+        """
+        if self.n_turns == 0:
+            raise ValueError("Can not sample from an empty episode store")
+        if rng is None:
+            rng = np.random.default_rng()
+
+        indices = rng.integers(0, self.n_turns, batch_size)
+        shards = np.searchsorted(self._turn_offsets, indices, side="right") - 1
+        batch = _empty_columns(batch_size)
+        batch["next_observations"] = np.empty_like(batch["observations"])
+        batch["next_legal_masks"] = np.empty_like(batch["legal_masks"])
+
+        for shard in np.unique(shards):
+            selected = np.flatnonzero(shards == shard)
+            rows = indices[selected] - self._turn_offsets[shard]
+            columns = self._shards[shard]
+            for name in COLUMNS:
+                batch[name][selected] = columns[name][rows]
+            next_rows = np.where(batch["dones"][selected], rows, rows + 1)
+            batch["next_observations"][selected] = columns["observations"][next_rows]
+            batch["next_legal_masks"][selected] = columns["legal_masks"][next_rows]
+
+        batch["indices"] = indices
+        batch["weights"] = np.ones(batch_size, dtype=np.float32)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self._episodes)
+
+    @property
+    def episodes(self) -> np.ndarray:
+        """
+        :return: The index of every episode, with its shard-relative start row.
+        :rtype: np.ndarray
+        """
+        return self._episodes
+
+    @property
+    def n_turns(self) -> int:
+        return int(self._turn_offsets[-1])
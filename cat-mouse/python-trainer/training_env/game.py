@@ -1,9 +1,19 @@
 from logging import Logger
-from typing import Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 from .abstract_game import AbstractGame
+from .game_state import BLUE_INDEX, GameState
 from .move import Move
 
+if TYPE_CHECKING:
+    from .replay_buffer import ReplayBuffer
+
+# Size of the records of Game.trajectory
+TRAJECTORY_RECORD_SIZE = 6
+
+
 class Game(AbstractGame):
+
+    __slots__ = ("_state", "_pending_action", "_trajectory")
     
     def __init__(
         self,
@@ -20,17 +30,133 @@ class Game(AbstractGame):
             # save_replays, 
             # gen
         )
-        # Turn choice attributes
-        self._available_moves: List[Move] = []
+        # The side played by our orders, see GameOrder
+        self._player_role = "blue"
+
+        # Board state, updated in place by parse_message
+        self._state: GameState = GameState()
+        self._pending_action: int = -1
+        # one TRAJECTORY_RECORD_SIZE bytes record per action, if recording
+        self._trajectory: Optional[bytearray] = None
     
     @property
-    def available_moves(self) -> List[Move]:
+    def available_moves(self) -> List[str]:
         """
         :return: The list of moves the player can use during the current move request.
-        :rtype: List[Move]
+            The list is shared and must not be mutated.
+        :rtype: List[str]
+        """
+        return self._state.legal_moves
+
+    @property
+    def legal_mask(self) -> int:
+        """
+        :return: The legal moves, as a 4-bit mask over game_rules.DIRECTIONS.
+        :rtype: int
+        """
+        return self._state.legal_mask
+
+    @property
+    def state(self) -> GameState:
+        """
+        :return: The current board state.
+        :rtype: GameState
+        """
+        return self._state
+
+    def parse_message(self, split_message: Dict[str, Any]):
+        state = self._state
+        state.update(split_message)
+        self._turn += 1
+        # the last action's outcome is known once it is blue's turn again: the
+        # server also broadcasts the state red moves in. If the game is ending,
+        # rewards are only known once won_by or tied is called
+        if (
+            self._pending_action >= 0
+            and state.current_player == BLUE_INDEX
+            and not state.game_over
+        ):
+            self._observations.add(  # type: ignore
+                self._current_observation, self._pending_action, 0.0, state, False
+            )
+            self._pending_action = -1
+
+    def _finish_battle(self):
+        if self._pending_action >= 0:
+            reward = 0.0 if self._won is None else (1.0 if self._won else -1.0)
+            self._observations.add(  # type: ignore
+                self._current_observation, self._pending_action, reward, self._state, True
+            )
+            self._pending_action = -1
+        super(Game, self)._finish_battle()
+
+    def record_to(self, replay_buffer: Optional["ReplayBuffer"]):
+        """Records the game's transitions to replay_buffer, or stops if None.
+
+        :param replay_buffer: The buffer to write to.
+        :type replay_buffer: ReplayBuffer, optional
+        """
+        self._observations = replay_buffer
+        self._pending_action = -1
+        if replay_buffer is not None and self._current_observation is None:
+            self._current_observation = GameState()
+
+    def record_trajectory(self, enabled: bool = True):
+        """Starts or stops keeping the game's trajectory, see :attr:`trajectory`.
+
+        :param enabled: Whether to record.
+        :type enabled: bool
+        """
+        if not enabled:
+            self._trajectory = None
+        elif self._trajectory is None:
+            self._trajectory = bytearray()
+
+    def record_action(self, action: int):
+        """Remembers the action chosen in the current state. The transition is
+        recorded once the next state or the outcome is received.
+
+        :param action: Index of the chosen direction.
+        :type action: int
+        """
+        if action < 0:
+            return
+        state = self._state
+        if self._trajectory is not None:
+            self._trajectory += bytes(
+                (
+                    state.red,
+                    state.blue,
+                    state.cheese,
+                    state.current_player & 0xFF,
+                    state.legal_mask,
+                    action,
+                )
+            )
+        if self._observations is not None:
+            self._current_observation.copy_from(state)  # type: ignore
+            self._pending_action = action
+
+    @property
+    def trajectory(self) -> Optional[bytearray]:
+        """Actions recorded so far, if trajectory recording is on.
+
+        Each action is a TRAJECTORY_RECORD_SIZE bytes record: the red, blue and
+        cheese cells, the current player, the legal moves mask and the action index.
+
+        :return: The packed records.
+        :rtype: bytearray, optional
+        """
+        return self._trajectory
+
+    @property
+    def replay_buffer(self) -> Optional["ReplayBuffer"]:
+        """
+        :return: The buffer transitions are recorded to, if any.
+        :rtype: ReplayBuffer, optional
         """
-        return self._available_moves
+        return self._observations
     
     def parse_request(self, request: Dict[str, Any]) -> None:
         #for updating object from a request
-        print("parsing requests in Game object...")
+        pass
@@ -0,0 +1,105 @@
+"""This module defines a compact on-disk archive of finished games.
+"""
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from .abstract_game import AbstractGame
+
+OUTCOME_LOST = 0
+OUTCOME_WON = 1
+OUTCOME_TIED = -1
+
+# Longer game tags are truncated
+MAX_GAME_TAG_LENGTH = 32
+
+ARCHIVE_RECORD_DTYPE = np.dtype(
+    [
+        ("game_tag", "S%d" % MAX_GAME_TAG_LENGTH),
+        ("outcome", np.int8),
+        ("n_turns", np.int32),
+        ("finished_at", np.float64),
+    ]
+)
+
+
+def game_outcome(game: AbstractGame) -> int:
+    """
+    :param game: A finished game.
+    :type game: AbstractGame
+    :return: OUTCOME_WON, OUTCOME_LOST or OUTCOME_TIED.
+    :rtype: int
+    """
+    if game.won is None:
+        return OUTCOME_TIED
+    return OUTCOME_WON if game.won else OUTCOME_LOST
+
+
+class GameArchive:
+    """Append-only file of fixed-size finished game records.
+
+    Records follow ARCHIVE_RECORD_DTYPE and are written back to back without any
+    header, so that the whole archive can be loaded with a single ``np.fromfile``.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 16):
+        """
+        :param path: Path of the archive. Records are appended if it exists.
+        :type path: str
+        :param buffer_size: Size of the write buffer, in bytes.
+        :type buffer_size: int
+        """
+        self._path = path
+        self._file = open(path, "ab", buffering=buffer_size)
+        self._record = np.zeros(1, dtype=ARCHIVE_RECORD_DTYPE)
+
+    def append(self, game: AbstractGame, finished_at: Optional[float] = None):
+        """Writes the record of a finished game.
+
+        :param game: The finished game.
+        :type game: AbstractGame
+        :param finished_at: When the game finished, as a unix timestamp. Defaults to
+            now.
+        :type finished_at: float, optional
+        """
+        record = self._record
+        record["game_tag"] = str(game.game_tag).encode()[:MAX_GAME_TAG_LENGTH]
+        record["outcome"] = game_outcome(game)
+        record["n_turns"] = game.turn
+        record["finished_at"] = time.time() if finished_at is None else finished_at
+        self._file.write(record.tobytes())
+
+    def flush(self):
+        self._file.flush()
+
+    def read(self) -> np.ndarray:
+        """Loads every record written so far.
+
+        :return: The records, oldest first.
+        :rtype: np.ndarray
+        """
+        self.flush()
+        return self.load(self._path)
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def load(path: str) -> np.ndarray:
+        """Loads the records of an archive.
+
+        :param path: Path of the archive.
+        :type path: str
+        :return: The records, oldest first.
+        :rtype: np.ndarray
+        """
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=ARCHIVE_RECORD_DTYPE)
+        return np.fromfile(path, dtype=ARCHIVE_RECORD_DTYPE)
+
+    @property
+    def path(self) -> str:
+        return self._path
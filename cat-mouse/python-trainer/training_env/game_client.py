@@ -2,26 +2,53 @@
 """
 
 import asyncio
-import json
+import atexit
 import logging
-from asyncio import CancelledError, Event, Lock, create_task, sleep
-from logging import Logger
-from time import perf_counter
-from typing import Any, List, Optional, Set
-
-import requests
-import websockets.client as ws
-from websockets.exceptions import ConnectionClosedOK
-
-from .concurrency import (
-    GAME_LOOP,
-    create_in_game_loop,
-    handle_threaded_coroutines,
-)
-from poke_env.exceptions import ShowdownException
+import random
+import warnings
+from asyncio import CancelledError, Event, Lock, create_task
+from logging import DEBUG, Logger
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from .concurrency import create_in_loop, get_game_loop, handle_threaded_coroutines
 from .account_configuration import AccountConfiguration
+from .codec import DEFAULT_CODEC, JsonCodec, encode_accept_challenge, encode_start_game
+from .dispatcher import MessageDispatcher
+from .game_order import GameOrder
 from .server_configuration import ServerConfiguration
 
+if TYPE_CHECKING:
+    import websockets.client as ws
+
+    from .authentication import Authenticator
+    from .metrics import LatencyMetrics
+    from .shared_transport import SharedTransport
+
+_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_async_log_handler: Optional[QueueHandler] = None
+
+
+def _get_async_log_handler() -> QueueHandler:
+    """Returns the handler shared by clients logging asynchronously.
+
+    Records are put on a queue and written to stderr by a QueueListener thread, so
+    that emitting them never blocks the game loop on I/O.
+    """
+    global _async_log_handler
+    if _async_log_handler is None:
+        log_queue: "SimpleQueue[Any]" = SimpleQueue()
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+        listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        _async_log_handler = QueueHandler(log_queue)
+    return _async_log_handler
+
 
 class GameClient:
     """
@@ -43,6 +70,19 @@ class GameClient:
         start_listening: bool = True,
         ping_interval: Optional[float] = 20.0,
         ping_timeout: Optional[float] = 20.0,
+        codec: Optional[JsonCodec] = None,
+        async_logging: bool = False,
+        transport: Optional["SharedTransport"] = None,
+        reconnect: bool = False,
+        reconnect_initial_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        max_reconnect_attempts: Optional[int] = None,
+        max_queue: Optional[int] = 64,
+        dispatcher_workers: int = 8,
+        max_game_queue_size: int = 64,
+        metrics: Optional["LatencyMetrics"] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        authenticator: Optional["Authenticator"] = None,
     ):
         """
         :param account_configuration: Account configuration.
@@ -64,75 +104,143 @@ class GameClient:
             Increase only if timeouts occur during runtime).
             If None pings will never time out.
         :type ping_timeout: float, optional
+        :param codec: Codec used to decode frames. Defaults to orjson if available,
+            json otherwise.
+        :type codec: JsonCodec, optional
+        :param async_logging: Whether log records should be written from a separate
+            thread, so that logging never blocks the game loop. Defaults to False.
+        :type async_logging: bool
+        :param transport: Shared transport to attach to instead of opening a
+            dedicated websocket. Optional.
+        :type transport: SharedTransport, optional
+        :param reconnect: Whether to reconnect when the websocket connection drops.
+            Defaults to False.
+        :type reconnect: bool
+        :param reconnect_initial_delay: Delay before the first reconnection attempt,
+            doubled after each failed attempt. Delays are jittered.
+        :type reconnect_initial_delay: float
+        :param reconnect_max_delay: Maximum delay between reconnection attempts.
+        :type reconnect_max_delay: float
+        :param max_reconnect_attempts: Number of consecutive failed attempts after
+            which the client gives up. If None, it never does.
+        :type max_reconnect_attempts: int, optional
+        :param max_queue: Maximum number of received frames buffered by the
+            websocket. Once reached, the socket stops being read until frames are
+            consumed. If None, frames are buffered without limit.
+        :type max_queue: int, optional
+        :param dispatcher_workers: Number of coroutines handling received frames.
+            Frames of a same game are always handled in order.
+        :type dispatcher_workers: int
+        :param max_game_queue_size: Maximum number of frames of a single game waiting
+            to be handled before reading from the socket pauses.
+        :type max_game_queue_size: int
+        :param metrics: Histograms to record the latency of each stage of frames
+            into. Optional.
+        :type metrics: LatencyMetrics, optional
+        :param loop: The loop the client runs on. Defaults to the transport's loop if
+            there is one, GAME_LOOP otherwise.
+        :type loop: asyncio.AbstractEventLoop, optional
+        :param authenticator: Obtains login assertions. Defaults to the one shared by
+            all clients.
+        :type authenticator: Authenticator, optional
         """
-        self._active_tasks: Set[Any] = set()
+        self._codec: JsonCodec = codec if codec is not None else DEFAULT_CODEC
         self._ping_interval = ping_interval
         self._ping_timeout = ping_timeout
+        self._transport = transport
+        self._reconnect = reconnect
+        self._reconnect_initial_delay = reconnect_initial_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._max_reconnect_attempts = max_reconnect_attempts
+        self._closing = False
+        self._max_queue = max_queue
+        self._metrics = metrics
+        self._authenticator = authenticator
+        if loop is None:
+            loop = transport.loop if transport is not None else get_game_loop()
+        self._loop: asyncio.AbstractEventLoop = loop
 
         self._server_configuration = server_configuration
         self._account_configuration = account_configuration
 
         #self._avatar = avatar
 
-        self._logged_in: Event = create_in_game_loop(Event)
-        self._sending_lock = create_in_game_loop(Lock)
-
-        self.websocket: ws.WebSocketClientProtocol
-        self._logger: Logger = self._create_logger(log_level)
+        self._logged_in: Event = create_in_loop(loop, Event)
+        # set when listening stops, waking up a pending reconnection backoff
+        self._stopped: Event = create_in_loop(loop, Event)
+        self._sending_lock = create_in_loop(loop, Lock)
+
+        self.websocket: "ws.WebSocketClientProtocol"
+        self._logger: Logger = self._create_logger(log_level, async_logging)
+        self._dispatcher = MessageDispatcher(
+            # timed frames are dispatched along with their timestamps
+            self._handle_game_info if metrics is None else self._handle_timed_game_info,
+            n_workers=dispatcher_workers,
+            max_queue_size=max_game_queue_size,
+            logger=self._logger,
+        )
 
         if start_listening:
-            print("listening started...")
             self._listening_coroutine = asyncio.run_coroutine_threadsafe(
-                self.listen(), GAME_LOOP
+                self.listen(), loop
             )
 
     async def accept_challenge(self, username: str, packed_team: Optional[str]):
         assert self.logged_in.is_set(), f"Expected {self.username} to be logged in."
-        await self.set_team(packed_team)
-        await self.send_message("/accept %s" % username)
+        #await self.set_team(packed_team)
+        #await self.send_message("/accept %s" % username)
+        if self._transport is not None:
+            self._transport.expect_game(self)
+        await self.send_message(encode_accept_challenge(username))
 
     async def challenge(self, username: str, format_: str, packed_team: Optional[str]):
-        print("challenging...")
         # manual set loggined
         #self.logged_in.set()
         assert self.logged_in.is_set(), f"Expected {self.username} to be logged in."
         #await self.set_team(packed_team)
         #await self.send_message(f"/challenge {username}, {format_}")
-        await self.send_message(json.dumps({ "type": 'START_GAME' }))
-        print(json.dumps({ "type": 'START_GAME' }))
+        if self._transport is not None:
+            self._transport.expect_game(self)
+        await self.send_message(encode_start_game(username))
 
-    def _create_logger(self, log_level: Optional[int]) -> Logger:
+    def _create_logger(
+        self, log_level: Optional[int], async_logging: bool = False
+    ) -> Logger:
         """Creates a logger for the client.
 
         Returns a Logger displaying asctime and the account's username before messages.
 
         :param log_level: The logger's level.
         :type log_level: int
+        :param async_logging: Whether records should be handed to a queue instead of
+            being written from the calling thread.
+        :type async_logging: bool
         :return: The logger.
         :rtype: Logger
         """
         logger = logging.getLogger(self.username)
 
-        stream_handler = logging.StreamHandler()
         if log_level is not None:
             logger.setLevel(log_level)
 
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        stream_handler.setFormatter(formatter)
-
-        logger.addHandler(stream_handler)
+        # loggers are shared by name: only attach a handler once
+        if not logger.handlers:
+            if async_logging:
+                logger.addHandler(_get_async_log_handler())
+            else:
+                stream_handler = logging.StreamHandler()
+                stream_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+                logger.addHandler(stream_handler)
         return logger
 
-    async def _handle_message(self, message: str):
+    async def _handle_message(self, message: Union[str, bytes]):
         """Handle received messages.
 
         :param message: The message to parse.
-        :type message: str
+        :type message: str or bytes
         """
-        # this gets added into listen()
-        # which gets added to create_task(_handle_message)
+        # listen() decodes frames itself and hands them to the dispatcher,
+        # this is kept for feeding raw frames directly
 
         #basically passes to _handle_battle_message
         # else loggin via challstr
@@ -140,26 +248,73 @@ class GameClient:
         # else handle challenge request
         #else log message
 
-        self.logged_in.set() #manual set this on every message
-        print("MESSAGE")
-        print(json.loads(message))
-        # handles game specific message
-        message = json.loads(message) #[0] #GAMESPECIFIC: specific to game
-
+        # handles game specific message, decoded once
+        metrics = self._metrics
+        if metrics is None:
+            await self._handle_game_info(self._codec.decode(message)) #[0] #GAMESPECIFIC: specific to game
+            return
+        received_at = perf_counter_ns()
+        game_info = self._codec.decode(message)
+        decoded_at = perf_counter_ns()
+        # handled as soon as decoded: one clock read is enough for both
+        await self._handle_game_info(game_info, [received_at, decoded_at, decoded_at])
+
+    async def _handle_game_info(
+        self, game_info: Dict[str, Any], timestamps: Optional[List[int]] = None
+    ):
+        """Handle a decoded game state.
+
+        :param game_info: The decoded message.
+        :type game_info: Dict[str, Any]
+        :param timestamps: The stage boundaries of the frame so far, up to its
+            handling starting, if it is timed. Handlers append theirs, and the frame
+            is recorded once handled.
+        :type timestamps: List[int], optional
+        """
         # manual correct "intent field"
         message = {
-                    "intent": message["gameIntent"], 
-                    "game_info": message
+                    "intent": game_info["gameIntent"], 
+                    "game_info": game_info
                     }
+        if timestamps is not None:
+            message["timestamps"] = timestamps
 
-        if message['intent']=="move": 
-            print(message)
+        if message['intent'] in ("move", "win", "tie", "init"): 
             await self._handle_game_message(message) #should be a dict here
         elif message['intent']=="CHALLENGE": 
             await self._handle_challenge_request(message)
+        elif message['intent']=="CHALLENGES":
+            await self._update_challenges(message)
+
+        if timestamps is not None:
+            self._metrics.record_timestamps(timestamps)  # type: ignore
+
+    async def _handle_timed_game_info(self, item: Tuple[Dict[str, Any], List[int]]):
+        """Handles a decoded game state dispatched with its timestamps.
+
+        :param item: The decoded message and its timestamps.
+        :type item: Tuple[Dict[str, Any], List[int]]
+        """
+        game_info, timestamps = item
+        timestamps.append(perf_counter_ns())
+        await self._handle_game_info(game_info, timestamps)
+
+    async def _handle_reconnection(self):
+        """Called once the connection is re-established after a drop."""
+
+    async def _handle_stop_listening(self):
+        """Called when the client stops listening."""
 
     async def _stop_listening(self):
-        await self.websocket.close()
+        self._closing = True
+        self._stopped.set()
+        await self._handle_stop_listening()
+        if self._transport is not None:
+            await self._transport.detach(self)
+        elif getattr(self, "websocket", None) is not None:
+            await self.websocket.close()
+        # frames still queued are dropped along with the connection
+        self._dispatcher.close()
 
     async def change_avatar(self, avatar_name: Optional[str]):
         """Changes the account's avatar.
@@ -173,34 +328,143 @@ class GameClient:
 
     async def listen(self):
         """Listen to a game websocket and dispatch messages to be handled."""
-        self.logger.info("Starting listening to game websocket")
-        print("Starting listening to game websocket")
+        if self._transport is not None:
+            self.logger.info("Attaching to shared transport")
+        else:
+            self.logger.info("Starting listening to game websocket")
+        failed_attempts = 0
+        reconnecting = False
+        while True:
+            if self._transport is not None:
+                connected = await self._listen_shared()
+            else:
+                connected = await self._listen_once(reconnecting)
+            self.logged_in.clear()
+            if self._closing or not self._reconnect or connected is None:
+                if self._transport is not None and not self._closing:
+                    await self._transport.detach(self)
+                return
+
+            failed_attempts = 0 if connected else failed_attempts + 1
+            if (
+                self._max_reconnect_attempts is not None
+                and failed_attempts >= self._max_reconnect_attempts
+            ):
+                self.logger.critical(
+                    "Giving up reconnecting to %s after %d attempts",
+                    self.websocket_url,
+                    failed_attempts,
+                )
+                return
+
+            # exponential backoff, jittered so that fleets do not reconnect in lockstep
+            delay = min(
+                self._reconnect_max_delay,
+                self._reconnect_initial_delay * 2**failed_attempts,
+            ) * random.uniform(0.5, 1.0)
+            self.logger.warning("Reconnecting to %s in %.2fs", self.websocket_url, delay)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                # stopped during the backoff
+                return
+            reconnecting = True
+
+    async def _listen_shared(self) -> Optional[bool]:
+        """Attaches to the shared transport and waits until its connection closes.
+
+        The transport itself calls :meth:`_handle_reconnection` when it reconnects.
+
+        :return: Whether the connection was established, or None if listening was
+            cancelled.
+        :rtype: bool, optional
+        """
+        try:
+            closed = await self._transport.attach(self)  # type: ignore
+        except (CancelledError, RuntimeError) as e:
+            self.logger.critical("Listen interrupted by %s", e)
+            return None
+        except Exception as e:
+            self.logger.exception(e)
+            return False
+        if self._closing:
+            return None
+        self.logged_in.set()
+        stopped = create_task(self._stopped.wait())
+        try:
+            await asyncio.wait((closed, stopped), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+        return True
+
+    async def _listen_once(self, reconnecting: bool) -> Optional[bool]:
+        """Connects to the websocket and dispatches messages until it closes.
+
+        :param reconnecting: Whether a previous connection dropped.
+        :type reconnecting: bool
+        :return: Whether the connection was established, or None if listening was
+            cancelled.
+        :rtype: bool, optional
+        """
+        # imported here so that offline use never loads websockets
+        import websockets.client as ws
+        from websockets.exceptions import ConnectionClosedOK
+
+        connected = False
         try:
             async with ws.connect(
                 self.websocket_url,
-                max_queue=None,
+                max_queue=self._max_queue,
                 ping_interval=self._ping_interval,
                 ping_timeout=self._ping_timeout,
             ) as websocket:
                 self.websocket = websocket
-                print("websocket attached.")
+                connected = True
+                if self._closing:
+                    # stopped while connecting
+                    return None
+                if reconnecting:
+                    self.logger.info("Reconnected to %s", self.websocket_url)
+                    await self._handle_reconnection()
+                logger = self.logger
+                decode = self._codec.decode
+                dispatch = self._dispatcher.put
+                metrics = self._metrics
+                greeted = False
                 async for message in websocket:
-                    self.logger.info("\033[92m\033[1m<<<\033[0m %s", message)
-                    task = create_task(self._handle_message(str(message))) # task to send message
-                    self._active_tasks.add(task)
-                    task.add_done_callback(self._active_tasks.discard)
+                    if logger.isEnabledFor(DEBUG):
+                        logger.debug("\033[92m\033[1m<<<\033[0m %s", message)
+                    if not greeted:
+                        # the server greets every connection: its first frame
+                        # means the client is logged in
+                        self.logged_in.set()
+                        greeted = True
+                        if not reconnecting:
+                            # it holds the server's current game, which a new
+                            # client did not start. After a drop, it resyncs ours
+                            continue
+                    # waits while the game's queue is full, pausing socket reads
+                    if metrics is None:
+                        game_info = decode(message)
+                        await dispatch(game_info.get("gameTag"), game_info)
+                    else:
+                        timestamps = [perf_counter_ns()]
+                        game_info = decode(message)
+                        timestamps.append(perf_counter_ns())
+                        await dispatch(game_info.get("gameTag"), (game_info, timestamps))
 
         except ConnectionClosedOK:
-            print("Websocket connection with %s closed", self.websocket_url)
             self.logger.warning(
                 "Websocket connection with %s closed", self.websocket_url
             )
         except (CancelledError, RuntimeError) as e:
-            print("Listen interrupted by %s", e)
             self.logger.critical("Listen interrupted by %s", e)
+            return None
         except Exception as e:
-            print(e)
             self.logger.exception(e)
+        return connected
 
     async def log_in(self, split_message: List[str]):
         """Log in with specified username and password.
@@ -212,24 +476,21 @@ class GameClient:
         :type split_message: List[str]
         """
         if self.account_configuration.password:
-            log_in_request = requests.post(
+            self.logger.info("Sending authentication request")
+            # runs off the loop, so that other clients keep playing meanwhile
+            assertion = await self.authenticator.get_assertion(
                 self.server_configuration.authentication_url,
-                data={
-                    "act": "login",
-                    "name": self.account_configuration.username,
-                    "pass": self.account_configuration.password,
-                    "challstr": split_message[2] + "%7C" + split_message[3],
-                },
+                self.account_configuration.username,
+                self.account_configuration.password,
+                split_message[2] + "%7C" + split_message[3],
             )
-            self.logger.info("Sending authentication request")
-            assertion = json.loads(log_in_request.text[1:])["assertion"]
         else:
             self.logger.info("Bypassing authentication request")
             assertion = ""
 
         await self.send_message(f"/trn {self.username},0,{assertion}")
 
-        await self.change_avatar(self._avatar)
+        #await self.change_avatar(self._avatar)
 
     async def send_message(
         self, message: str, room: str = "", message_2: Optional[str] = None
@@ -250,20 +511,55 @@ class GameClient:
         else:
             #to_send = "|".join([room, message])
             to_send = message
-        self.logger.info("\033[93m\033[1m>>>\033[0m %s", to_send)
-        print("sending message...", to_send)
-        await self.websocket.send(to_send)
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("\033[93m\033[1m>>>\033[0m %s", to_send)
+        if self._transport is not None:
+            await self._transport.send(to_send)
+        else:
+            await self.websocket.send(to_send)
+
+    async def send_order(self, order: GameOrder, game_tag: str):
+        """Sends a game order.
+
+        :param order: The order to send.
+        :type order: GameOrder
+        :param game_tag: The game the order is for.
+        :type game_tag: str
+        """
+        await self.send_message(order.message, game_tag)
 
     async def stop_listening(self):
-        await handle_threaded_coroutines(self._stop_listening())
+        await handle_threaded_coroutines(self._stop_listening(), self._loop)
 
-    async def wait_for_login(self, checking_interval: float = 0.001, wait_for: int = 5):
-        start = perf_counter()
-        while perf_counter() - start < wait_for:
-            await sleep(checking_interval)
-            if self.logged_in:
-                return
-        assert self.logged_in, f"Expected {self.username} to be logged in."
+    async def wait_for_login(
+        self, checking_interval: Optional[float] = None, wait_for: Optional[float] = 5.0
+    ):
+        """Waits until the client is logged in. Can be awaited from any loop.
+
+        :param checking_interval: Deprecated and ignored: login is no longer polled.
+            Kept so that positional calls keep their meaning.
+        :type checking_interval: float, optional
+        :param wait_for: How long to wait for, in seconds. If None, waits forever.
+        :type wait_for: float, optional
+        :raises asyncio.TimeoutError: If the client is not logged in in time.
+        """
+        if checking_interval is not None:
+            warnings.warn(
+                "wait_for_login's checking_interval is ignored, login is awaited",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        await handle_threaded_coroutines(self._wait_for_login(wait_for), self._loop)
+
+    async def _wait_for_login(self, wait_for: Optional[float]):
+        if self.logged_in.is_set():
+            return
+        try:
+            await asyncio.wait_for(self.logged_in.wait(), wait_for)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(
+                f"{self.username} was not logged in after {wait_for}s"
+            ) from None
 
     @property
     def account_configuration(self) -> AccountConfiguration:
@@ -274,6 +570,64 @@ class GameClient:
         """
         return self._account_configuration
 
+    @property
+    def transport(self) -> Optional["SharedTransport"]:
+        """Shared transport the client is attached to, if any.
+
+        :return: The transport.
+        :rtype: SharedTransport, optional
+        """
+        return self._transport
+
+    @property
+    def dispatcher(self) -> MessageDispatcher:
+        """Dispatcher handing received frames to the game handlers.
+
+        :return: The dispatcher.
+        :rtype: MessageDispatcher
+        """
+        return self._dispatcher
+
+    @property
+    def authenticator(self) -> "Authenticator":
+        """The authenticator obtaining the client's login assertions.
+
+        :return: The authenticator.
+        :rtype: Authenticator
+        """
+        if self._authenticator is None:
+            from .authentication import get_default_authenticator
+
+            self._authenticator = get_default_authenticator()
+        return self._authenticator
+
+    @property
+    def codec(self) -> JsonCodec:
+        """Codec used to decode received frames.
+
+        :return: The codec.
+        :rtype: JsonCodec
+        """
+        return self._codec
+
+    @property
+    def metrics(self) -> Optional["LatencyMetrics"]:
+        """Histograms the client records frame latencies into, if any.
+
+        :return: The metrics.
+        :rtype: LatencyMetrics, optional
+        """
+        return self._metrics
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The loop the client runs on.
+
+        :return: The loop.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return self._loop
+
     @property
     def logged_in(self) -> Event:
         """Event object associated with user login.
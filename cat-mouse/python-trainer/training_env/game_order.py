@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import Any, List, Optional, Union
-import json
+from .codec import encode_order
 from .move import Move
 
 
@@ -43,23 +43,15 @@ class GameOrder:
         # else:
         #     return ""
 
-        return json.dumps({
-                    "type": 'MOVE',
-                    "player": 'blue',
-                    "direction": self.order
-                })
+        return encode_order("blue", self.order)
 
 
 
 
 class DefaultGameOrder(GameOrder):
     def __init__(self, *args: Any, **kwargs: Any):
-        pass
+        self.order = "up"
 
     @property
     def message(self) -> str:
-        return json.dumps({
-                    "type": 'MOVE',
-                    "player": 'blue',
-                    "direction": 'up'
-                })
\ No newline at end of file
+        return encode_order("blue", "up")
\ No newline at end of file
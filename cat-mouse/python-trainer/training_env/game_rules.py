@@ -0,0 +1,148 @@
+"""This module defines the rules of the 5x5 cat-mouse game.
+
+They mirror the ones implemented by ``mouse-cheese-server``, so that games can be
+simulated without a running server.
+"""
+
+import random
+from typing import Any, Dict, List, Tuple
+
+BOARD_SIZE = 5
+
+RED = "red"
+BLUE = "blue"
+
+UP = "up"
+DOWN = "down"
+LEFT = "left"
+RIGHT = "right"
+
+DIRECTIONS: Tuple[str, ...] = (UP, DOWN, LEFT, RIGHT)
+
+INITIAL_RED_POSITION: Tuple[int, int] = (0, 0)
+INITIAL_BLUE_POSITION: Tuple[int, int] = (BOARD_SIZE - 1, BOARD_SIZE - 1)
+
+_DELTAS: Dict[str, Tuple[int, int]] = {
+    UP: (-1, 0),
+    DOWN: (1, 0),
+    LEFT: (0, -1),
+    RIGHT: (0, 1),
+}
+
+
+def _compute_possible_moves(row: int, col: int) -> List[str]:
+    moves: List[str] = []
+    if row > 0:
+        moves.append(UP)
+    if row < BOARD_SIZE - 1:
+        moves.append(DOWN)
+    if col > 0:
+        moves.append(LEFT)
+    if col < BOARD_SIZE - 1:
+        moves.append(RIGHT)
+    return moves
+
+
+_POSSIBLE_MOVES: Dict[Tuple[int, int], List[str]] = {
+    (row, col): _compute_possible_moves(row, col)
+    for row in range(BOARD_SIZE)
+    for col in range(BOARD_SIZE)
+}
+
+
+def calculate_possible_moves(position: Tuple[int, int]) -> List[str]:
+    """Returns the directions a mouse standing on position can move to.
+
+    The returned list is shared between calls and must not be mutated.
+
+    :param position: The mouse position, as (row, col).
+    :type position: Tuple[int, int]
+    :return: The possible directions.
+    :rtype: List[str]
+    """
+    return _POSSIBLE_MOVES[(position[0], position[1])]
+
+
+def apply_direction(position: Tuple[int, int], direction: str) -> Tuple[int, int]:
+    """Returns the position reached by moving in direction.
+
+    Moves are clamped to the board and unknown directions leave the mouse in place,
+    as on the server.
+
+    :param position: The mouse position, as (row, col).
+    :type position: Tuple[int, int]
+    :param direction: The direction to move in.
+    :type direction: str
+    :return: The new position.
+    :rtype: Tuple[int, int]
+    """
+    delta = _DELTAS.get(direction)
+    if delta is None:
+        return (position[0], position[1])
+    row = min(BOARD_SIZE - 1, max(0, position[0] + delta[0]))
+    col = min(BOARD_SIZE - 1, max(0, position[1] + delta[1]))
+    return (row, col)
+
+
+def random_position() -> Tuple[int, int]:
+    """Returns a uniformly random board position.
+
+    :return: A position, as (row, col).
+    :rtype: Tuple[int, int]
+    """
+    return (random.randrange(BOARD_SIZE), random.randrange(BOARD_SIZE))
+
+
+def other_player(player: str) -> str:
+    return BLUE if player == RED else RED
+
+
+# Rotating the board by 180 degrees swaps the initial positions of both mice, and
+# reverses every direction
+_MIRRORED_DIRECTIONS: Dict[str, str] = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+
+
+def mirror_position(position: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    :param position: A position, as (row, col).
+    :type position: Tuple[int, int]
+    :return: The position on the board rotated by 180 degrees.
+    :rtype: Tuple[int, int]
+    """
+    return (BOARD_SIZE - 1 - position[0], BOARD_SIZE - 1 - position[1])
+
+
+def mirror_direction(direction: str) -> str:
+    """
+    :param direction: A direction.
+    :type direction: str
+    :return: The direction on the board rotated by 180 degrees.
+    :rtype: str
+    """
+    return _MIRRORED_DIRECTIONS.get(direction, direction)
+
+
+def mirror_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the state as seen by red: the board is rotated by 180 degrees and the
+    colors are swapped, so that red plays blue from blue's starting corner.
+
+    The rules are symmetric under this transformation, so a policy trained to play
+    blue can play red by choosing moves on the mirrored state and mirroring them
+    back with :func:`mirror_direction`.
+
+    :param state: A game state, in the server's format.
+    :type state: Dict[str, Any]
+    :return: The mirrored state.
+    :rtype: Dict[str, Any]
+    """
+    mirrored = dict(state)
+    mirrored["redMousePosition"] = mirror_position(state["blueMousePosition"])
+    mirrored["blueMousePosition"] = mirror_position(state["redMousePosition"])
+    mirrored["cheesePosition"] = mirror_position(state["cheesePosition"])
+    mirrored["currentPlayer"] = other_player(state["currentPlayer"])
+    if state.get("winner") is not None:
+        mirrored["winner"] = other_player(state["winner"])
+    mirrored["possibleMoves"] = [
+        mirror_direction(direction) for direction in state["possibleMoves"]
+    ]
+    return mirrored
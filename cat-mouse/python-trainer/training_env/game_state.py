@@ -0,0 +1,169 @@
+"""This module defines a compact, typed representation of a cat-mouse game state.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from .game_rules import BLUE, BOARD_SIZE, DIRECTIONS, RED
+
+# Observation columns, shared by VectorGameEnv and ReplayBuffer
+RED_ROW, RED_COL, BLUE_ROW, BLUE_COL, CHEESE_ROW, CHEESE_COL, CURRENT_PLAYER = range(7)
+OBSERVATION_SIZE = 7
+
+# Player indices, also the values of the CURRENT_PLAYER column
+RED_INDEX = 0
+BLUE_INDEX = 1
+NO_PLAYER = -1
+
+# Index of each direction, as used for actions
+DIRECTION_INDEX: Dict[str, int] = {
+    direction: i for i, direction in enumerate(DIRECTIONS)
+}
+
+# Bit i of a legal moves mask is set when DIRECTIONS[i] is legal
+DIRECTION_BITS: Dict[str, int] = {
+    direction: 1 << i for i, direction in enumerate(DIRECTIONS)
+}
+
+_PLAYER_INDEX: Dict[Any, int] = {RED: RED_INDEX, BLUE: BLUE_INDEX}
+
+# Shared lists of directions for each of the 16 masks
+_MASK_DIRECTIONS: Tuple[List[str], ...] = tuple(
+    [direction for i, direction in enumerate(DIRECTIONS) if mask & (1 << i)]
+    for mask in range(1 << len(DIRECTIONS))
+)
+
+
+def to_cell(position: Any) -> int:
+    """
+    :param position: A position, as (row, col).
+    :type position: Sequence[int]
+    :return: The index of the position's cell, row * BOARD_SIZE + col.
+    :rtype: int
+    """
+    return position[0] * BOARD_SIZE + position[1]
+
+
+def to_position(cell: int) -> Tuple[int, int]:
+    """
+    :param cell: A cell index.
+    :type cell: int
+    :return: The cell's position, as (row, col).
+    :rtype: Tuple[int, int]
+    """
+    return divmod(cell, BOARD_SIZE)
+
+
+def mask_directions(mask: int) -> List[str]:
+    """Returns the directions set in a legal moves mask.
+
+    The returned list is shared between calls and must not be mutated.
+
+    :param mask: A legal moves mask.
+    :type mask: int
+    :return: The legal directions, in DIRECTIONS order.
+    :rtype: List[str]
+    """
+    return _MASK_DIRECTIONS[mask]
+
+
+class GameState:
+    """Board state of a game, stored as a handful of small ints.
+
+    Positions are cell indices (see :func:`to_cell`), players are RED_INDEX or
+    BLUE_INDEX and legal moves a 4-bit mask over DIRECTIONS. Small ints are shared by
+    the interpreter, so updating a state in place allocates nothing.
+    """
+
+    __slots__ = (
+        "red",
+        "blue",
+        "cheese",
+        "current_player",
+        "legal_mask",
+        "game_over",
+        "winner",
+    )
+
+    def __init__(self):
+        self.red: int = 0
+        self.blue: int = 0
+        self.cheese: int = 0
+        self.current_player: int = RED_INDEX
+        self.legal_mask: int = 0
+        self.game_over: bool = False
+        self.winner: int = NO_PLAYER
+
+    def update(self, game_info: Dict[str, Any]):
+        """Overwrites the state with a decoded server frame.
+
+        :param game_info: The decoded frame.
+        :type game_info: Dict[str, Any]
+        """
+        red = game_info["redMousePosition"]
+        blue = game_info["blueMousePosition"]
+        cheese = game_info["cheesePosition"]
+        self.red = red[0] * BOARD_SIZE + red[1]
+        self.blue = blue[0] * BOARD_SIZE + blue[1]
+        self.cheese = cheese[0] * BOARD_SIZE + cheese[1]
+        self.current_player = _PLAYER_INDEX.get(game_info["currentPlayer"], NO_PLAYER)
+        self.game_over = bool(game_info["gameOver"])
+        self.winner = _PLAYER_INDEX.get(game_info.get("winner"), NO_PLAYER)
+
+        mask = 0
+        for direction in game_info["possibleMoves"]:
+            mask |= DIRECTION_BITS.get(direction, 0)
+        self.legal_mask = mask
+
+    def copy_from(self, other: "GameState"):
+        """Overwrites the state with another one.
+
+        :param other: The state to copy.
+        :type other: GameState
+        """
+        self.red = other.red
+        self.blue = other.blue
+        self.cheese = other.cheese
+        self.current_player = other.current_player
+        self.legal_mask = other.legal_mask
+        self.game_over = other.game_over
+        self.winner = other.winner
+
+    def write_observation(self, out: Any):
+        """Writes the state in the observation layout used by VectorGameEnv.
+
+        :param out: A row of at least OBSERVATION_SIZE elements, e.g. a NumPy view.
+        :type out: MutableSequence[int]
+        """
+        out[RED_ROW], out[RED_COL] = divmod(self.red, BOARD_SIZE)
+        out[BLUE_ROW], out[BLUE_COL] = divmod(self.blue, BOARD_SIZE)
+        out[CHEESE_ROW], out[CHEESE_COL] = divmod(self.cheese, BOARD_SIZE)
+        out[CURRENT_PLAYER] = self.current_player
+
+    @property
+    def legal_moves(self) -> List[str]:
+        """
+        :return: The legal directions. The list is shared and must not be mutated.
+        :rtype: List[str]
+        """
+        return _MASK_DIRECTIONS[self.legal_mask]
+
+    @property
+    def red_position(self) -> Tuple[int, int]:
+        return divmod(self.red, BOARD_SIZE)
+
+    @property
+    def blue_position(self) -> Tuple[int, int]:
+        return divmod(self.blue, BOARD_SIZE)
+
+    @property
+    def cheese_position(self) -> Tuple[int, int]:
+        return divmod(self.cheese, BOARD_SIZE)
+
+    def __repr__(self) -> str:
+        return "GameState(red=%s, blue=%s, cheese=%s, current_player=%d, moves=%s)" % (
+            self.red_position,
+            self.blue_position,
+            self.cheese_position,
+            self.current_player,
+            self.legal_moves,
+        )
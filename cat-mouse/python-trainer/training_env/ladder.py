@@ -0,0 +1,280 @@
+"""This module defines a ladder rating a pool of players against each other.
+
+Games are simulated, so every player must be connected to a
+:class:`~training_env.local_game_server.LocalGameServer`. In a game between two
+players of the pool, one plays blue on its own server and the other plays red: it
+chooses its moves on the mirrored board, see
+:func:`~training_env.game_rules.mirror_state`, so that any player can play either
+color. Games are counted, archived and recorded by both players, whatever their
+color.
+
+Games start as soon as both players have a free slot, up to each player's
+max_concurrent_games and the ladder's own limit, so that the pool is kept busy
+instead of playing matches one after another.
+"""
+
+import asyncio
+import math
+from itertools import combinations
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .basicPlayer import BasicPlayer
+from .concurrency import handle_threaded_coroutines
+from .game_rules import BLUE, RED
+from .local_game_server import LocalGameClient
+from .ratings import EloRating, RatingSystem
+
+# How players are paired
+ROUND_ROBIN = "round_robin"
+SWISS = "swiss"
+ELO = "elo"
+
+PAIRINGS = (ROUND_ROBIN, SWISS, ELO)
+
+# Moves, of both players, after which a ladder game ends in a tie: deterministic
+# players can otherwise chase each other forever
+DEFAULT_MAX_TURNS = 500
+
+
+class Ladder:
+    """Plays rounds of games between the players of a pool and rates them.
+
+    With ROUND_ROBIN pairing, every player meets every other one in each round.
+    With SWISS and ELO pairing, each round pairs players with similar scores, or
+    ratings, who have not met yet. With an odd number of players, the last one
+    sits the round out. Games lasting max_turns moves end in a tie.
+    """
+
+    def __init__(
+        self,
+        players: Iterable[BasicPlayer],
+        *,
+        pairing: str = ROUND_ROBIN,
+        games_per_match: int = 2,
+        n_rounds: Optional[int] = None,
+        rating: Optional[RatingSystem] = None,
+        max_concurrent_games: Optional[int] = None,
+        max_turns: Optional[int] = DEFAULT_MAX_TURNS,
+    ):
+        """
+        :param players: The pool. Players must have distinct usernames and be
+            connected to a LocalGameServer.
+        :type players: Iterable[BasicPlayer]
+        :param pairing: ROUND_ROBIN, SWISS or ELO.
+        :type pairing: str
+        :param games_per_match: Games played by each pair per round. Players
+            alternate colors, starting with the first one playing blue.
+        :type games_per_match: int
+        :param n_rounds: Number of rounds. Defaults to 1 for ROUND_ROBIN, and to
+            log2 of the number of players, rounded up, otherwise.
+        :type n_rounds: int, optional
+        :param rating: The rating system, updated after every game. Defaults to
+            Elo ratings.
+        :type rating: RatingSystem, optional
+        :param max_concurrent_games: Maximum number of games running at once across
+            the pool. If None, only players' max_concurrent_games apply.
+        :type max_concurrent_games: int, optional
+        :param max_turns: Moves, of both players, after which a game ends in a tie.
+            If None, the blue player's LocalGameServer max_turns applies.
+        :type max_turns: int, optional
+        """
+        self._players: Dict[str, BasicPlayer] = {}
+        for player in players:
+            if not isinstance(player.game_client, LocalGameClient):
+                raise ValueError(
+                    "Ladder games are simulated: %s is not connected to a "
+                    "LocalGameServer" % player.username
+                )
+            if player.username in self._players:
+                raise ValueError("Duplicate player %s" % player.username)
+            self._players[player.username] = player
+        if len(self._players) < 2:
+            raise ValueError("A ladder needs at least two players")
+        if pairing not in PAIRINGS:
+            raise ValueError("Unknown pairing: %s" % pairing)
+        if games_per_match < 1:
+            raise ValueError("games_per_match must be at least 1")
+        if max_turns is not None and max_turns < 1:
+            raise ValueError("max_turns must be at least 1")
+
+        self._pairing = pairing
+        self._games_per_match = games_per_match
+        if n_rounds is None:
+            n_rounds = (
+                1
+                if pairing == ROUND_ROBIN
+                else math.ceil(math.log2(len(self._players)))
+            )
+        self._n_rounds = n_rounds
+        self._rating: RatingSystem = rating if rating is not None else EloRating()
+        self._max_concurrent_games = max_concurrent_games
+        self._max_turns = max_turns
+
+        self._scores: Dict[str, float] = dict.fromkeys(self._players, 0.0)
+        self._n_games: Dict[str, int] = dict.fromkeys(self._players, 0)
+        self._met: Set[FrozenSet[str]] = set()
+        # games each player is playing, either color
+        self._active: Dict[str, int] = dict.fromkeys(self._players, 0)
+        self._n_running = 0
+        self._n_rounds_played = 0
+        # (blue, red, blue's score) of every finished game, in order
+        self._results: List[Tuple[str, str, float]] = []
+
+    def _pairs(self) -> List[Tuple[str, str]]:
+        """Returns the pairs of the next round."""
+        names = list(self._players)
+        if self._pairing == ROUND_ROBIN:
+            return list(combinations(names, 2))
+
+        if self._pairing == SWISS:
+            unpaired = sorted(
+                names,
+                key=lambda name: (self._scores[name], self._rating.rating(name)),
+                reverse=True,
+            )
+        else:
+            unpaired = sorted(names, key=self._rating.rating, reverse=True)
+
+        pairs = []
+        while len(unpaired) > 1:
+            name = unpaired.pop(0)
+            # the closest player not met yet, or the closest one if all were met
+            index = next(
+                (
+                    i
+                    for i, other in enumerate(unpaired)
+                    if frozenset((name, other)) not in self._met
+                ),
+                0,
+            )
+            pairs.append((name, unpaired.pop(index)))
+        return pairs
+
+    def _games(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Returns the (blue, red) games of pairs, interleaved so that every pair
+        gets its first game before any gets its second."""
+        return [
+            (first, second) if i % 2 == 0 else (second, first)
+            for i in range(self._games_per_match)
+            for first, second in pairs
+        ]
+
+    def _can_start(self, blue: str, red: str) -> bool:
+        if (
+            self._max_concurrent_games is not None
+            and self._n_running >= self._max_concurrent_games
+        ):
+            return False
+        return (
+            self._active[blue] < self._players[blue].max_concurrent_games
+            and self._active[red] < self._players[red].max_concurrent_games
+        )
+
+    async def _play_game(self, blue: str, red: str):
+        red_player = self._players[red]
+        game_tag: Optional[str] = None
+
+        async def red_policy(state: Dict[str, Any]) -> Optional[str]:
+            nonlocal game_tag
+            if game_tag is None:
+                # tags are only unique on the blue player's server
+                game_tag = "%s:%s" % (blue, state["gameTag"])
+            return await handle_threaded_coroutines(
+                red_player._play_as_red(game_tag, state), red_player.loop
+            )
+
+        try:
+            state = await self._players[blue].play_local_game(
+                red_policy, self._max_turns
+            )
+            # red's game ends like the player's own games, see _play_as_red
+            await red_policy(state)
+        finally:
+            self._active[blue] -= 1
+            self._active[red] -= 1
+            self._n_running -= 1
+
+        winner = state.get("winner")
+        score = 1.0 if winner == BLUE else 0.0 if winner == RED else 0.5
+        self._rating.update(blue, red, score)
+        self._scores[blue] += score
+        self._scores[red] += 1 - score
+        self._n_games[blue] += 1
+        self._n_games[red] += 1
+        self._results.append((blue, red, score))
+
+    async def _play_round(self, games: List[Tuple[str, str]]):
+        pending = games
+        running: Set["asyncio.Task[None]"] = set()
+        while pending or running:
+            # start every game whose players both have a free slot
+            waiting = []
+            for blue, red in pending:
+                if self._can_start(blue, red):
+                    self._active[blue] += 1
+                    self._active[red] += 1
+                    self._n_running += 1
+                    running.add(asyncio.ensure_future(self._play_game(blue, red)))
+                else:
+                    waiting.append((blue, red))
+            pending = waiting
+            if not running:
+                raise RuntimeError("No game can start: check max_concurrent_games")
+
+            done, running = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    for other in running:
+                        other.cancel()
+                    await asyncio.gather(*running, return_exceptions=True)
+                    task.result()
+
+    async def run(self) -> List[Tuple[str, float, float, int]]:
+        """Plays every round.
+
+        :return: The standings, see :meth:`standings`.
+        :rtype: List[Tuple[str, float, float, int]]
+        """
+        for _ in range(self._n_rounds):
+            pairs = self._pairs()
+            self._met.update(frozenset(pair) for pair in pairs)
+            await self._play_round(self._games(pairs))
+            self._n_rounds_played += 1
+        return self.standings()
+
+    def standings(self) -> List[Tuple[str, float, float, int]]:
+        """
+        :return: (username, rating, score, games played) of every player, best
+            rated first.
+        :rtype: List[Tuple[str, float, float, int]]
+        """
+        return sorted(
+            (
+                (name, self._rating.rating(name), self._scores[name], self._n_games[name])
+                for name in self._players
+            ),
+            key=lambda standing: standing[1],
+            reverse=True,
+        )
+
+    @property
+    def n_rounds_played(self) -> int:
+        return self._n_rounds_played
+
+    @property
+    def players(self) -> Dict[str, BasicPlayer]:
+        return self._players
+
+    @property
+    def rating(self) -> RatingSystem:
+        return self._rating
+
+    @property
+    def results(self) -> List[Tuple[str, str, float]]:
+        """
+        :return: (blue, red, blue's score) of every finished game, in order.
+        :rtype: List[Tuple[str, str, float]]
+        """
+        return self._results
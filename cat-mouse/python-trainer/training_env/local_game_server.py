@@ -0,0 +1,327 @@
+"""This module defines an in-process stand-in for mouse-cheese-server.
+
+It lets players run self-play without a websocket: game states are handed as dicts
+straight to the player's message handlers and orders are applied directly.
+"""
+
+import asyncio
+import random
+from time import perf_counter_ns
+from itertools import count
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Set
+
+from .account_configuration import AccountConfiguration
+from .game_client import GameClient
+from .game_order import GameOrder
+from .game_rules import (
+    BLUE,
+    INITIAL_BLUE_POSITION,
+    INITIAL_RED_POSITION,
+    RED,
+    apply_direction,
+    calculate_possible_moves,
+    random_position,
+)
+from .server_configuration import ServerConfiguration, SimulatedServerConfiguration
+
+if TYPE_CHECKING:
+    from .metrics import LatencyMetrics
+
+
+def random_opponent(state: Dict[str, Any]) -> str:
+    """Default red policy: a uniformly random possible move."""
+    moves = state["possibleMoves"]
+    return moves[int(random.random() * len(moves))]
+
+
+class LocalGameServer:
+    """Pure-python implementation of the cat-mouse server rules.
+
+    The player connected through a :class:`LocalGameClient` plays blue. Red is played
+    by ``opponent``, a callable receiving the game state and returning a direction.
+
+    Like mouse-cheese-server, the final state is sent with a ``move`` intent,
+    ``gameOver`` set and currentPlayer left on the last player to move. Games
+    reaching max_turns, which the server does not have, end the same way with no
+    winner.
+    """
+
+    def __init__(
+        self,
+        opponent: Optional[Callable[[Dict[str, Any]], str]] = None,
+        max_turns: Optional[int] = None,
+    ):
+        """
+        :param opponent: Red policy. Defaults to random moves.
+        :type opponent: Callable[[Dict[str, Any]], str], optional
+        :param max_turns: If set, games lasting that many moves end in a tie.
+        :type max_turns: int, optional
+        """
+        self._opponent = opponent if opponent is not None else random_opponent
+        self._max_turns = max_turns
+        self._games: Dict[str, Dict[str, Any]] = {}
+        self._turns: Dict[str, int] = {}
+        self._turn_limits: Dict[str, Optional[int]] = {}
+        self._tags = count(1)
+
+    def start_game(self, max_turns: Optional[int] = None) -> Dict[str, Any]:
+        """Creates a new game and returns its state.
+
+        :param max_turns: If set, overrides the server's max_turns for this game.
+        :type max_turns: int, optional
+        """
+        game_tag = "local-%d" % next(self._tags)
+        state: Dict[str, Any] = {
+            "redMousePosition": INITIAL_RED_POSITION,
+            "blueMousePosition": INITIAL_BLUE_POSITION,
+            "cheesePosition": random_position(),
+            "currentPlayer": RED,
+            "gameOver": False,
+            "winner": None,
+            "possibleMoves": calculate_possible_moves(INITIAL_RED_POSITION),
+            "gameTag": game_tag,
+            "gameIntent": "init",
+        }
+        self._games[game_tag] = state
+        self._turns[game_tag] = 0
+        self._turn_limits[game_tag] = (
+            max_turns if max_turns is not None else self._max_turns
+        )
+        return state
+
+    def apply_move(self, game_tag: str, player: str, direction: str) -> Dict[str, Any]:
+        """Plays direction for player in the given game, updating its state in place.
+
+        Moves from the wrong player or in finished games are ignored.
+
+        :param game_tag: The game identifier.
+        :type game_tag: str
+        :param player: The moving player, red or blue.
+        :type player: str
+        :param direction: The direction to move in.
+        :type direction: str
+        :return: The game state.
+        :rtype: Dict[str, Any]
+        """
+        state = self._games[game_tag]
+        if player != state["currentPlayer"] or state["gameOver"]:
+            return state
+
+        key = "redMousePosition" if player == RED else "blueMousePosition"
+        position = apply_direction(state[key], direction)
+        state[key] = position
+
+        turns = self._turns[game_tag] + 1
+        self._turns[game_tag] = turns
+        max_turns = self._turn_limits.get(game_tag)
+
+        if position == state["cheesePosition"]:
+            state["gameOver"] = True
+            state["winner"] = player
+            state["possibleMoves"] = []
+        elif max_turns is not None and turns >= max_turns:
+            state["gameOver"] = True
+            state["possibleMoves"] = []
+        else:
+            next_player = BLUE if player == RED else RED
+            state["currentPlayer"] = next_player
+            state["possibleMoves"] = calculate_possible_moves(
+                state["redMousePosition" if next_player == RED else "blueMousePosition"]
+            )
+        state["gameIntent"] = "move"
+        return state
+
+    def end_game(self, game_tag: str):
+        """Forgets a game. Unknown game tags are ignored.
+
+        :param game_tag: The game identifier.
+        :type game_tag: str
+        """
+        self._games.pop(game_tag, None)
+        self._turns.pop(game_tag, None)
+        self._turn_limits.pop(game_tag, None)
+
+    async def play_game(
+        self,
+        client: "LocalGameClient",
+        opponent: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        max_turns: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Plays a full game against client, which plays blue.
+
+        :param client: The client to play against.
+        :type client: LocalGameClient
+        :param opponent: Red policy for this game. It can also return an awaitable
+            resolving to the direction. Defaults to the server's opponent.
+        :type opponent: Callable[[Dict[str, Any]], Any], optional
+        :param max_turns: If set, overrides the server's max_turns for this game.
+        :type max_turns: int, optional
+        :return: The final state.
+        :rtype: Dict[str, Any]
+        """
+        if opponent is None:
+            opponent = self._opponent
+        state = self.start_game(max_turns)
+        game_tag = state["gameTag"]
+        handle_game_message = client._handle_game_message  # type: ignore
+        message: Dict[str, Any] = {"intent": "init", "game_info": state}
+        metrics = client.metrics
+
+        async def handle(message: Dict[str, Any]):
+            if metrics is None:
+                await handle_game_message(message)
+                return
+            # states are handed over already decoded, and handled right away
+            timestamps = message["timestamps"] = [0, 0, perf_counter_ns()]
+            await handle_game_message(message)
+            metrics.record_timestamps(timestamps)
+
+        try:
+            # like mouse-cheese-server, announce the game before red's first move,
+            # which can already end it
+            await handle(message)
+            while not state["gameOver"]:
+                # opponents and players can both answer without awaiting anything:
+                # yield every turn, so that concurrent games are interleaved
+                await asyncio.sleep(0)
+                if state["currentPlayer"] == RED:
+                    direction = opponent(state)
+                    if not isinstance(direction, str):
+                        direction = await direction
+                    self.apply_move(game_tag, RED, direction)
+                    continue
+
+                message["intent"] = state["gameIntent"]
+                await handle(message)
+
+                if state["currentPlayer"] == BLUE and not state["gameOver"]:
+                    # The player did not answer: treat it as a forfeit
+                    client.logger.warning(
+                        "No order received for game %s, forfeiting", game_tag
+                    )
+                    state["gameOver"] = True
+                    state["winner"] = RED
+                    state["possibleMoves"] = []
+
+            message["intent"] = state["gameIntent"]
+            await handle(message)
+        finally:
+            self.end_game(game_tag)
+        return state
+
+    async def send_challenge(self, client: "LocalGameClient", challenger: str):
+        """Hands client a challenge from challenger.
+
+        If client accepts it, the game is played against the server's opponent.
+
+        :param client: The challenged client.
+        :type client: LocalGameClient
+        :param challenger: The challenging player's name.
+        :type challenger: str
+        """
+        await client._handle_game_info(  # type: ignore
+            {"gameIntent": "CHALLENGE", "challenger": challenger}
+        )
+
+    @property
+    def games(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: The states of running games, by game tag.
+        :rtype: Dict[str, Dict[str, Any]]
+        """
+        return self._games
+
+
+class LocalGameClient(GameClient):
+    """Game client connected to a :class:`LocalGameServer` instead of a websocket."""
+
+    def __init__(
+        self,
+        account_configuration: AccountConfiguration,
+        *,
+        local_game_server: Optional[LocalGameServer] = None,
+        log_level: Optional[int] = None,
+        server_configuration: ServerConfiguration = SimulatedServerConfiguration,
+        start_listening: bool = True,
+        ping_interval: Optional[float] = None,
+        ping_timeout: Optional[float] = None,
+        async_logging: bool = False,
+        metrics: Optional["LatencyMetrics"] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        :param account_configuration: Account configuration.
+        :type account_configuration: AccountConfiguration
+        :param local_game_server: The server to play on. Defaults to a new server
+            with a random opponent.
+        :type local_game_server: LocalGameServer, optional
+        :param log_level: The client's logger level.
+        :type log_level: int. Defaults to logging's default level.
+        :param server_configuration: Server configuration.
+        :type server_configuration: ServerConfiguration
+        :param start_listening: Whether to start listening to the server. Defaults to
+            True.
+        :type start_listening: bool
+        :param async_logging: Whether log records should be written from a separate
+            thread. Defaults to False.
+        :type async_logging: bool
+        :param metrics: Latency histograms. States are handed over already decoded,
+            so their decode and receive stages are not recorded. Optional.
+        :type metrics: LatencyMetrics, optional
+        :param loop: The loop the client runs on. Defaults to GAME_LOOP.
+        :type loop: asyncio.AbstractEventLoop, optional
+        """
+        if local_game_server is None:
+            local_game_server = LocalGameServer()
+        self._game_server = local_game_server
+        self._game_tasks: Set["asyncio.Task[Any]"] = set()
+
+        super().__init__(
+            account_configuration,
+            log_level=log_level,
+            server_configuration=server_configuration,
+            start_listening=start_listening,
+            ping_interval=ping_interval,
+            ping_timeout=ping_timeout,
+            async_logging=async_logging,
+            metrics=metrics,
+            loop=loop,
+        )
+
+    async def challenge(self, username: str, format_: str, packed_team: Optional[str]):
+        assert self.logged_in.is_set(), f"Expected {self.username} to be logged in."
+        self._start_game()
+
+    async def accept_challenge(self, username: str, packed_team: Optional[str]):
+        assert self.logged_in.is_set(), f"Expected {self.username} to be logged in."
+        self._start_game()
+
+    def _start_game(self):
+        task = asyncio.create_task(self._game_server.play_game(self))
+        self._game_tasks.add(task)
+        task.add_done_callback(self._game_tasks.discard)
+
+    async def listen(self):
+        """There is no connection to wait for: the client is ready right away."""
+        self.logged_in.set()
+
+    async def send_message(
+        self, message: str, room: str = "", message_2: Optional[str] = None
+    ):
+        self.logger.warning("Ignoring raw message sent to local server: %s", message)
+
+    async def send_order(self, order: GameOrder, game_tag: str):
+        self._game_server.apply_move(game_tag, BLUE, order.order)  # type: ignore
+
+    async def _stop_listening(self):
+        await self._handle_stop_listening()
+        for task in list(self._game_tasks):
+            task.cancel()
+
+    @property
+    def game_server(self) -> LocalGameServer:
+        """
+        :return: The server the client plays on.
+        :rtype: LocalGameServer
+        """
+        return self._game_server
@@ -0,0 +1,489 @@
+"""This module defines latency histograms of the stages of a turn and exporters
+making them readable by local scrapers.
+
+A received frame goes through the following stages, each timed in nanoseconds:
+
+- ``decode``: decoding the frame;
+- ``receive``: from the frame being decoded to its handling starting, i.e. the time
+  it spent queued in the dispatcher;
+- ``get_game``: looking up, or creating, the frame's game;
+- ``parse_message``: updating the game with the frame;
+- ``choose_move``: the player choosing its order, for frames requesting one;
+- ``send_message``: sending the order.
+
+Stages are timed by the timestamps taken at their boundaries: a frame's
+``timestamps`` list holds the perf_counter_ns at which it was received, decoded,
+handled, had its game found, was parsed, had its order chosen and sent. Its
+handlers append to it as it goes, and it is recorded once, when the frame has been
+handled.
+"""
+
+import asyncio
+import socket
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+STAGES = (
+    "decode",
+    "receive",
+    "get_game",
+    "parse_message",
+    "choose_move",
+    "send_message",
+)
+DECODE, RECEIVE, GET_GAME, PARSE_MESSAGE, CHOOSE_MOVE, SEND_MESSAGE = range(len(STAGES))
+
+# timestamps of a frame: one per stage boundary
+N_TIMESTAMPS = len(STAGES) + 1
+_PADDING = [[0] * n for n in range(N_TIMESTAMPS + 1)]
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Buckets are log-linear, as in HdrHistogram: every power of two is split into
+# 2 ** SUB_BUCKET_BITS buckets, bounding the relative error of quantiles to about 3%.
+SUB_BUCKET_BITS = 5
+# values of 2 ** (MAX_SHIFT + SUB_BUCKET_BITS + 1) ns (about 3 days) and more share
+# the last bucket
+MAX_SHIFT = 42
+N_BUCKETS = (MAX_SHIFT + 2) << SUB_BUCKET_BITS
+
+
+def bucket_indices(values: np.ndarray) -> np.ndarray:
+    """Returns the bucket of each of values.
+
+    :param values: Non-negative integer values.
+    :type values: np.ndarray
+    :return: Bucket indices, of the same shape.
+    :rtype: np.ndarray
+    """
+    values = np.maximum(np.asarray(values, dtype=np.int64), 0)
+    # exact for values below 2 ** 53
+    bit_lengths = np.frexp(values.astype(np.float64))[1].astype(np.int64)
+    shifts = np.clip(bit_lengths - SUB_BUCKET_BITS - 1, 0, MAX_SHIFT)
+    indices = (shifts << SUB_BUCKET_BITS) + (values >> shifts)
+    return np.minimum(indices, N_BUCKETS - 1)
+
+
+def bucket_lower_bounds() -> np.ndarray:
+    """
+    :return: The smallest value of every bucket.
+    :rtype: np.ndarray
+    """
+    indices = np.arange(N_BUCKETS, dtype=np.int64)
+    shifts = np.maximum((indices >> SUB_BUCKET_BITS) - 1, 0)
+    return (indices - (shifts << SUB_BUCKET_BITS)) << shifts
+
+
+_LOWER_BOUNDS = bucket_lower_bounds()
+# the largest value of every bucket
+_UPPER_BOUNDS = np.append(_LOWER_BOUNDS[1:] - 1, np.iinfo(np.int64).max)
+
+
+class LatencyHistogram:
+    """Histogram of durations in nanoseconds, with log-linear buckets."""
+
+    __slots__ = ("_counts", "_count", "_total", "_max")
+
+    def __init__(self):
+        self._counts = np.zeros(N_BUCKETS, dtype=np.int64)
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    def record(self, value: int):
+        self.record_many(np.array([value], dtype=np.int64))
+
+    def record_many(self, values: np.ndarray):
+        """Records many durations at once.
+
+        :param values: Durations, in nanoseconds.
+        :type values: np.ndarray
+        """
+        if len(values) == 0:
+            return
+        values = np.asarray(values, dtype=np.int64)
+        self._counts += np.bincount(bucket_indices(values), minlength=N_BUCKETS)
+        self._count += len(values)
+        self._total += int(values.sum())
+        self._max = max(self._max, int(values.max()))
+
+    def merge(self, other: "LatencyHistogram"):
+        """Adds the durations recorded by other.
+
+        :param other: The histogram to add.
+        :type other: LatencyHistogram
+        """
+        self._counts += other._counts
+        self._count += other._count
+        self._total += other._total
+        self._max = max(self._max, other._max)
+
+    def percentile(self, quantile: float) -> int:
+        """Returns an upper bound of the given quantile.
+
+        :param quantile: The quantile, between 0 and 1.
+        :type quantile: float
+        :return: The largest value of the bucket holding the quantile, capped by the
+            largest recorded value, in nanoseconds. 0 if nothing was recorded.
+        :rtype: int
+        """
+        if self._count == 0:
+            return 0
+        rank = max(1, int(np.ceil(quantile * self._count)))
+        bucket = int(np.searchsorted(np.cumsum(self._counts), rank))
+        return min(int(_UPPER_BOUNDS[bucket]), self._max)
+
+    def reset(self):
+        self._counts[:] = 0
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    def snapshot(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        """
+        :param quantiles: Quantiles to report.
+        :type quantiles: Sequence[float]
+        :return: The count, sum and max of recorded durations, and the requested
+            quantiles keyed by quantile, in nanoseconds.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "count": self._count,
+            "sum": self._total,
+            "max": self._max,
+            "quantiles": {q: self.percentile(q) for q in quantiles},
+        }
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        :return: The number of values recorded in each bucket.
+        :rtype: np.ndarray
+        """
+        return self._counts
+
+    @property
+    def max(self) -> int:
+        return self._max
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+
+class LatencyMetrics:
+    """Latency histograms of the stages of a player's frames.
+
+    Recording a frame only extends a list with its timestamps: they are folded into
+    the histograms in bulk, every ``buffer_size`` frames and whenever histograms are
+    read. Timing a frame costs its clock reads, up to 7, and about as much again to
+    record and fold its timestamps: see the ``frames`` benchmark's
+    ``metrics_overhead_ns_per_frame``.
+
+    Frames are recorded from the game loop. Histograms can be read from another
+    thread: frames recorded meanwhile are kept for the next fold.
+    """
+
+    def __init__(self, buffer_size: int = 4096):
+        """
+        :param buffer_size: Number of frames buffered before being folded into the
+            histograms.
+        :type buffer_size: int
+        """
+        self._buffer_size = buffer_size * N_TIMESTAMPS
+        self._pending: List[int] = []
+        self._histograms = [LatencyHistogram() for _ in STAGES]
+        self._lock = threading.Lock()
+
+    def record_timestamps(self, timestamps: List[int]):
+        """Records the stage boundaries of a frame.
+
+        :param timestamps: Up to N_TIMESTAMPS perf_counter_ns values, in stage order.
+            Missing boundaries, e.g. for frames handed over already decoded or not
+            requesting an order, are 0 or left out at the end.
+        :type timestamps: List[int]
+        """
+        if len(timestamps) < N_TIMESTAMPS:
+            timestamps = timestamps + _PADDING[N_TIMESTAMPS - len(timestamps)]
+        pending = self._pending
+        # a single extend, so that a fold from another thread sees whole frames
+        pending.extend(timestamps)
+        if len(pending) >= self._buffer_size:
+            self._fold()
+
+    def record(self, stage: int, duration: int):
+        """Records the duration of a single stage.
+
+        Unlike :meth:`record_timestamps`, this updates the histogram right away.
+
+        :param stage: The stage, one of DECODE, RECEIVE, GET_GAME, PARSE_MESSAGE,
+            CHOOSE_MOVE and SEND_MESSAGE.
+        :type stage: int
+        :param duration: The duration, in nanoseconds.
+        :type duration: int
+        """
+        with self._lock:
+            self._histograms[stage].record(duration)
+
+    def _fold(self):
+        with self._lock:
+            pending = self._pending
+            # frames are appended whole: fold the ones recorded so far, in place,
+            # so that none recorded meanwhile from another thread is lost
+            n_values = len(pending) // N_TIMESTAMPS * N_TIMESTAMPS
+            if not n_values:
+                return
+            timestamps = np.fromiter(pending, dtype=np.int64, count=n_values)
+            del pending[:n_values]
+            timestamps = timestamps.reshape(-1, N_TIMESTAMPS)
+            durations = np.diff(timestamps, axis=1)
+            known = (timestamps[:, :-1] != 0) & (timestamps[:, 1:] != 0)
+            for stage, histogram in enumerate(self._histograms):
+                histogram.record_many(durations[known[:, stage], stage])
+
+    def flush(self):
+        """Folds every buffered frame into the histograms."""
+        if self._pending:
+            self._fold()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """
+        :param stage: The stage name, from STAGES.
+        :type stage: str
+        :return: The stage's histogram, up to date.
+        :rtype: LatencyHistogram
+        """
+        self.flush()
+        return self._histograms[STAGES.index(stage)]
+
+    def snapshot(
+        self, quantiles: Sequence[float] = DEFAULT_QUANTILES
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        :param quantiles: Quantiles to report.
+        :type quantiles: Sequence[float]
+        :return: The snapshot of every stage's histogram, keyed by stage name.
+        :rtype: Dict[str, Dict[str, Any]]
+        """
+        self.flush()
+        return {
+            stage: histogram.snapshot(quantiles)
+            for stage, histogram in zip(STAGES, self._histograms)
+        }
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            for histogram in self._histograms:
+                histogram.reset()
+
+
+def format_prometheus(
+    metrics: Dict[str, LatencyMetrics],
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    name: str = "training_env_stage_latency_seconds",
+) -> str:
+    """Formats metrics in the Prometheus text exposition format, as summaries.
+
+    :param metrics: Metrics, keyed by player name.
+    :type metrics: Dict[str, LatencyMetrics]
+    :param quantiles: Quantiles to report.
+    :type quantiles: Sequence[float]
+    :param name: Metric name.
+    :type name: str
+    :return: The exposition text.
+    :rtype: str
+    """
+    lines = [
+        "# HELP %s Duration of each stage of a turn." % name,
+        "# TYPE %s summary" % name,
+    ]
+    for player, player_metrics in metrics.items():
+        player = player.replace("\\", "\\\\").replace('"', '\\"')
+        for stage, snapshot in player_metrics.snapshot(quantiles).items():
+            labels = 'player="%s",stage="%s"' % (player, stage)
+            for quantile, value in snapshot["quantiles"].items():
+                lines.append(
+                    '%s{%s,quantile="%g"} %.9f' % (name, labels, quantile, value / 1e9)
+                )
+            lines.append("%s_sum{%s} %.9f" % (name, labels, snapshot["sum"] / 1e9))
+            lines.append("%s_count{%s} %d" % (name, labels, snapshot["count"]))
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsExporter:
+    def __init__(self, quantiles: Sequence[float] = DEFAULT_QUANTILES):
+        self._quantiles = tuple(quantiles)
+        self._metrics: Dict[str, LatencyMetrics] = {}
+
+    def register(self, name: str, metrics: LatencyMetrics):
+        """Exports metrics under name, typically a player's username.
+
+        :param name: The name.
+        :type name: str
+        :param metrics: The metrics, e.g. a player's ``metrics``.
+        :type metrics: LatencyMetrics
+        """
+        self._metrics[name] = metrics
+
+    def unregister(self, name: str):
+        self._metrics.pop(name, None)
+
+    @property
+    def metrics(self) -> Dict[str, LatencyMetrics]:
+        return self._metrics
+
+
+class PrometheusExporter(_MetricsExporter):
+    """Serves registered metrics over HTTP, in the Prometheus text format.
+
+    Every request, whatever its path, is answered with the current metrics.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 9464,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    ):
+        """
+        :param host: Interface to listen on.
+        :type host: str
+        :param port: Port to listen on.
+        :type port: int
+        :param quantiles: Quantiles to report.
+        :type quantiles: Sequence[float]
+        """
+        super().__init__(quantiles)
+        self._host = host
+        self._port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Starts serving, on the running loop."""
+        self._server = await asyncio.start_server(self._serve, self._host, self._port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # the request itself is irrelevant: read its headers and drop them
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = format_prometheus(self._metrics, self._quantiles).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: %d\r\n"
+                b"Connection: close\r\n\r\n" % len(body)
+            )
+            writer.write(body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    @property
+    def port(self) -> int:
+        """
+        :return: The port served on, once started.
+        :rtype: int
+        """
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+
+class StatsdExporter(_MetricsExporter):
+    """Sends registered metrics to a StatsD daemon over UDP.
+
+    Each stage of each player is sent as gauges of its quantiles and max, in
+    milliseconds, and a counter of durations recorded since the previous flush.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8125,
+        prefix: str = "training_env",
+        interval: float = 10.0,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    ):
+        """
+        :param host: StatsD host.
+        :type host: str
+        :param port: StatsD port.
+        :type port: int
+        :param prefix: Prefix of metric names.
+        :type prefix: str
+        :param interval: Seconds between flushes, when running.
+        :type interval: float
+        :param quantiles: Quantiles to report.
+        :type quantiles: Sequence[float]
+        """
+        super().__init__(quantiles)
+        self._address = (host, port)
+        self._prefix = prefix
+        self._interval = interval
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._sent_counts: Dict[Tuple[str, str], int] = {}
+
+    def lines(self) -> List[str]:
+        """
+        :return: The StatsD lines of the current metrics.
+        :rtype: List[str]
+        """
+        lines = []
+        for player, metrics in self._metrics.items():
+            player = "".join(c if c.isalnum() else "_" for c in player)
+            for stage, snapshot in metrics.snapshot(self._quantiles).items():
+                name = "%s.%s.%s" % (self._prefix, player, stage)
+                for quantile, value in snapshot["quantiles"].items():
+                    lines.append(
+                        "%s.p%s:%.6f|g"
+                        % (name, ("%g" % (quantile * 100)).replace(".", "_"), value / 1e6)
+                    )
+                lines.append("%s.max:%.6f|g" % (name, snapshot["max"] / 1e6))
+                sent = self._sent_counts.get((player, stage), 0)
+                lines.append("%s.count:%d|c" % (name, snapshot["count"] - sent))
+                self._sent_counts[(player, stage)] = snapshot["count"]
+        return lines
+
+    def flush(self):
+        """Sends the current metrics, packing lines into datagrams."""
+        datagram: List[str] = []
+        size = 0
+        for line in self.lines():
+            if datagram and size + len(line) + 1 > 1432:
+                self._send("\n".join(datagram))
+                datagram, size = [], 0
+            datagram.append(line)
+            size += len(line) + 1
+        if datagram:
+            self._send("\n".join(datagram))
+
+    def _send(self, datagram: str):
+        try:
+            self._socket.sendto(datagram.encode(), self._address)
+        except OSError:
+            # metrics are best effort: never fail a player because StatsD is away
+            pass
+
+    async def run(self):
+        """Flushes every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self._interval)
+            self.flush()
+
+    def close(self):
+        self._socket.close()
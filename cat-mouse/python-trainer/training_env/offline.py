@@ -0,0 +1,70 @@
+"""This module is the entry point for offline simulation and training.
+
+Players created here play against a :class:`LocalGameServer` in-process: importing
+this module, and using what it exports, never loads websockets or requests. Exports
+depending on numpy are only imported when first accessed.
+"""
+
+from importlib import import_module
+from typing import Any, Callable, Dict, Optional, Type
+
+from .basicPlayer import BasicPlayer, wait_for_players
+from .local_game_server import LocalGameClient, LocalGameServer, random_opponent
+from .player import RandomPlayer
+
+# Exports imported on first access, by module
+_LAZY_EXPORTS = {
+    "BatchedPolicyPlayer": ".batched_policy",
+    "EpisodeReader": ".episode_store",
+    "EloRating": ".ratings",
+    "EpisodeWriter": ".episode_store",
+    "GameArchive": ".game_archive",
+    "GlickoRating": ".ratings",
+    "Ladder": ".ladder",
+    "OptimalPlayer": ".solver",
+    "QLearningPlayer": ".q_learning",
+    "ReplayBuffer": ".replay_buffer",
+    "SelfPlayFarm": ".self_play",
+    "VectorGameEnv": ".vector_env",
+}
+
+__all__ = [
+    "BasicPlayer",
+    "LocalGameClient",
+    "LocalGameServer",
+    "RandomPlayer",
+    "create_player",
+    "random_opponent",
+    "wait_for_players",
+] + sorted(_LAZY_EXPORTS)
+
+
+def create_player(
+    player_class: Type[BasicPlayer] = RandomPlayer,
+    *,
+    opponent: Optional[Callable[[Dict[str, Any]], str]] = None,
+    max_turns: Optional[int] = None,
+    **kwargs: Any,
+) -> BasicPlayer:
+    """Creates a player playing against its own in-process server.
+
+    :param player_class: The player's class. Defaults to RandomPlayer.
+    :type player_class: Type[BasicPlayer]
+    :param opponent: Red policy of the server. Defaults to random moves.
+    :type opponent: Callable[[Dict[str, Any]], str], optional
+    :param max_turns: If set, games lasting that many moves end in a tie.
+    :type max_turns: int, optional
+    :param kwargs: Passed to player_class.
+    :return: The player.
+    :rtype: BasicPlayer
+    """
+    kwargs.setdefault("local_game_server", LocalGameServer(opponent, max_turns))
+    return player_class(**kwargs)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_EXPORTS:
+        value = getattr(import_module(_LAZY_EXPORTS[name], __package__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
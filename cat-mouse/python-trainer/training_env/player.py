@@ -8,5 +8,4 @@ from .basicPlayer import BasicPlayer
 
 class RandomPlayer(BasicPlayer):
     def choose_move(self, game: AbstractGame) -> GameOrder:
-        print("choose random move")
         return self.choose_random_move(game)
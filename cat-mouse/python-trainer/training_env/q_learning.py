@@ -0,0 +1,324 @@
+"""This module defines a tabular Q-learning player
+"""
+
+import random
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+from .abstract_game import AbstractGame
+from .basicPlayer import BasicPlayer
+from .game import Game
+from .game_order import GameOrder
+from .game_rules import BOARD_SIZE, DIRECTIONS, mirror_direction
+from .game_state import (
+    BLUE_COL,
+    BLUE_INDEX,
+    BLUE_ROW,
+    CHEESE_COL,
+    CHEESE_ROW,
+    CURRENT_PLAYER,
+    DIRECTION_INDEX,
+    RED_COL,
+    RED_INDEX,
+    RED_ROW,
+    mask_directions,
+)
+from .replay_buffer import ReplayBuffer
+
+# (red_row, red_col, blue_row, blue_col, cheese_row, cheese_col, action)
+Q_TABLE_SHAPE = (BOARD_SIZE,) * 6 + (len(DIRECTIONS),)
+
+# Reward of a transition after which red caught the cheese, as recorded by games
+LOSS_REWARD = -1.0
+
+_ORDERS = [GameOrder(direction) for direction in DIRECTIONS]  # type: ignore
+
+# Row/col offsets of each action, indexed like DIRECTIONS
+_ACTION_DELTAS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.intp)
+# Action of each action once the board is rotated by 180 degrees
+_MIRRORED_ACTIONS = np.array(
+    [DIRECTION_INDEX[mirror_direction(direction)] for direction in DIRECTIONS],
+    dtype=np.intp,
+)
+
+
+def _mirror_observations(observations: np.ndarray) -> np.ndarray:
+    """Returns observations as seen by the other player, as
+    :func:`~training_env.game_rules.mirror_state` does for states."""
+    mirrored = np.empty_like(observations)
+    mirrored[:, RED_ROW : RED_COL + 1] = (
+        BOARD_SIZE - 1 - observations[:, BLUE_ROW : BLUE_COL + 1]
+    )
+    mirrored[:, BLUE_ROW : BLUE_COL + 1] = (
+        BOARD_SIZE - 1 - observations[:, RED_ROW : RED_COL + 1]
+    )
+    mirrored[:, CHEESE_ROW : CHEESE_COL + 1] = (
+        BOARD_SIZE - 1 - observations[:, CHEESE_ROW : CHEESE_COL + 1]
+    )
+    mirrored[:, CURRENT_PLAYER] = RED_INDEX + BLUE_INDEX - observations[:, CURRENT_PLAYER]
+    return mirrored
+
+
+class QLearningPlayer(BasicPlayer):
+    """Player choosing moves epsilon-greedily from a dense Q-table.
+
+    The table is a float32 array of shape Q_TABLE_SHAPE, indexed by the first six
+    observation columns: the opponent's (red, the cat) position, the player's (blue,
+    the mouse) position and the cheese position, then the action. It only holds
+    blue's values: transitions of red's moves, e.g. from :class:`VectorGameEnv`,
+    are mirrored to be seen from blue's side, and states where red is to move are
+    valued through red's reply, the one worst for blue.
+
+    Training is done in batches, from a :class:`ReplayBuffer` or any dict of arrays
+    shaped like its samples, e.g. from :class:`EpisodeReader`.
+    """
+
+    def __init__(
+        self,
+        account_configuration: Any = None,
+        *,
+        learning_rate: float = 0.1,
+        discount_factor: float = 0.9,
+        epsilon: float = 0.1,
+        q_table: Optional[Union[np.ndarray, str]] = None,
+        seed: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        """
+        :param account_configuration: Account configuration. Optional.
+        :type account_configuration: AccountConfiguration, optional
+        :param learning_rate: Step size of updates.
+        :type learning_rate: float
+        :param discount_factor: Discount of future rewards.
+        :type discount_factor: float
+        :param epsilon: Probability of playing a random legal move.
+        :type epsilon: float
+        :param q_table: Initial table, or the path of a checkpoint to load. Defaults
+            to zeros.
+        :type q_table: np.ndarray or str, optional
+        :param seed: Seed of exploration. Optional.
+        :type seed: int, optional
+        :param kwargs: Passed to BasicPlayer.
+        """
+        super().__init__(account_configuration, **kwargs)
+        self.learning_rate = learning_rate
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self._random = random.Random(seed)
+
+        if isinstance(q_table, str):
+            q_table = self.load_q_table(q_table)
+        elif q_table is None:
+            q_table = np.zeros(Q_TABLE_SHAPE, dtype=np.float32)
+        self._set_q_table(q_table)
+
+    def _set_q_table(self, q_table: np.ndarray):
+        if q_table.shape != Q_TABLE_SHAPE:
+            raise ValueError(
+                "Expected a Q-table of shape %s, got %s" % (Q_TABLE_SHAPE, q_table.shape)
+            )
+        self._q_table = q_table
+        # same memory, indexed by (red cell, blue cell, cheese cell, action)
+        n_cells = BOARD_SIZE * BOARD_SIZE
+        self._q_by_cells = q_table.reshape(n_cells, n_cells, n_cells, len(DIRECTIONS))
+
+    def choose_move(self, game: AbstractGame) -> GameOrder:
+        if not isinstance(game, Game):
+            return self.choose_random_move(game)
+        state = game.state
+        legal_moves = mask_directions(state.legal_mask)
+        if not legal_moves:
+            return self.choose_default_move()
+        if self._random.random() < self.epsilon:
+            return GameOrder(legal_moves[int(self._random.random() * len(legal_moves))])  # type: ignore
+
+        values = self._q_by_cells[state.red, state.blue, state.cheese]
+        mask = state.legal_mask
+        best_action = -1
+        best_value = -np.inf
+        for action in range(len(DIRECTIONS)):
+            if mask & (1 << action) and values[action] > best_value:
+                best_action = action
+                best_value = values[action]
+        return _ORDERS[best_action]
+
+    def update(self, batch: Dict[str, np.ndarray]) -> np.ndarray:
+        """Applies one Q-learning update per transition of batch.
+
+        Transitions are applied together: updates of the same entry add up.
+
+        Both transitions recorded by games, from blue's turn to blue's next turn,
+        and transitions of single moves of either player, as stepped by
+        :class:`VectorGameEnv`, can be mixed: transitions of red's moves are
+        mirrored, and states where red is to move are valued through red's reply
+        minimizing blue's value, a catch by red being worth LOSS_REWARD.
+
+        :param batch: Transitions, with the keys of :meth:`ReplayBuffer.sample`.
+            ``weights``, if present, scale each update.
+        :type batch: Dict[str, np.ndarray]
+        :return: The TD errors of the transitions.
+        :rtype: np.ndarray
+        """
+        q_table = self._q_table
+        observations = batch["observations"]
+        next_observations = batch["next_observations"]
+        next_legal_masks = batch["next_legal_masks"]
+        actions = batch["actions"].astype(np.intp)
+        dones = batch["dones"]
+
+        red_moved = observations[:, CURRENT_PLAYER] == RED_INDEX
+        if red_moved.any():
+            observations = observations.copy()
+            observations[red_moved] = _mirror_observations(observations[red_moved])
+            next_observations = next_observations.copy()
+            next_observations[red_moved] = _mirror_observations(
+                next_observations[red_moved]
+            )
+            next_legal_masks = next_legal_masks.copy()
+            next_legal_masks[red_moved] = next_legal_masks[red_moved][
+                :, _MIRRORED_ACTIONS
+            ]
+            actions = np.where(red_moved, _MIRRORED_ACTIONS[actions], actions)
+
+        state_index = tuple(observations[:, :6].astype(np.intp).T)
+        next_values = np.where(
+            next_legal_masks,
+            q_table[tuple(next_observations[:, :6].astype(np.intp).T)],
+            -np.inf,
+        ).max(axis=1)
+        # states without legal moves are worth nothing
+        next_values = self.discount_factor * np.where(
+            np.isfinite(next_values), next_values, 0.0
+        )
+        red_to_move = ~dones & (next_observations[:, CURRENT_PLAYER] == RED_INDEX)
+        if red_to_move.any():
+            next_values[red_to_move] = self._red_reply_values(
+                next_observations[red_to_move], next_legal_masks[red_to_move]
+            )
+        # terminal states are worth nothing
+        next_values = np.where(dones, 0.0, next_values)
+
+        targets = batch["rewards"] + next_values
+        td_errors = (targets - q_table[state_index + (actions,)]).astype(np.float32)
+        steps = self.learning_rate * td_errors
+        if "weights" in batch:
+            steps = steps * batch["weights"]
+        np.add.at(q_table, state_index + (actions,), steps)
+        return td_errors
+
+    def _red_reply_values(
+        self, observations: np.ndarray, legal_masks: np.ndarray
+    ) -> np.ndarray:
+        """Returns the discounted values for blue of states where red is to move,
+        after red's reply minimizing them.
+
+        :param observations: ``(n, 7)`` observations, red to move.
+        :type observations: np.ndarray
+        :param legal_masks: ``(n, 4)`` legal moves masks of red.
+        :type legal_masks: np.ndarray
+        :return: ``(n,)`` values.
+        :rtype: np.ndarray
+        """
+        red = observations[:, RED_ROW : RED_COL + 1].astype(np.intp)
+        blue = observations[:, BLUE_ROW : BLUE_COL + 1].astype(np.intp)
+        cheese = observations[:, CHEESE_ROW : CHEESE_COL + 1].astype(np.intp)
+
+        # (n, 4, 2) positions red can reach
+        replies = np.clip(red[:, None, :] + _ACTION_DELTAS, 0, BOARD_SIZE - 1)
+        caught = np.all(replies == cheese[:, None, :], axis=2)
+        # (n, 4, 4) values of blue's moves after each of red's
+        values = self._q_table[
+            replies[:, :, 0],
+            replies[:, :, 1],
+            blue[:, None, 0],
+            blue[:, None, 1],
+            cheese[:, None, 0],
+            cheese[:, None, 1],
+        ]
+        rows = blue[:, 0]
+        cols = blue[:, 1]
+        blue_legal = np.stack(
+            (rows > 0, rows < BOARD_SIZE - 1, cols > 0, cols < BOARD_SIZE - 1), axis=1
+        )
+        blue_values = np.where(blue_legal[:, None, :], values, -np.inf).max(axis=2)
+        reply_values = np.where(
+            caught, LOSS_REWARD, self.discount_factor * blue_values
+        )
+        return np.where(legal_masks, reply_values, np.inf).min(axis=1)
+
+    def train(
+        self,
+        replay_buffer: ReplayBuffer,
+        n_steps: int,
+        batch_size: int = 256,
+        *,
+        prioritized: bool = False,
+        beta: float = 0.4,
+    ) -> float:
+        """Trains from batches sampled from replay_buffer.
+
+        :param replay_buffer: The buffer to sample from.
+        :type replay_buffer: ReplayBuffer
+        :param n_steps: Number of batches.
+        :type n_steps: int
+        :param batch_size: Number of transitions per batch.
+        :type batch_size: int
+        :param prioritized: Whether to sample by priority, updating priorities with
+            TD errors.
+        :type prioritized: bool
+        :param beta: Importance sampling exponent, for prioritized sampling.
+        :type beta: float
+        :return: The mean absolute TD error of the last batch.
+        :rtype: float
+        """
+        td_errors = np.zeros(1, dtype=np.float32)
+        for _ in range(n_steps):
+            batch = replay_buffer.sample(batch_size, prioritized=prioritized, beta=beta)
+            td_errors = self.update(batch)
+            if prioritized:
+                replay_buffer.update_priorities(batch["indices"], td_errors)
+        return float(np.abs(td_errors).mean())
+
+    def greedy_actions(self, observations: np.ndarray, legal_masks: np.ndarray) -> np.ndarray:
+        """Returns the best legal action of many states at once.
+
+        :param observations: ``(n, 7)`` observations.
+        :type observations: np.ndarray
+        :param legal_masks: ``(n, 4)`` legal moves masks.
+        :type legal_masks: np.ndarray
+        :return: ``(n,)`` action indices.
+        :rtype: np.ndarray
+        """
+        values = self._q_table[tuple(observations[:, :6].astype(np.intp).T)]
+        return np.where(legal_masks, values, -np.inf).argmax(axis=1)
+
+    def save_q_table(self, path: str):
+        """Saves the Q-table with np.save.
+
+        :param path: Destination, conventionally ending in .npy.
+        :type path: str
+        """
+        np.save(path, self._q_table)
+
+    @staticmethod
+    def load_q_table(path: str, mmap_mode: Optional[str] = None) -> np.ndarray:
+        """Loads a Q-table saved with :meth:`save_q_table`.
+
+        :param path: The checkpoint path.
+        :type path: str
+        :param mmap_mode: np.load memory-mapping mode. "r" lets many players share a
+            read-only table, "r+" writes updates through to the file.
+        :type mmap_mode: str, optional
+        :return: The table.
+        :rtype: np.ndarray
+        """
+        return np.load(path, mmap_mode=mmap_mode)
+
+    @property
+    def q_table(self) -> np.ndarray:
+        return self._q_table
+
+    @q_table.setter
+    def q_table(self, q_table: np.ndarray):
+        self._set_q_table(q_table)
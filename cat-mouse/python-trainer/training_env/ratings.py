@@ -0,0 +1,159 @@
+"""This module defines incremental rating systems for players.
+
+Ratings are updated after every game rather than per rating period, so that they
+can be read while a :class:`~training_env.ladder.Ladder` is still running.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+DEFAULT_RATING = 1500.0
+
+# Glicko's scaling constant
+_Q = math.log(10) / 400
+
+
+class RatingSystem(ABC):
+    """Ratings of players, by name."""
+
+    @abstractmethod
+    def rating(self, name: str) -> float:
+        """
+        :param name: The player's name.
+        :type name: str
+        :return: The player's rating, the initial one if they have not played.
+        :rtype: float
+        """
+
+    @abstractmethod
+    def expected_score(self, name: str, opponent: str) -> float:
+        """
+        :param name: The player's name.
+        :type name: str
+        :param opponent: The opponent's name.
+        :type opponent: str
+        :return: The score name is expected to get against opponent, in [0, 1].
+        :rtype: float
+        """
+
+    @abstractmethod
+    def update(self, name: str, opponent: str, score: float):
+        """Updates both players' ratings after a game.
+
+        :param name: The player's name.
+        :type name: str
+        :param opponent: The opponent's name.
+        :type opponent: str
+        :param score: name's score: 1 for a win, 0.5 for a tie, 0 for a loss.
+        :type score: float
+        """
+
+    @property
+    @abstractmethod
+    def ratings(self) -> Dict[str, float]:
+        """
+        :return: The ratings of players who have played, by name.
+        :rtype: Dict[str, float]
+        """
+
+
+class EloRating(RatingSystem):
+    """Elo ratings, with a constant K-factor."""
+
+    def __init__(self, initial_rating: float = DEFAULT_RATING, k_factor: float = 32.0):
+        """
+        :param initial_rating: Rating of new players.
+        :type initial_rating: float
+        :param k_factor: Maximum rating change per game.
+        :type k_factor: float
+        """
+        self._initial_rating = initial_rating
+        self._k_factor = k_factor
+        self._ratings: Dict[str, float] = {}
+
+    def rating(self, name: str) -> float:
+        return self._ratings.get(name, self._initial_rating)
+
+    def expected_score(self, name: str, opponent: str) -> float:
+        return 1 / (1 + 10 ** ((self.rating(opponent) - self.rating(name)) / 400))
+
+    def update(self, name: str, opponent: str, score: float):
+        change = self._k_factor * (score - self.expected_score(name, opponent))
+        self._ratings[name] = self.rating(name) + change
+        self._ratings[opponent] = self.rating(opponent) - change
+
+    @property
+    def ratings(self) -> Dict[str, float]:
+        return self._ratings
+
+
+class GlickoRating(RatingSystem):
+    """Glicko ratings: each rating comes with a deviation, which shrinks as the
+    player plays, so that the ratings of new players move faster."""
+
+    def __init__(
+        self,
+        initial_rating: float = DEFAULT_RATING,
+        initial_deviation: float = 350.0,
+        min_deviation: float = 30.0,
+    ):
+        """
+        :param initial_rating: Rating of new players.
+        :type initial_rating: float
+        :param initial_deviation: Rating deviation of new players.
+        :type initial_deviation: float
+        :param min_deviation: Deviations never shrink below this, so that ratings
+            keep following players who improve.
+        :type min_deviation: float
+        """
+        self._initial = (initial_rating, initial_deviation)
+        self._min_deviation = min_deviation
+        self._ratings: Dict[str, Tuple[float, float]] = {}
+
+    @staticmethod
+    def _g(deviation: float) -> float:
+        return 1 / math.sqrt(1 + 3 * (_Q * deviation / math.pi) ** 2)
+
+    def rating(self, name: str) -> float:
+        return self._ratings.get(name, self._initial)[0]
+
+    def deviation(self, name: str) -> float:
+        """
+        :param name: The player's name.
+        :type name: str
+        :return: The player's rating deviation.
+        :rtype: float
+        """
+        return self._ratings.get(name, self._initial)[1]
+
+    def expected_score(self, name: str, opponent: str) -> float:
+        rating, _ = self._ratings.get(name, self._initial)
+        opponent_rating, opponent_deviation = self._ratings.get(opponent, self._initial)
+        return 1 / (
+            1
+            + 10 ** (-self._g(opponent_deviation) * (rating - opponent_rating) / 400)
+        )
+
+    def _updated(
+        self, player: Tuple[float, float], opponent: Tuple[float, float], score: float
+    ) -> Tuple[float, float]:
+        rating, deviation = player
+        opponent_rating, opponent_deviation = opponent
+        g = self._g(opponent_deviation)
+        expected = 1 / (1 + 10 ** (-g * (rating - opponent_rating) / 400))
+        inverse_d2 = _Q**2 * g**2 * expected * (1 - expected)
+        precision = 1 / deviation**2 + inverse_d2
+        rating += _Q / precision * g * (score - expected)
+        return rating, max(self._min_deviation, math.sqrt(1 / precision))
+
+    def update(self, name: str, opponent: str, score: float):
+        player = self._ratings.get(name, self._initial)
+        other = self._ratings.get(opponent, self._initial)
+        # both updates use the ratings from before the game
+        self._ratings[name] = self._updated(player, other, score)
+        self._ratings[opponent] = self._updated(other, player, 1 - score)
+
+    @property
+    def ratings(self) -> Dict[str, float]:
+        return {name: rating for name, (rating, _) in self._ratings.items()}
@@ -0,0 +1,217 @@
+"""This module defines a replay buffer of game transitions backed by NumPy arrays.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .game_rules import DIRECTIONS
+from .game_state import OBSERVATION_SIZE, GameState
+
+# Boolean legal moves mask of each 4-bit mask, indexed like DIRECTIONS
+LEGAL_MASK_TABLE = np.array(
+    [[bool(mask & (1 << i)) for i in range(len(DIRECTIONS))] for mask in range(16)],
+    dtype=bool,
+)
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of (state, legal mask, action, reward, next state,
+    next legal mask, done) transitions.
+
+    Every field lives in a preallocated array, so that adding a transition only writes
+    a row and sampling a batch is a single fancy indexing operation. Once full, the
+    oldest transitions are overwritten.
+
+    Observations follow the VectorGameEnv layout and legal masks are ``(4,)`` boolean
+    rows, so that transitions from both games and vectorized environments can be
+    mixed. Writes are serialised by a lock: players running in different threads or
+    loops can share a buffer.
+
+    Sampling is either uniform or prioritized: transitions are then drawn with
+    probability proportional to ``priority ** alpha`` and returned with importance
+    sampling weights.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        alpha: float = 0.6,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param capacity: Maximum number of transitions kept.
+        :type capacity: int
+        :param alpha: How much prioritization is used, 0 meaning uniform.
+        :type alpha: float
+        :param seed: Seed of the sampling generator. Optional.
+        :type seed: int, optional
+        """
+        self._capacity = capacity
+        self._alpha = alpha
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self._observations = np.zeros((capacity, OBSERVATION_SIZE), dtype=np.int8)
+        self._legal_masks = np.zeros((capacity, len(DIRECTIONS)), dtype=bool)
+        self._actions = np.zeros(capacity, dtype=np.int8)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._next_observations = np.zeros((capacity, OBSERVATION_SIZE), dtype=np.int8)
+        self._next_legal_masks = np.zeros((capacity, len(DIRECTIONS)), dtype=bool)
+        self._dones = np.zeros(capacity, dtype=bool)
+        # priorities are stored already raised to the power alpha
+        self._priorities = np.zeros(capacity, dtype=np.float64)
+        self._max_priority = 1.0
+
+        self._next_index = 0
+        self._size = 0
+
+    def _reserve(self, n: int) -> np.ndarray:
+        indices = (self._next_index + np.arange(n)) % self._capacity
+        self._next_index = (self._next_index + n) % self._capacity
+        self._size = min(self._size + n, self._capacity)
+        return indices
+
+    def add(
+        self,
+        state: GameState,
+        action: int,
+        reward: float,
+        next_state: GameState,
+        done: bool,
+    ):
+        """Adds a transition from a game.
+
+        :param state: The state the action was chosen in.
+        :type state: GameState
+        :param action: Index of the chosen direction.
+        :type action: int
+        :param reward: Reward received for the action.
+        :type reward: float
+        :param next_state: The state the action led to.
+        :type next_state: GameState
+        :param done: Whether the game ended.
+        :type done: bool
+        """
+        with self._lock:
+            i = self._next_index
+            self._next_index = (i + 1) % self._capacity
+            if self._size < self._capacity:
+                self._size += 1
+
+            state.write_observation(self._observations[i])
+            self._legal_masks[i] = LEGAL_MASK_TABLE[state.legal_mask]
+            self._actions[i] = action
+            self._rewards[i] = reward
+            next_state.write_observation(self._next_observations[i])
+            self._next_legal_masks[i] = LEGAL_MASK_TABLE[next_state.legal_mask]
+            self._dones[i] = done
+            self._priorities[i] = self._max_priority**self._alpha
+
+    def add_batch(
+        self,
+        observations: np.ndarray,
+        legal_masks: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_observations: np.ndarray,
+        next_legal_masks: np.ndarray,
+        dones: np.ndarray,
+    ):
+        """Adds transitions in bulk, e.g. from VectorGameEnv.step.
+
+        Batches larger than the capacity only keep their last transitions.
+
+        :param observations: ``(n, 7)`` observations.
+        :type observations: np.ndarray
+        :param legal_masks: ``(n, 4)`` legal moves masks.
+        :type legal_masks: np.ndarray
+        :param actions: ``(n,)`` action indices.
+        :type actions: np.ndarray
+        :param rewards: ``(n,)`` rewards.
+        :type rewards: np.ndarray
+        :param next_observations: ``(n, 7)`` next observations.
+        :type next_observations: np.ndarray
+        :param next_legal_masks: ``(n, 4)`` next legal moves masks.
+        :type next_legal_masks: np.ndarray
+        :param dones: ``(n,)`` game ended flags.
+        :type dones: np.ndarray
+        """
+        n = len(actions)
+        keep = slice(max(0, n - self._capacity), n)
+        with self._lock:
+            indices = self._reserve(n - keep.start)
+            self._observations[indices] = observations[keep]
+            self._legal_masks[indices] = legal_masks[keep]
+            self._actions[indices] = actions[keep]
+            self._rewards[indices] = rewards[keep]
+            self._next_observations[indices] = next_observations[keep]
+            self._next_legal_masks[indices] = next_legal_masks[keep]
+            self._dones[indices] = dones[keep]
+            self._priorities[indices] = self._max_priority**self._alpha
+
+    def sample(
+        self, batch_size: int, *, prioritized: bool = False, beta: float = 0.4
+    ) -> Dict[str, np.ndarray]:
+        """Samples a batch of transitions, with replacement.
+
+        :param batch_size: Number of transitions to sample.
+        :type batch_size: int
+        :param prioritized: Whether to sample according to priorities.
+        :type prioritized: bool
+        :param beta: Importance sampling exponent, for prioritized sampling.
+        :type beta: float
+        :return: The fields of the sampled transitions, their ``indices`` and their
+            importance sampling ``weights`` (all ones when sampling uniformly).
+        :rtype: Dict[str, np.ndarray]
+        """
+        with self._lock:
+            size = self._size
+            if size == 0:
+                raise ValueError("Can not sample from an empty replay buffer")
+
+            if prioritized:
+                priorities = self._priorities[:size]
+                probabilities = priorities / priorities.sum()
+                indices = self._rng.choice(size, batch_size, p=probabilities)
+                weights = (size * probabilities[indices]) ** -beta
+                weights = (weights / weights.max()).astype(np.float32)
+            else:
+                indices = self._rng.integers(0, size, batch_size)
+                weights = np.ones(batch_size, dtype=np.float32)
+
+            return {
+                "observations": self._observations[indices],
+                "legal_masks": self._legal_masks[indices],
+                "actions": self._actions[indices],
+                "rewards": self._rewards[indices],
+                "next_observations": self._next_observations[indices],
+                "next_legal_masks": self._next_legal_masks[indices],
+                "dones": self._dones[indices],
+                "indices": indices,
+                "weights": weights,
+            }
+
+    def update_priorities(self, indices: np.ndarray, priorities: Any, eps: float = 1e-6):
+        """Sets the priorities of sampled transitions, typically their TD errors.
+
+        :param indices: Indices returned by :meth:`sample`.
+        :type indices: np.ndarray
+        :param priorities: New priorities. Absolute values are used.
+        :type priorities: array-like
+        :param eps: Added to priorities so that no transition becomes unsampleable.
+        :type eps: float
+        """
+        priorities = np.abs(np.asarray(priorities, dtype=np.float64)) + eps
+        with self._lock:
+            self._priorities[indices] = priorities**self._alpha
+            self._max_priority = max(self._max_priority, float(priorities.max()))
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
@@ -0,0 +1,469 @@
+"""This module defines a multi-process self-play farm.
+
+Each worker process runs its own game loop and its own players. Finished games are
+streamed back to the parent through a shared-memory ring buffer.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .abstract_game import AbstractGame
+from .basicPlayer import BasicPlayer
+from .game_archive import OUTCOME_LOST, OUTCOME_TIED, OUTCOME_WON, game_outcome
+from .game_order import GameOrder
+from .game_rules import DIRECTIONS
+from .player import RandomPlayer
+from .server_configuration import ServerConfiguration, SimulatedServerConfiguration
+
+# Longer games have their trajectory truncated
+MAX_TRAJECTORY_LENGTH = 128
+
+NO_ACTION = -1
+
+GAME_RECORD_DTYPE = np.dtype(
+    [
+        ("worker", np.int16),
+        ("outcome", np.int8),
+        ("n_moves", np.int32),
+        ("duration", np.float32),
+        ("actions", np.int8, (MAX_TRAJECTORY_LENGTH,)),
+    ]
+)
+
+_ACTION_INDEX: Dict[str, int] = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+# Write and read counters of each slot
+_HEADER_DTYPE = np.dtype(np.uint64)
+_HEADER_SIZE = 2
+
+
+class SharedRingBuffer:
+    """Fixed-size game records ring buffers living in shared memory.
+
+    The buffer holds one ring per slot. Each ring has a single producer and a single
+    consumer, so no lock is needed: the producer only advances the write counter and
+    the consumer only advances the read counter.
+    """
+
+    def __init__(
+        self,
+        n_slots: int,
+        capacity: int,
+        name: Optional[str] = None,
+    ):
+        """
+        :param n_slots: Number of rings.
+        :type n_slots: int
+        :param capacity: Number of records per ring.
+        :type capacity: int
+        :param name: Name of an existing block to attach to. If None, a new block is
+            created.
+        :type name: str, optional
+        """
+        header_bytes = n_slots * _HEADER_SIZE * _HEADER_DTYPE.itemsize
+        size = header_bytes + n_slots * capacity * GAME_RECORD_DTYPE.itemsize
+
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=size)
+        self._n_slots = n_slots
+        self._capacity = capacity
+
+        self._counters = np.ndarray(
+            (n_slots, _HEADER_SIZE), dtype=_HEADER_DTYPE, buffer=self._shm.buf
+        )
+        self._records = np.ndarray(
+            (n_slots, capacity),
+            dtype=GAME_RECORD_DTYPE,
+            buffer=self._shm.buf,
+            offset=header_bytes,
+        )
+        if self._owner:
+            self._counters.fill(0)
+
+    def push(self, slot: int, record: Tuple[Any, ...]) -> bool:
+        """Appends a record to a ring.
+
+        :param slot: The ring to write to.
+        :type slot: int
+        :param record: The record, with fields ordered like GAME_RECORD_DTYPE.
+        :type record: tuple
+        :return: False if the ring is full and nothing was written.
+        :rtype: bool
+        """
+        written, read = int(self._counters[slot, 0]), int(self._counters[slot, 1])
+        if written - read >= self._capacity:
+            return False
+        self._records[slot, written % self._capacity] = record
+        self._counters[slot, 0] = written + 1
+        return True
+
+    def drain(self, slot: int) -> np.ndarray:
+        """Removes and returns every record available in a ring.
+
+        :param slot: The ring to read from.
+        :type slot: int
+        :return: A copy of the records, oldest first.
+        :rtype: np.ndarray
+        """
+        written, read = int(self._counters[slot, 0]), int(self._counters[slot, 1])
+        if written == read:
+            return self._records[slot, :0].copy()
+        indices = np.arange(read, written) % self._capacity
+        records = self._records[slot, indices]
+        self._counters[slot, 1] = written
+        return records
+
+    def close(self):
+        # numpy views must be released before the mapping can be closed
+        del self._counters
+        del self._records
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+
+class _GameRecorder:
+    """Records the orders of a player and queues a record for each finished game.
+
+    Games finish on the game loop thread while records are pushed from the worker's
+    main thread, so finished games go through a deque.
+    """
+
+    def __init__(self, player: BasicPlayer, worker_id: int):
+        self._worker_id = worker_id
+        self._actions: Dict[str, List[int]] = {}
+        self._started: Dict[str, float] = {}
+        self.finished: Deque[Tuple[Any, ...]] = deque()
+
+        client = player.game_client
+        send_order = client.send_order
+        game_finished_callback = player._game_finished_callback
+
+        async def recording_send_order(order: GameOrder, game_tag: str):
+            if game_tag not in self._actions:
+                self._actions[game_tag] = []
+                self._started[game_tag] = time.perf_counter()
+            self._actions[game_tag].append(_ACTION_INDEX.get(order.order, NO_ACTION))  # type: ignore
+            await send_order(order, game_tag)
+
+        def recording_game_finished_callback(game: AbstractGame):
+            game_finished_callback(game)
+            self._record(game)
+
+        client.send_order = recording_send_order  # type: ignore
+        player._game_finished_callback = recording_game_finished_callback  # type: ignore
+
+    def _record(self, game: AbstractGame):
+        actions = self._actions.pop(game.game_tag, [])
+        started = self._started.pop(game.game_tag, time.perf_counter())
+        outcome = game_outcome(game)
+
+        trajectory = np.full(MAX_TRAJECTORY_LENGTH, NO_ACTION, dtype=np.int8)
+        kept = actions[:MAX_TRAJECTORY_LENGTH]
+        trajectory[: len(kept)] = kept
+        self.finished.append(
+            (
+                self._worker_id,
+                outcome,
+                len(actions),
+                time.perf_counter() - started,
+                trajectory,
+            )
+        )
+
+
+async def _flush(recorders: List[_GameRecorder], ring: SharedRingBuffer, slot: int):
+    for recorder in recorders:
+        while recorder.finished:
+            if not ring.push(slot, recorder.finished[0]):
+                # The parent is lagging behind: wait for it to drain the ring
+                await asyncio.sleep(0.001)
+                continue
+            recorder.finished.popleft()
+
+
+async def _run_worker(
+    worker_id: int,
+    ring: SharedRingBuffer,
+    player_factory: Callable[..., BasicPlayer],
+    n_players: int,
+    n_games: int,
+    server_configuration: ServerConfiguration,
+    max_concurrent_games: int,
+    opponent: str,
+    flush_interval: float,
+):
+    players = [
+        player_factory(
+            server_configuration=server_configuration,
+            max_concurrent_games=max_concurrent_games,
+        )
+        for _ in range(n_players)
+    ]
+    recorders = [_GameRecorder(player, worker_id) for player in players]
+
+    games_per_player = [
+        n_games // n_players + (1 if i < n_games % n_players else 0)
+        for i in range(n_players)
+    ]
+    games = asyncio.gather(
+        *[
+            player.send_challenges(opponent, n_challenges)
+            for player, n_challenges in zip(players, games_per_player)
+            if n_challenges
+        ]
+    )
+    while not games.done():
+        await _flush(recorders, ring, worker_id)
+        await asyncio.wait([games], timeout=flush_interval)
+    await games
+    await _flush(recorders, ring, worker_id)
+
+
+def _worker_main(
+    worker_id: int,
+    ring_name: str,
+    n_workers: int,
+    capacity: int,
+    player_factory: Callable[..., BasicPlayer],
+    n_players: int,
+    n_games: int,
+    server_configuration: ServerConfiguration,
+    max_concurrent_games: int,
+    opponent: str,
+    flush_interval: float,
+):
+    ring = SharedRingBuffer(n_workers, capacity, name=ring_name)
+    try:
+        asyncio.run(
+            _run_worker(
+                worker_id,
+                ring,
+                player_factory,
+                n_players,
+                n_games,
+                server_configuration,
+                max_concurrent_games,
+                opponent,
+                flush_interval,
+            )
+        )
+    finally:
+        ring.close()
+
+
+class SelfPlayFarm:
+    """Runs self-play games in several worker processes.
+
+    Every worker builds ``players_per_worker`` players with ``player_factory``, which
+    is called with the ``server_configuration`` and ``max_concurrent_games`` keyword
+    arguments - passing a player class works. With the default
+    SimulatedServerConfiguration, games are played against the in-process rules;
+    any other configuration connects to that server.
+
+    Workers use the ``spawn`` start method: the game loop thread would not survive a
+    fork. ``player_factory`` must therefore be picklable.
+    """
+
+    def __init__(
+        self,
+        player_factory: Callable[..., BasicPlayer] = RandomPlayer,
+        *,
+        n_workers: Optional[int] = None,
+        players_per_worker: int = 1,
+        max_concurrent_games: int = 1,
+        server_configuration: ServerConfiguration = SimulatedServerConfiguration,
+        opponent: str = "",
+        ring_capacity: int = 4096,
+        flush_interval: float = 0.01,
+    ):
+        """
+        :param player_factory: Callable building a player.
+        :type player_factory: Callable[..., BasicPlayer]
+        :param n_workers: Number of worker processes. Defaults to the CPU count.
+        :type n_workers: int, optional
+        :param players_per_worker: Number of players in each worker.
+        :type players_per_worker: int
+        :param max_concurrent_games: Concurrent games of each player.
+        :type max_concurrent_games: int
+        :param server_configuration: Server the players play on.
+        :type server_configuration: ServerConfiguration
+        :param opponent: Opponent passed to send_challenges.
+        :type opponent: str
+        :param ring_capacity: Number of game records each worker can buffer.
+        :type ring_capacity: int
+        :param flush_interval: How often workers push finished games, in seconds.
+        :type flush_interval: float
+        """
+        self._player_factory = player_factory
+        self._n_workers = n_workers or multiprocessing.cpu_count()
+        self._players_per_worker = players_per_worker
+        self._max_concurrent_games = max_concurrent_games
+        self._server_configuration = server_configuration
+        self._opponent = opponent
+        self._ring_capacity = ring_capacity
+        self._flush_interval = flush_interval
+
+        self._ring: Optional[SharedRingBuffer] = None
+        self._processes: List[Any] = []
+        self._start_time: Optional[float] = None
+        self._end_time: Optional[float] = None
+
+        self._n_games = 0
+        self._n_won = 0
+        self._n_lost = 0
+        self._n_tied = 0
+        self._n_moves = 0
+
+    def start(self, n_games: int):
+        """Starts the workers, which will play n_games games overall.
+
+        :param n_games: Total number of games to play.
+        :type n_games: int
+        """
+        if self._processes:
+            raise RuntimeError("SelfPlayFarm is already running")
+
+        context = multiprocessing.get_context("spawn")
+        self._ring = SharedRingBuffer(self._n_workers, self._ring_capacity)
+        self._start_time = time.perf_counter()
+        self._end_time = None
+
+        for worker_id in range(self._n_workers):
+            worker_games = n_games // self._n_workers + (
+                1 if worker_id < n_games % self._n_workers else 0
+            )
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    worker_id,
+                    self._ring.name,
+                    self._n_workers,
+                    self._ring_capacity,
+                    self._player_factory,
+                    self._players_per_worker,
+                    worker_games,
+                    self._server_configuration,
+                    self._max_concurrent_games,
+                    self._opponent,
+                    self._flush_interval,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+
+    def poll(self) -> np.ndarray:
+        """Collects the games finished since the last call and updates the counters.
+
+        :return: The new game records, as a GAME_RECORD_DTYPE array.
+        :rtype: np.ndarray
+        """
+        if self._ring is None:
+            return np.zeros(0, dtype=GAME_RECORD_DTYPE)
+
+        records = np.concatenate(
+            [self._ring.drain(slot) for slot in range(self._n_workers)]
+        )
+        if records.size:
+            outcomes = records["outcome"]
+            self._n_games += len(records)
+            self._n_won += int(np.count_nonzero(outcomes == OUTCOME_WON))
+            self._n_lost += int(np.count_nonzero(outcomes == OUTCOME_LOST))
+            self._n_tied += int(np.count_nonzero(outcomes == OUTCOME_TIED))
+            self._n_moves += int(records["n_moves"].sum())
+        return records
+
+    def join(
+        self,
+        callback: Optional[Callable[[np.ndarray], Any]] = None,
+        poll_interval: float = 0.05,
+    ):
+        """Waits for every worker to finish, collecting games as they come.
+
+        :param callback: Called with each non-empty batch of new records.
+        :type callback: Callable[[np.ndarray], Any], optional
+        :param poll_interval: Time between two polls, in seconds.
+        :type poll_interval: float
+        """
+        while any(process.is_alive() for process in self._processes):
+            records = self.poll()
+            if callback is not None and records.size:
+                callback(records)
+            time.sleep(poll_interval)
+
+        records = self.poll()
+        if callback is not None and records.size:
+            callback(records)
+        self._end_time = time.perf_counter()
+        self.close()
+
+        failed = [p.exitcode for p in self._processes if p.exitcode != 0]
+        self._processes = []
+        if failed:
+            raise RuntimeError("Self-play workers exited with codes %s" % failed)
+
+    def run(
+        self,
+        n_games: int,
+        callback: Optional[Callable[[np.ndarray], Any]] = None,
+    ):
+        """Plays n_games games and waits for them to finish.
+
+        :param n_games: Total number of games to play.
+        :type n_games: int
+        :param callback: Called with each non-empty batch of new records.
+        :type callback: Callable[[np.ndarray], Any], optional
+        """
+        self.start(n_games)
+        self.join(callback)
+
+    def close(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+    @property
+    def games_per_second(self) -> float:
+        if self._start_time is None:
+            return 0.0
+        end = self._end_time if self._end_time is not None else time.perf_counter()
+        return self._n_games / max(end - self._start_time, 1e-9)
+
+    @property
+    def n_finished_games(self) -> int:
+        return self._n_games
+
+    @property
+    def n_moves(self) -> int:
+        return self._n_moves
+
+    @property
+    def n_won_games(self) -> int:
+        return self._n_won
+
+    @property
+    def n_lost_games(self) -> int:
+        return self._n_lost
+
+    @property
+    def n_tied_games(self) -> int:
+        return self._n_tied
+
+    @property
+    def win_rate(self) -> float:
+        return self._n_won / self._n_games if self._n_games else 0.0
@@ -14,3 +14,8 @@ LocalhostServerConfiguration = ServerConfiguration(
     "ws://localhost:3000/",
     "https://localhost:3000/",
 )
+
+SimulatedServerConfiguration = ServerConfiguration(
+    "local://simulator/",
+    "",
+)
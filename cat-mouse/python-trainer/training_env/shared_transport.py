@@ -0,0 +1,295 @@
+"""This module defines a websocket transport shared by several game clients.
+"""
+
+import asyncio
+from asyncio import CancelledError, Event, Queue, create_task
+from collections import deque
+from logging import DEBUG, Logger, getLogger
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from .codec import DEFAULT_CODEC, JsonCodec
+from .concurrency import create_in_loop, get_game_loop
+from .dispatcher import MessageDispatcher
+from .server_configuration import ServerConfiguration
+
+if TYPE_CHECKING:
+    import websockets.client as ws
+
+    from .game_client import GameClient
+
+
+class SharedTransport:
+    """A single websocket connection multiplexed between many game clients.
+
+    Incoming frames are decoded once and routed to the client owning their
+    ``gameTag``. A game is owned by the client whose username the frame carries if
+    any, otherwise by the oldest client waiting for a game it challenged for.
+    Frames that cannot be routed are delivered to every attached client, as they
+    would be with one connection per client.
+
+    Outgoing messages from all clients go through one queue, drained by a single
+    writer. Incoming frames are handed to clients through a
+    :class:`MessageDispatcher`, in order for each client and game.
+
+    Like a client's own connection, the frame the server greets a connection with
+    is not handed to clients, except on reconnection, to the owner of its game. A
+    connection lasts until it drops or its last client detaches: attaching again
+    reconnects, and clients attached to the previous connection have their
+    ``_handle_reconnection`` called first.
+    """
+
+    def __init__(
+        self,
+        server_configuration: ServerConfiguration,
+        *,
+        ping_interval: Optional[float] = 20.0,
+        ping_timeout: Optional[float] = 20.0,
+        codec: Optional[JsonCodec] = None,
+        logger: Optional[Logger] = None,
+        max_queue: Optional[int] = 64,
+        dispatcher_workers: int = 16,
+        max_game_queue_size: int = 64,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        :param server_configuration: Server configuration.
+        :type server_configuration: ServerConfiguration
+        :param ping_interval: How long between keepalive pings. If None, disables
+            keepalive entirely.
+        :type ping_interval: float, optional
+        :param ping_timeout: How long to wait for a timeout of a specific ping. If
+            None pings will never time out.
+        :type ping_timeout: float, optional
+        :param codec: Codec used to decode frames. Defaults to orjson if available,
+            json otherwise.
+        :type codec: JsonCodec, optional
+        :param logger: Logger of the transport. Defaults to a module logger.
+        :type logger: Logger, optional
+        :param max_queue: Maximum number of received frames buffered by the
+            websocket. If None, frames are buffered without limit.
+        :type max_queue: int, optional
+        :param dispatcher_workers: Number of coroutines handling received frames.
+        :type dispatcher_workers: int
+        :param max_game_queue_size: Maximum number of frames of a single game waiting
+            to be handled before reading from the socket pauses.
+        :type max_game_queue_size: int
+        :param loop: The loop the transport runs on, which its clients must share.
+            Defaults to GAME_LOOP.
+        :type loop: asyncio.AbstractEventLoop, optional
+        """
+        self._server_configuration = server_configuration
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+        self._codec: JsonCodec = codec if codec is not None else DEFAULT_CODEC
+        self._logger: Logger = logger if logger is not None else getLogger(__name__)
+        self._max_queue = max_queue
+        self._loop: asyncio.AbstractEventLoop = loop if loop is not None else get_game_loop()
+
+        self._clients: List["GameClient"] = []
+        self._clients_by_username: Dict[str, "GameClient"] = {}
+        self._game_owners: Dict[str, "GameClient"] = {}
+        self._pending_games: Deque["GameClient"] = deque()
+
+        self._dispatcher = MessageDispatcher(
+            self._deliver,
+            n_workers=dispatcher_workers,
+            max_queue_size=max_game_queue_size,
+            logger=self._logger,
+        )
+        self._connected: Event = create_in_loop(self._loop, Event)
+        self._outgoing: "Queue[str]" = create_in_loop(self._loop, Queue)
+        self._runner: Optional["asyncio.Task[Any]"] = None
+        # resolved once the current connection is open, or failed to open, and
+        # once it closes
+        self._opened: "Optional[asyncio.Future[None]]" = None
+        self._closed: "Optional[asyncio.Future[None]]" = None
+        self._n_connections = 0
+
+        self.websocket: "ws.WebSocketClientProtocol"
+
+    async def attach(self, client: "GameClient") -> "asyncio.Future[None]":
+        """Attaches a client, connecting if needed, and waits for the connection.
+
+        :param client: The client to attach.
+        :type client: GameClient
+        :return: A future resolved when the connection closes.
+        :rtype: asyncio.Future[None]
+        :raises Exception: The error connecting failed with. The client stays
+            attached, and attaching again retries.
+        """
+        if client not in self._clients:
+            self._clients.append(client)
+            self._clients_by_username[client.username] = client
+        if self._runner is None or self._runner.done():
+            self._opened = self._loop.create_future()
+            self._closed = self._loop.create_future()
+            self._runner = create_task(self._run(self._opened, self._closed))
+        closed = self._closed
+        await asyncio.shield(self._opened)  # type: ignore
+        return closed  # type: ignore
+
+    async def detach(self, client: "GameClient"):
+        """Detaches a client, closing the connection when no client is left.
+
+        :param client: The client to detach.
+        :type client: GameClient
+        """
+        if client in self._clients:
+            self._clients.remove(client)
+        if self._clients_by_username.get(client.username) is client:
+            del self._clients_by_username[client.username]
+        for game_tag in [t for t, c in self._game_owners.items() if c is client]:
+            del self._game_owners[game_tag]
+        while client in self._pending_games:
+            self._pending_games.remove(client)
+
+        if not self._clients and self._connected.is_set():
+            await self.websocket.close()
+
+    def expect_game(self, client: "GameClient"):
+        """Registers that client is waiting for the game it just challenged for.
+
+        :param client: The challenging client.
+        :type client: GameClient
+        """
+        self._pending_games.append(client)
+
+    async def send(self, message: str):
+        """Queues a message to be sent.
+
+        :param message: The message to send.
+        :type message: str
+        """
+        await self._outgoing.put(message)
+
+    def _route(self, game_info: Dict[str, Any]) -> List["GameClient"]:
+        game_tag = game_info.get("gameTag")
+        owner = self._game_owners.get(game_tag)  # type: ignore
+
+        if owner is None:
+            username = game_info.get("username")
+            if username is not None and username in self._clients_by_username:
+                owner = self._clients_by_username[username]
+            elif self._pending_games and game_tag is not None:
+                # frames without a game, e.g. challenges, do not start one
+                owner = self._pending_games.popleft()
+            if owner is not None and game_tag is not None:
+                self._game_owners[game_tag] = owner
+
+        if game_info.get("gameOver"):
+            self._game_owners.pop(game_tag, None)  # type: ignore
+
+        return [owner] if owner is not None else list(self._clients)
+
+    @staticmethod
+    async def _deliver(item: Tuple["GameClient", Dict[str, Any], Optional[List[int]]]):
+        client, game_info, timestamps = item
+        if timestamps is not None:
+            timestamps.append(perf_counter_ns())
+        await client._handle_game_info(game_info, timestamps)
+
+    async def _write(self):
+        while True:
+            message = await self._outgoing.get()
+            await self.websocket.send(message)
+            # send everything queued meanwhile before yielding back to the queue
+            while not self._outgoing.empty():
+                await self.websocket.send(self._outgoing.get_nowait())
+
+    async def _run(self, opened: "asyncio.Future[None]", closed: "asyncio.Future[None]"):
+        import websockets.client as ws
+        from websockets.exceptions import ConnectionClosedOK
+
+        websocket_url = self._server_configuration.websocket_url
+        self._logger.info("Starting shared transport to %s", websocket_url)
+        writer = None
+        error: Optional[BaseException] = None
+        try:
+            async with ws.connect(
+                websocket_url,
+                max_queue=self._max_queue,
+                ping_interval=self._ping_interval,
+                ping_timeout=self._ping_timeout,
+            ) as websocket:
+                self.websocket = websocket
+                writer = create_task(self._write())
+                reconnecting = self._n_connections > 0
+                self._n_connections += 1
+                if reconnecting:
+                    self._logger.info("Reconnected to %s", websocket_url)
+                    for client in list(self._clients):
+                        await client._handle_reconnection()
+                self._connected.set()
+                opened.set_result(None)
+
+                logger = self._logger
+                dispatch = self._dispatcher.put
+                greeted = False
+                async for message in websocket:
+                    if logger.isEnabledFor(DEBUG):
+                        logger.debug("\033[92m\033[1m<<<\033[0m %s", message)
+                    start = perf_counter_ns()
+                    game_info = self._codec.decode(message)
+                    decoded_at = perf_counter_ns()
+                    game_tag = game_info.get("gameTag")
+                    if greeted:
+                        clients = self._route(game_info)
+                    else:
+                        # the server greets every connection with its current game,
+                        # which a new connection did not start. After a drop, it
+                        # resyncs the game for its owner only
+                        greeted = True
+                        owner = self._game_owners.get(game_tag)  # type: ignore
+                        if not reconnecting or owner is None:
+                            continue
+                        clients = [owner]
+                    for client in clients:
+                        # timed clients each get their own copy of the timestamps
+                        timestamps = None if client.metrics is None else [start, decoded_at]
+                        await dispatch((client, game_tag), (client, game_info, timestamps))
+
+        except ConnectionClosedOK:
+            self._logger.warning("Websocket connection with %s closed", websocket_url)
+        except (CancelledError, RuntimeError) as e:
+            self._logger.critical("Shared transport interrupted by %s", e)
+            error = e
+        except Exception as e:
+            self._logger.exception(e)
+            error = e
+        finally:
+            self._connected.clear()
+            if writer is not None:
+                writer.cancel()
+            if not opened.done():
+                opened.set_exception(
+                    ConnectionError(
+                        "Could not connect to %s: %s" % (websocket_url, error)
+                    )
+                )
+            closed.set_result(None)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The loop the transport runs on.
+
+        :return: The loop.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return self._loop
+
+    @property
+    def clients(self) -> List["GameClient"]:
+        """
+        :return: The attached clients.
+        :rtype: List[GameClient]
+        """
+        return self._clients
+
+    @property
+    def connected(self) -> Event:
+        """
+        :return: Event set while the connection is open.
+        :rtype: Event
+        """
+        return self._connected
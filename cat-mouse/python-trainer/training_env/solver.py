@@ -0,0 +1,252 @@
+"""This module defines a perfect-play solver of the 5x5 cat-mouse game and a player
+using its solution.
+
+States are indexed as ``(player to move, red cell, blue cell, cheese cell)``, with
+cells as in :func:`~training_env.game_state.to_cell`. The game is solved by
+retrograde analysis: terminal states are valued first, then values are propagated
+backwards until nothing changes. States left undecided are draws.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+import numpy as np
+
+from .abstract_game import AbstractGame
+from .basicPlayer import BasicPlayer
+from .game import Game
+from .game_order import GameOrder
+from .game_rules import (
+    BOARD_SIZE,
+    DIRECTIONS,
+    INITIAL_BLUE_POSITION,
+    INITIAL_RED_POSITION,
+    apply_direction,
+    calculate_possible_moves,
+)
+from .game_state import BLUE_INDEX, RED_INDEX, to_cell
+
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+
+# Values, from the point of view of the player to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+NO_MOVE = -1
+
+SOLUTION_DTYPE = np.dtype(
+    [
+        ("value", np.int8),
+        ("best_action", np.int8),
+        # plies until the end of the game under optimal play, 0 for draws
+        ("depth", np.int16),
+    ]
+)
+SOLUTION_SHAPE = (2, N_CELLS, N_CELLS, N_CELLS)
+
+_ORDERS = [GameOrder(direction) for direction in DIRECTIONS]  # type: ignore
+
+
+def _next_cells() -> np.ndarray:
+    """Returns the ``(N_CELLS, 4)`` cell reached by each move, NO_MOVE if illegal."""
+    next_cells = np.full((N_CELLS, len(DIRECTIONS)), NO_MOVE, dtype=np.intp)
+    for cell in range(N_CELLS):
+        position = divmod(cell, BOARD_SIZE)
+        for direction in calculate_possible_moves(position):
+            row, col = apply_direction(position, direction)
+            next_cells[cell, DIRECTIONS.index(direction)] = row * BOARD_SIZE + col
+    return next_cells
+
+
+def solve() -> np.ndarray:
+    """Solves every state of the game.
+
+    :return: A SOLUTION_SHAPE array of SOLUTION_DTYPE records.
+    :rtype: np.ndarray
+    """
+    next_cells = _next_cells()
+    mover, red, blue, cheese = np.indices(SOLUTION_SHAPE).reshape(4, -1)
+    n_states = mover.size
+    n_actions = len(DIRECTIONS)
+
+    # flat index of the state each move leads to, -1 for illegal moves
+    moved = np.where(mover == RED_INDEX, red, blue)
+    destinations = next_cells[moved]
+    legal = destinations != NO_MOVE
+    next_red = np.where(mover[:, None] == RED_INDEX, destinations, red[:, None])
+    next_blue = np.where(mover[:, None] == BLUE_INDEX, destinations, blue[:, None])
+    children = np.ravel_multi_index(
+        (
+            np.broadcast_to(1 - mover[:, None], (n_states, n_actions)),
+            np.where(legal, next_red, 0),
+            np.where(legal, next_blue, 0),
+            np.broadcast_to(cheese[:, None], (n_states, n_actions)),
+        ),
+        SOLUTION_SHAPE,
+    )
+
+    # only moving onto the cheese wins, whatever the state reached looks like
+    captures = legal & (destinations == cheese[:, None])
+
+    value = np.zeros(n_states, dtype=np.int8)
+    depth = np.zeros(n_states, dtype=np.int16)
+    best_action = np.full(n_states, NO_MOVE, dtype=np.int8)
+
+    # the previous mover standing on the cheese has won. Games can start with the
+    # cheese under either mouse: those starting states are still to be played
+    initial = (
+        (mover == RED_INDEX)
+        & (red == to_cell(INITIAL_RED_POSITION))
+        & (blue == to_cell(INITIAL_BLUE_POSITION))
+    )
+    terminal = np.where(mover == RED_INDEX, blue == cheese, red == cheese) & ~initial
+    value[terminal] = LOSS
+    decided = terminal.copy()
+
+    while True:
+        child_value = value[children]
+        child_decided = decided[children]
+        child_depth = depth[children].astype(np.int32)
+
+        # win: some move leaves the opponent lost, pick the fastest
+        winning = captures | (legal & child_decided & (child_value == LOSS))
+        can_win = ~decided & winning.any(axis=1)
+        win_depth = np.where(
+            winning, np.where(captures, 0, child_depth), np.iinfo(np.int32).max
+        )
+        # loss: every move leaves the opponent won
+        losing = ~legal | (~captures & child_decided & (child_value == WIN))
+        can_lose = ~decided & ~can_win & legal.any(axis=1) & losing.all(axis=1)
+        lose_depth = np.where(legal, child_depth, -1)
+
+        if not (can_win.any() or can_lose.any()):
+            break
+
+        win_actions = win_depth.argmin(axis=1)
+        value[can_win] = WIN
+        best_action[can_win] = win_actions[can_win]
+        depth[can_win] = win_depth[can_win, win_actions[can_win]] + 1
+
+        lose_actions = lose_depth.argmax(axis=1)
+        value[can_lose] = LOSS
+        depth[can_lose] = lose_depth[can_lose, lose_actions[can_lose]] + 1
+
+        decided |= can_win | can_lose
+
+    # In lost states, every move loses against perfect play. Delaying the loss is
+    # not worth much against imperfect opponents: prefer the move leaving them the
+    # largest share of losing replies, then the longest game.
+    child_value = value[children]
+    n_legal = np.maximum(legal.sum(axis=1), 1)
+    blunder_rate = (legal & (child_value == WIN)).sum(axis=1) / n_legal
+    lost = decided & ~terminal & (value == LOSS)
+    lose_scores = np.where(
+        legal,
+        blunder_rate[children] * (np.iinfo(np.int16).max + 1) + depth[children],
+        -1,
+    )
+    best_action[lost] = lose_scores[lost].argmax(axis=1)
+
+    # draws: any move keeping the game undecided
+    drawing = ~decided & legal.any(axis=1)
+    draw_actions = (legal & ~decided[children]).argmax(axis=1)
+    best_action[drawing] = draw_actions[drawing]
+
+    solution = np.zeros(n_states, dtype=SOLUTION_DTYPE)
+    solution["value"] = value
+    solution["best_action"] = best_action
+    solution["depth"] = depth
+    return solution.reshape(SOLUTION_SHAPE)
+
+
+@lru_cache(maxsize=1)
+def get_solution() -> np.ndarray:
+    """Returns the solution, solving the game on first call.
+
+    :return: The solution, see :func:`solve`.
+    :rtype: np.ndarray
+    """
+    return solve()
+
+
+def save_solution(path: str, solution: np.ndarray):
+    """Saves a solution with np.save.
+
+    :param path: Destination, conventionally ending in .npy.
+    :type path: str
+    :param solution: The solution.
+    :type solution: np.ndarray
+    """
+    np.save(path, solution)
+
+
+def load_solution(path: str, mmap_mode: Optional[str] = None) -> np.ndarray:
+    """Loads a solution saved with :func:`save_solution`.
+
+    :param path: The file to load.
+    :type path: str
+    :param mmap_mode: np.load memory-mapping mode. Optional.
+    :type mmap_mode: str, optional
+    :return: The solution.
+    :rtype: np.ndarray
+    """
+    solution = np.load(path, mmap_mode=mmap_mode)
+    if solution.dtype != SOLUTION_DTYPE or solution.shape != SOLUTION_SHAPE:
+        raise ValueError("%s does not hold a cat-mouse solution" % path)
+    return solution
+
+
+class OptimalPlayer(BasicPlayer):
+    """Player following the solved game: each move is a single table lookup."""
+
+    def __init__(
+        self,
+        account_configuration: Any = None,
+        *,
+        solution: Optional[Union[np.ndarray, str]] = None,
+        **kwargs: Any,
+    ):
+        """
+        :param account_configuration: Account configuration. Optional.
+        :type account_configuration: AccountConfiguration, optional
+        :param solution: The solution, or the path of a saved one. Defaults to
+            solving the game, once per process.
+        :type solution: np.ndarray or str, optional
+        :param kwargs: Passed to BasicPlayer.
+        """
+        super().__init__(account_configuration, **kwargs)
+        if isinstance(solution, str):
+            solution = load_solution(solution)
+        elif solution is None:
+            solution = get_solution()
+        self._solution = solution
+        # the player always plays blue
+        self._best_actions = np.ascontiguousarray(solution["best_action"][BLUE_INDEX])
+
+    def choose_move(self, game: AbstractGame) -> GameOrder:
+        if not isinstance(game, Game):
+            return self.choose_random_move(game)
+        state = game.state
+        action = self._best_actions[state.red, state.blue, state.cheese]
+        if action == NO_MOVE or not state.legal_mask & (1 << action):
+            return self.choose_random_move(game)
+        return _ORDERS[action]
+
+    def optimal_actions(self, observations: np.ndarray) -> np.ndarray:
+        """Returns the optimal action of many states at once, whoever is to move.
+
+        :param observations: ``(n, 7)`` observations, in the VectorGameEnv layout.
+        :type observations: np.ndarray
+        :return: ``(n,)`` action indices, NO_MOVE in terminal states.
+        :rtype: np.ndarray
+        """
+        observations = observations.astype(np.intp)
+        cells = observations[:, :6:2] * BOARD_SIZE + observations[:, 1:6:2]
+        return self._solution["best_action"][
+            observations[:, 6], cells[:, 0], cells[:, 1], cells[:, 2]
+        ]
+
+    @property
+    def solution(self) -> np.ndarray:
+        return self._solution
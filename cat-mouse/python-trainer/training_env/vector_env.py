@@ -0,0 +1,273 @@
+"""This module defines a vectorized environment stepping many cat-mouse games at once.
+"""
+
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .basicPlayer import BasicPlayer
+from .game import Game
+from .game_rules import (
+    BLUE,
+    BOARD_SIZE,
+    DIRECTIONS,
+    INITIAL_BLUE_POSITION,
+    INITIAL_RED_POSITION,
+    RED,
+    calculate_possible_moves,
+    mirror_direction,
+    mirror_state,
+)
+from .game_state import (
+    BLUE_COL,
+    BLUE_INDEX,
+    BLUE_ROW,
+    CHEESE_COL,
+    CHEESE_ROW,
+    CURRENT_PLAYER,
+    OBSERVATION_SIZE,
+    RED_COL,
+    RED_INDEX,
+    RED_ROW,
+)
+
+# Values of the CURRENT_PLAYER column
+RED_TO_MOVE = RED_INDEX
+BLUE_TO_MOVE = BLUE_INDEX
+
+# Row/col offsets of each action, indexed like DIRECTIONS
+_ACTION_DELTAS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int8)
+_ACTION_INDEX: Dict[str, int] = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+
+class VectorGameEnv:
+    """Steps ``n_games`` independent cat-mouse games with NumPy arrays.
+
+    The state of every game lives in a single contiguous ``(n_games, 7)`` int8 array
+    whose columns are the red, blue and cheese positions followed by the player to
+    move. Actions are indices into :data:`~training_env.game_rules.DIRECTIONS`, and
+    are played for whichever player is to move in each game.
+
+    Rules are those of mouse-cheese-server: moves are clamped to the board, the
+    mouse reaching the cheese wins. Finished games are reset automatically, so the
+    observations returned by :meth:`step` always describe running games.
+    """
+
+    def __init__(
+        self,
+        n_games: int,
+        *,
+        max_turns: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param n_games: Number of games to run in parallel.
+        :type n_games: int
+        :param max_turns: If set, games lasting that many moves end in a tie.
+        :type max_turns: int, optional
+        :param seed: Seed used to draw cheese positions.
+        :type seed: int, optional
+        """
+        self._n_games = n_games
+        self._max_turns = max_turns
+        self._rng = np.random.default_rng(seed)
+
+        self._state = np.zeros((n_games, OBSERVATION_SIZE), dtype=np.int8)
+        self._turns = np.zeros(n_games, dtype=np.int32)
+        self._winners = np.full(n_games, -1, dtype=np.int8)
+        self._games: List[Game] = []
+        # the same games as seen by red, see mirror_state
+        self._mirrored_games: List[Game] = []
+
+        self._reset_games(np.arange(n_games))
+
+    def _reset_games(self, indices: np.ndarray):
+        self._state[indices, RED_ROW : RED_COL + 1] = INITIAL_RED_POSITION
+        self._state[indices, BLUE_ROW : BLUE_COL + 1] = INITIAL_BLUE_POSITION
+        self._state[indices, CHEESE_ROW : CHEESE_COL + 1] = self._rng.integers(
+            0, BOARD_SIZE, size=(len(indices), 2), dtype=np.int8
+        )
+        self._state[indices, CURRENT_PLAYER] = RED_TO_MOVE
+        self._turns[indices] = 0
+
+    def _mover_positions(self) -> np.ndarray:
+        blue_to_move = self._state[:, CURRENT_PLAYER : CURRENT_PLAYER + 1] == BLUE_TO_MOVE
+        return np.where(
+            blue_to_move,
+            self._state[:, BLUE_ROW : BLUE_COL + 1],
+            self._state[:, RED_ROW : RED_COL + 1],
+        )
+
+    def legal_moves_mask(self) -> np.ndarray:
+        """Vectorized equivalent of the server's ``possibleMoves``.
+
+        :return: A ``(n_games, 4)`` boolean array, columns ordered like DIRECTIONS.
+        :rtype: np.ndarray
+        """
+        positions = self._mover_positions()
+        rows = positions[:, 0]
+        cols = positions[:, 1]
+        return np.stack(
+            (rows > 0, rows < BOARD_SIZE - 1, cols > 0, cols < BOARD_SIZE - 1), axis=1
+        )
+
+    def observations(self) -> np.ndarray:
+        """
+        :return: A copy of the ``(n_games, 7)`` state array.
+        :rtype: np.ndarray
+        """
+        return self._state.copy()
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Resets every game.
+
+        :return: Observations and legal move masks.
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        self._winners.fill(-1)
+        self._reset_games(np.arange(self._n_games))
+        return self.observations(), self.legal_moves_mask()
+
+    def step(
+        self, actions: Any
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Plays one move in every game.
+
+        Out of range actions leave the mouse in place, as unknown directions do on
+        the server.
+
+        :param actions: One action index per game.
+        :type actions: array-like of int
+        :return: Observations, legal move masks, rewards and done flags. Rewards are
+            given to the player who just moved: 1 for catching the cheese, 0
+            otherwise. Observations of games that just finished describe the game
+            that replaced them.
+        :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        valid = (actions >= 0) & (actions < len(DIRECTIONS))
+        deltas = np.where(
+            valid[:, None], _ACTION_DELTAS[np.where(valid, actions, 0)], 0
+        )
+
+        blue_to_move = self._state[:, CURRENT_PLAYER] == BLUE_TO_MOVE
+        positions = np.clip(self._mover_positions() + deltas, 0, BOARD_SIZE - 1)
+        self._state[blue_to_move, BLUE_ROW : BLUE_COL + 1] = positions[blue_to_move]
+        self._state[~blue_to_move, RED_ROW : RED_COL + 1] = positions[~blue_to_move]
+
+        captured = np.all(
+            positions == self._state[:, CHEESE_ROW : CHEESE_COL + 1], axis=1
+        )
+        self._turns += 1
+        dones = captured
+        if self._max_turns is not None:
+            dones = captured | (self._turns >= self._max_turns)
+
+        rewards = captured.astype(np.float32)
+        self._winners[dones] = np.where(
+            captured[dones], self._state[dones, CURRENT_PLAYER], -1
+        )
+        self._state[:, CURRENT_PLAYER] ^= 1
+
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            self._reset_games(finished)
+
+        return self.observations(), self.legal_moves_mask(), rewards, dones
+
+    def state_dict(self, index: int) -> Dict[str, Any]:
+        """Returns the state of a game in the format broadcast by the server.
+
+        :param index: The game index.
+        :type index: int
+        :return: The game state.
+        :rtype: Dict[str, Any]
+        """
+        row = self._state[index]
+        red = (int(row[RED_ROW]), int(row[RED_COL]))
+        blue = (int(row[BLUE_ROW]), int(row[BLUE_COL]))
+        current = BLUE if row[CURRENT_PLAYER] == BLUE_TO_MOVE else RED
+        return {
+            "redMousePosition": red,
+            "blueMousePosition": blue,
+            "cheesePosition": (int(row[CHEESE_ROW]), int(row[CHEESE_COL])),
+            "currentPlayer": current,
+            "gameOver": False,
+            "winner": None,
+            "possibleMoves": calculate_possible_moves(blue if current == BLUE else red),
+            "gameTag": "vector-%d" % index,
+            "gameIntent": "move",
+        }
+
+    def choose_actions(self, player: BasicPlayer) -> np.ndarray:
+        """Asks player to choose a move in every game, for whichever player is to
+        move.
+
+        Each game is exposed to the player as a :class:`Game` updated with
+        ``parse_message``, so existing players can be plugged in as they are.
+        Players play blue: on red's turns, they choose their move on the mirrored
+        state, see :func:`~training_env.game_rules.mirror_state`, and it is mirrored
+        back, as in :class:`~training_env.ladder.Ladder`. ``choose_move`` must be
+        synchronous.
+
+        :param player: The player choosing moves.
+        :type player: BasicPlayer
+        :return: One action index per game.
+        :rtype: np.ndarray
+        """
+        if not self._games:
+            self._games, self._mirrored_games = (
+                [
+                    Game(
+                        game_tag="vector-%d" % i,
+                        username=player.username,
+                        logger=player.logger,
+                    )
+                    for i in range(self._n_games)
+                ]
+                for _ in range(2)
+            )
+
+        actions = np.zeros(self._n_games, dtype=np.intp)
+        red_to_move = self._state[:, CURRENT_PLAYER] == RED_TO_MOVE
+        for i in range(self._n_games):
+            state = self.state_dict(i)
+            if red_to_move[i]:
+                game = self._mirrored_games[i]
+                game.parse_message(mirror_state(state))
+            else:
+                game = self._games[i]
+                game.parse_message(state)
+            order = player.choose_move(game)
+            if isinstance(order, Awaitable):
+                raise TypeError("VectorGameEnv requires a synchronous choose_move")
+            direction = order.order  # type: ignore
+            if red_to_move[i]:
+                direction = mirror_direction(direction)
+            actions[i] = _ACTION_INDEX.get(direction, -1)
+        return actions
+
+    @property
+    def n_games(self) -> int:
+        """
+        :return: The number of parallel games.
+        :rtype: int
+        """
+        return self._n_games
+
+    @property
+    def turns(self) -> np.ndarray:
+        """
+        :return: Number of moves played in each running game.
+        :rtype: np.ndarray
+        """
+        return self._turns
+
+    @property
+    def winners(self) -> np.ndarray:
+        """
+        :return: For each game, the winner of the last finished episode:
+            RED_TO_MOVE, BLUE_TO_MOVE, or -1 if none or tied.
+        :rtype: np.ndarray
+        """
+        return self._winners